@@ -2,17 +2,253 @@
 
 import sys
 import argparse
+import contextlib
+import builtins
+import importlib
 
 import beebird
-import beebird.task
-import beebird.decorators
-import beebird.utils
+
+# the tasks and the modules of sub-commands are imported after parsing, by
+# the handlers, so --version / --help and the commands not run cost nothing
+
+
+def _jsonl_nodes(fname):
+    ''' graph nodes of a jsonl file, one task per line:
+
+        {"task": {"_CLSID_": "add", "a": 1, "b": 2}, "pre": [0, 1]}
+    '''
+    import json  # pylint: disable=import-outside-toplevel
+    with open(fname, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                node = json.loads(line)
+                fields = node['task']
+                clsid = fields.pop('_CLSID_')
+                yield clsid, json.dumps(fields), node.get('pre', [])
+
+
+def _graph_build(args):
+    import beebird.graphfile  # pylint: disable=import-outside-toplevel
+    beebird.graphfile.write_graph(args.output, _jsonl_nodes(args.input))
+    print(beebird.graphfile.graph_info(args.output))
+
+
+def _graph_info(args):
+    import beebird.graphfile  # pylint: disable=import-outside-toplevel
+    print(beebird.graphfile.graph_info(args.file))
+
+
+def _graph_run(args):
+    # pylint: disable=import-outside-toplevel
+    import beebird.graphfile
+    import beebird.report
+
+    for module in args.module or []:
+        importlib.import_module(module)
+
+    bkt = beebird.graphfile.load_bucket(args.file)
+    bkt.run()
+    print(f"{bkt.total} tasks done")
+    if args.report:
+        print(beebird.report.Report(bkt))
+
+
+def _add_graph_parser(subparsers):
+    parser_graph = subparsers.add_parser(
+        'graph', help='compact binary task graph files')
+    subparsers_graph = parser_graph.add_subparsers(help='graph commands')
+
+    parser = subparsers_graph.add_parser(
+        'build', help='build graph file from jsonl task list')
+    parser.add_argument('input', help='jsonl file, one task per line: '
+                        '{"task": {"_CLSID_": ...}, "pre": [indices]}')
+    parser.add_argument('output', help='graph file to write')
+    parser.set_defaults(func=_graph_build)
+
+    parser = subparsers_graph.add_parser('info', help='show graph file info')
+    parser.add_argument('file', help='graph file')
+    parser.set_defaults(func=_graph_info)
+
+    parser = subparsers_graph.add_parser('run', help='run graph file')
+    parser.add_argument('file', help='graph file')
+    parser.add_argument('-m', '--module', action='append',
+                        help='module of tasks to import')
+    parser.add_argument('--report', action='store_true',
+                        help='print critical-path and parallelism report')
+    parser.set_defaults(func=_graph_run)
+
+
+def _arg_type(annotation):
+    ''' argument type of a field annotation, a type or its source '''
+    if isinstance(annotation, str):  # from manifest, not imported
+        annotation = getattr(builtins, annotation, None)
+        return annotation if isinstance(annotation, type) else None
+    return annotation
+
+
+def _task_parser(info):
+    ''' argument parser of a task (manifest.TaskInfo), built when the task
+        is run
+    '''
+    import beebird.manifest  # pylint: disable=import-outside-toplevel
+    parser_task = argparse.ArgumentParser(
+        prog=f"beebird run {info.name}", description=info.doc)
+
+    for field, annotation, default in info.fields:
+        if default is beebird.manifest.REQUIRED:
+            # no default value
+            if annotation:
+                parser_task.add_argument(
+                    field, type=_arg_type(annotation), help="yyy")
+            else:
+                parser_task.add_argument(field, help="yyy")
+        else:
+            # has default value
+            parser_task.add_argument(
+                f"--{field}", type=type(default), default=default, help="yyy")
+    return parser_task
+
+
+def _list_tasks():
+    # lazy registered tasks are listed without being imported
+    import beebird.task  # pylint: disable=import-outside-toplevel
+    for info in beebird.task.TaskMan().infos():
+        doc = (info.doc or '').strip().split('\n')[0]
+        print(f"  {info.name:<24} {doc}")
+
+
+def _run_task(args):
+    # pylint: disable=import-outside-toplevel
+    import beebird.manifest
+    import beebird.task
+
+    if args.task is None:
+        print("registered tasks:")
+        _list_tasks()
+        return
+
+    taskman = beebird.task.TaskMan()
+    try:
+        info = taskman.info(args.task)
+        # help and usage errors without importing the task
+        values = _task_parser(info).parse_args(args.args)
+        task = taskman.find(args.task)
+    except ValueError as err:
+        args.parser.error(str(err))
+
+    imported = beebird.manifest.task_info(task)
+    if imported != info:  # from manifest, parsed with the task's own types
+        info = imported
+        values = _task_parser(info).parse_args(args.args)
+
+    tsk_ = task()
+    for field, _, _ in info.fields:
+        setattr(tsk_, field, getattr(values, field))
+    print("Result >> ", tsk_.run())
+    if args.report:
+        import beebird.report  # pylint: disable=import-outside-toplevel
+        print(beebird.report.Report(tsk_))
+
+
+def _add_run_parser(subparsers):
+    # the parser of a task is only built when it is run, so the startup
+    # does not grow with the number of registered tasks
+    parser_run = subparsers.add_parser('run', help='execute task')
+    parser_run.add_argument('--report', action='store_true',
+                            help='print critical-path and parallelism report')
+    parser_run.add_argument('task', nargs='?',
+                            help='registered task, lists them if omitted')
+    parser_run.add_argument('args', nargs=argparse.REMAINDER,
+                            help='task arguments, see "run TASK -h"')
+    parser_run.set_defaults(func=_run_task, parser=parser_run)
+
+
+def _run_batch(args):
+    import beebird.batch  # pylint: disable=import-outside-toplevel
+
+    for module in args.module or []:
+        importlib.import_module(module)
+
+    if args.input == '-':
+        _, failed = beebird.batch.run_batch(
+            sys.stdin, sys.stdout, args.jobs, args.ordered)
+    else:
+        with open(args.input, 'r', encoding='utf-8') as file:
+            _, failed = beebird.batch.run_batch(
+                file, sys.stdout, args.jobs, args.ordered)
+    return 1 if failed else 0
+
+
+def _add_batch_parser(subparsers):
+    parser = subparsers.add_parser(
+        'run-batch', help='run jsonl tasks, write jsonl results')
+    parser.add_argument('input', help='jsonl file, one task per line: '
+                        '{"_CLSID_": ...}, "-" for stdin')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='tasks running at most, default: workers')
+    parser.add_argument('--ordered', action='store_true',
+                        help='results in input order, default: as done')
+    parser.add_argument('-m', '--module', action='append',
+                        help='module of tasks to import')
+    parser.set_defaults(func=_run_batch)
+
+
+def _serve(args):
+    # pylint: disable=import-outside-toplevel
+    import beebird.server  # unix domain sockets
+
+    for module in args.module or []:
+        importlib.import_module(module)
+
+    with beebird.server.Server(args.socket, args.jobs) as server:
+        print(f"serving on {server.path}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def _submit(args):
+    # pylint: disable=import-outside-toplevel
+    import json
+    import beebird.server  # unix domain sockets
+
+    failed = 0
+    with contextlib.ExitStack() as stack:
+        lines = sys.stdin if args.input == '-' else stack.enter_context(
+            open(args.input, 'r', encoding='utf-8'))
+        try:
+            for record in beebird.server.submit(lines, args.socket):
+                failed += 'error' in record
+                print(json.dumps(record), flush=True)
+        except (ConnectionRefusedError, FileNotFoundError) as err:
+            args.parser.error(f"no server: {err}")
+    return 1 if failed else 0
+
+
+def _add_serve_parsers(subparsers):
+    parser = subparsers.add_parser(
+        'serve', help='run tasks submitted over a unix domain socket')
+    parser.add_argument('-s', '--socket',
+                        help='socket path, default: $BEEBIRD_SOCKET or '
+                        'beebird.sock in runtime folder')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='tasks of a client running at most, '
+                        'default: workers')
+    parser.add_argument('-m', '--module', action='append',
+                        help='module of tasks to import')
+    parser.set_defaults(func=_serve)
+
+    parser_submit = subparsers.add_parser(
+        'submit', help='run jsonl tasks on server, write jsonl results')
+    parser_submit.add_argument('input', help='jsonl file, one task per line: '
+                               '{"_CLSID_": ...}, "-" for stdin')
+    parser_submit.add_argument('-s', '--socket', help='socket path of server')
+    parser_submit.set_defaults(func=_submit, parser=parser_submit)
 
 
 def main():
     ''' entrypoint of beebird console '''
-    beebird.utils.import_builtin_tasks()
-
     # print(sys.argv)
 
     parser = argparse.ArgumentParser(
@@ -26,39 +262,10 @@ def main():
 
     subparsers = parser.add_subparsers(help='sub-command help')
 
-    parser_run = subparsers.add_parser('run', help='execute task')
-    subparsers_run = parser_run.add_subparsers(help='registered tasks')
-    # adds all registered tasks
-    tasks = beebird.task.TaskMan().all()
-    for task in tasks:
-        parser_task = subparsers_run.add_parser(
-            task.__name__, help=task.__doc__)
-
-        tsk = task()
-        fields = tsk.get_fields()
-        for field in fields:
-            val = getattr(tsk, field)
-            if isinstance(val, beebird.decorators.Empty):
-                # no default value
-                if val.annotation:
-                    parser_task.add_argument(
-                        field, type=val.annotation, help="yyy")
-                else:
-                    parser_task.add_argument(field, help="yyy")
-            else:
-                # has default value
-                parser_task.add_argument(
-                    f"--{field}", type=type(val), default=val, help="yyy")
-
-        def wrap_func(tsk, fields):
-            def call_task(args):
-                tsk_ = tsk()
-                for field in fields:
-                    setattr(tsk_, field, getattr(args, field))
-                print("Result >> ", tsk_.run())
-            return call_task
-
-        parser_task.set_defaults(func=wrap_func(task, fields))
+    _add_run_parser(subparsers)
+    _add_batch_parser(subparsers)
+    _add_serve_parsers(subparsers)
+    _add_graph_parser(subparsers)
 
     subparsers.add_parser('create', help='create a task')
 
@@ -70,9 +277,13 @@ def main():
     #r = parser.parse_args("--command create".split())
     args = parser.parse_args(sys.argv[1:])
     if hasattr(args, 'func'):
-        args.func(args)
-    else:
-        parser.print_help()
+        # after parsing, --version and --help do not need the tasks
+        from beebird import utils  # pylint: disable=import-outside-toplevel
+        utils.import_builtin_tasks()
+        # a handler returns True (or 1) if some tasks failed
+        return 1 if args.func(args) else 0
+    parser.print_help()
+    return 0
 
 
 if __name__ == "__main__":
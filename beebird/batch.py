@@ -0,0 +1,139 @@
+''' Bulk execution of json tasks
+
+    A batch is a stream of json tasks, one per line, as Task.from_json()
+    decodes them:
+
+        {"_CLSID_": "add", "a": 1, "b": 2}
+        {"_CLSID_": "add", "a": 3}
+
+    run_batch() runs them in parallel and writes a json line per task as it
+    is done, in completion order, or in input order if ordered:
+
+        {"line": 1, "result": 3}
+        {"line": 2, "error": "TypeError: ..."}
+
+    The input is read as tasks are done: at most jobs tasks are running, and
+    at most window tasks are waiting for an earlier one to be written in
+    input order, so memory does not grow with the size of the batch.
+
+    A result which cannot be serialized by json_encode is written as its
+    repr().
+'''
+
+import collections
+import json
+import queue
+import threading
+
+from py_json_serialize import json_encode
+
+from .task import Task
+from . import runner
+
+
+def decode_task(jstr: str) -> Task:
+    ''' Task.from_json() of a line, which must be a task
+
+        the class of a class-id is looked up once: a lazy registered task is
+        imported by its first line, later ones find it registered.
+    '''
+    tsk = Task.from_json(jstr)
+    if not isinstance(tsk, Task):
+        raise ValueError('not a task')
+    return tsk
+
+
+def _error(err) -> str:
+    return f'{type(err).__name__}: {err}'
+
+
+def _record(number, tsk) -> dict:
+    ''' output of a done task '''
+    if tsk.error_code != Task.ErrorCode.SUCCESS:
+        return {'line': number, 'error': _error(tsk.error) if tsk.error
+                else tsk.error_code.name.lower()}
+    try:
+        result = json.loads(json_encode(tsk.result, pretty=False))
+    except (TypeError, ValueError):
+        result = repr(tsk.result)
+    return {'line': number, 'result': result}
+
+
+def run_batch(lines, out, jobs=0, ordered=False, window=0) -> tuple:
+    ''' runs the json tasks of lines, writes the results as json lines to
+        out.
+
+        jobs: tasks running at most, default: number of workers of runner
+        ordered: results in input order, default: in completion order
+        window: results waiting to be written in input order at most,
+            default: 4 * jobs
+        returns the numbers of tasks succeeded and failed.
+
+        Results are written by a thread while lines are read, a client can
+        wait for the result of a line before sending the next one.
+    '''
+    jobs = jobs or runner.max_workers()
+    window = window or 4 * jobs
+    running = threading.BoundedSemaphore(jobs)
+    waiting = threading.BoundedSemaphore(window)  # ordered, not written
+    done = queue.SimpleQueue()  # (line number, task or record), None: end
+    order = collections.deque()  # line numbers not written, input order
+    counts = collections.Counter()
+    closed = False  # out is gone, the batch runs to the end anyway
+
+    def output(func, *args):
+        nonlocal closed
+        if not closed:
+            try:
+                func(*args)
+            except OSError:
+                closed = True
+
+    def write(record):
+        counts['error' in record] += 1
+        output(out.write, json.dumps(record) + '\n')
+
+    def writer():
+        finished = {}  # line number => record, waiting for an earlier one
+        for number, tsk in iter(done.get, None):
+            record = tsk if isinstance(tsk, dict) else _record(number, tsk)
+            if not ordered:
+                write(record)
+            else:
+                finished[number] = record
+                while order and order[0] in finished:
+                    write(finished.pop(order.popleft()))
+                    waiting.release()
+            if done.empty():
+                output(out.flush)  # written so far, before waiting
+        output(out.flush)
+
+    def on_done(tsk, number):
+        done.put((number, tsk))  # before the end of the batch is queued
+        running.release()
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+
+            if ordered:
+                waiting.acquire()  # pylint: disable=consider-using-with
+                order.append(number)
+            running.acquire()  # pylint: disable=consider-using-with
+            try:
+                tsk = decode_task(line)
+                tsk.add_done_callback(
+                    lambda tsk, number=number: on_done(tsk, number))
+                tsk.run(wait=False)
+            except Exception as err:  # pylint: disable=broad-except
+                running.release()
+                done.put((number, {'line': number, 'error': _error(err)}))
+    finally:
+        for _ in range(jobs):  # all tasks done
+            running.acquire()  # pylint: disable=consider-using-with
+        done.put(None)
+        thread.join()
+    return counts[False], counts[True]
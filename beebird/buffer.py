@@ -0,0 +1,169 @@
+''' Zero-copy buffers handed between tasks
+
+    A task producing a big block of bytes returns it as a Buffer, the next
+    task consumes the same memory through Buffer.view (a memoryview) instead
+    of a copy:
+
+        @task_
+        def load(fname):
+            buf = Buffer.allocate(os.path.getsize(fname))
+            with open(fname, 'rb') as file:
+                file.readinto(buf.view)
+            return buf
+
+        @task_
+        def checksum(buf):
+            with buf:  # released when done
+                return zlib.crc32(buf.view)
+
+    Any object supporting the buffer protocol (bytes, bytearray, mmap, numpy
+    arrays ...) can be wrapped by Buffer(obj) without copy.
+
+    Across processes, a buffer in shared memory (Buffer.allocate(size,
+    shared=True) or buf.share()) is pickled as the name of its shared memory
+    block, the receiving process maps the same memory, so passing it costs
+    O(1) whatever its size. A buffer not in shared memory is pickled as bytes.
+
+    Ownership: the shared memory block is owned by one Buffer object, which
+    unlinks it on release(). Pickling the owner moves the ownership to the
+    unpickled buffer (e.g. a result sent by a child process to the parent),
+    so the block survives the exit of the producing process; buffers
+    unpickled from a non-owner only attach to the block.
+
+    release() invalidates the buffer, memoryviews derived from
+    Buffer.view must be released before (BufferError otherwise). A buffer
+    not released explicitly is released when garbage collected.
+'''
+
+import weakref
+from multiprocessing import shared_memory
+
+
+def _shared_memory(name=None, size=0):
+    ''' shared memory block not tracked by the resource tracker, the owning
+        Buffer decides when it is unlinked.
+    '''
+    try:
+        return shared_memory.SharedMemory(name, create=name is None,
+                                          size=size, track=False)
+    except TypeError:  # python < 3.13
+        return shared_memory.SharedMemory(name, create=name is None,
+                                          size=size)
+
+
+def _release(view, shm, owner):
+    view.release()
+    if shm is not None:
+        shm.close()
+        if owner:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class Buffer:
+    ''' a block of bytes passed by reference '''
+
+    def __init__(self, data=b'', *, _shm=None, _size=None, _owner=False):
+        if _shm is not None:
+            self._shm = _shm
+            view = _shm.buf[:_size]
+        else:
+            self._shm = None
+            view = memoryview(data)
+            if view.ndim != 1 or view.format != 'B':
+                view = view.cast('B')  # raw bytes of a C-contiguous buffer
+
+        self._view = view
+        self._owner = _owner
+        self._finalizer = weakref.finalize(self, _release, view, self._shm,
+                                           _owner)
+
+    @classmethod
+    def allocate(cls, size: int, shared=False) -> 'Buffer':
+        ''' a new zero-filled buffer, in shared memory if shared '''
+        if not shared:
+            return cls(bytearray(size))
+        # a shared memory block cannot be empty
+        return cls(_shm=_shared_memory(size=max(size, 1)), _size=size,
+                   _owner=True)
+
+    @property
+    def view(self) -> memoryview:
+        ''' memoryview of the bytes, valid until the buffer is released '''
+        if not self._finalizer.alive:
+            raise ValueError('buffer is released')
+        return self._view
+
+    @property
+    def nbytes(self) -> int:
+        ''' size in bytes '''
+        return self.view.nbytes
+
+    def __len__(self):
+        return self.nbytes
+
+    @property
+    def shared(self) -> bool:
+        ''' the buffer is in shared memory '''
+        return self._shm is not None
+
+    @property
+    def owner(self) -> bool:
+        ''' the buffer owns its shared memory block '''
+        return self._owner
+
+    @property
+    def released(self) -> bool:
+        ''' the buffer is released '''
+        return not self._finalizer.alive
+
+    def share(self) -> 'Buffer':
+        ''' the buffer in shared memory
+
+            returns itself if already shared, otherwise a shared copy (the
+            only copy needed to pass it to other processes).
+        '''
+        if self.shared:
+            return self
+        buf = Buffer.allocate(self.nbytes, shared=True)
+        buf.view[:] = self.view
+        return buf
+
+    def tobytes(self) -> bytes:
+        ''' a copy of the bytes '''
+        return self.view.tobytes()
+
+    def release(self):
+        ''' releases the memory, unlinks the shared memory block if owner '''
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def __reduce__(self):
+        view = self.view
+        if not self.shared:
+            return (Buffer, (view.tobytes(),))
+
+        owner = self._owner
+        if owner:  # ownership moves to the unpickled buffer
+            self._owner = False
+            self._finalizer.detach()
+            self._finalizer = weakref.finalize(self, _release, view,
+                                               self._shm, False)
+        return (_attach, (self._shm.name, view.nbytes, owner))
+
+    def __repr__(self):
+        state = 'released' if self.released else f'{len(self._view)} bytes'
+        where = f' shared:{self._shm.name}' if self._shm is not None else ''
+        return f'<Buffer {state}{where}>'
+
+
+def _attach(name: str, size: int, owner: bool) -> Buffer:
+    ''' buffer of an existing shared memory block '''
+    return Buffer(_shm=_shared_memory(name), _size=size, _owner=owner)
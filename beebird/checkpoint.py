@@ -0,0 +1,170 @@
+''' Checkpoint journal for long running composite tasks
+
+    A journal records every completed sub-task of a Serial or Bucket, so
+    re-running the same composite skips the work already done:
+
+        bkt = Bucket(journal='build.ckpt')
+        ...
+        bkt.run()  # fails at 95%
+
+        # later, maybe in another process, the same bucket is built again
+        bkt = Bucket(journal='build.ckpt')
+        ...
+        bkt.run()  # only the remaining 5% are dispatched
+
+    A sub-task is identified by its position in the composite, its class name
+    and its public fields, so the composite must be built the same way.
+
+    If save_results is enabled, task results are serialized by json_encode
+    and restored on resume; a task whose result cannot be serialized is not
+    recorded and will run again.
+
+    Records are buffered and written in batches (batch_size records or
+    flush_seconds, whichever comes first), the buffer is always flushed when
+    the composite job ends. A record torn by a crash is skipped on load, the
+    records after it are kept.
+
+    A record costs a few microseconds: about 5% of a run of 10k tasks per
+    second, more with saved results (see benchmarks/bench_checkpoint.py).
+'''
+
+import os
+
+import json
+import hashlib
+import threading
+import time
+
+from py_json_serialize import json_decode, json_encode
+
+# field types whose repr() is stable across processes
+_SCALARS = (str, int, float, bool, type(None))
+
+# quotes a string as json, much cheaper than json.dumps() on hot path
+_quote = json.encoder.encode_basestring_ascii
+
+
+def task_key(tsk, index: int) -> str:
+    ''' identity of a task at the index-th position of a composite '''
+    fields = {k: v for k, v in vars(tsk).items() if k[0] != '_'}
+    for val in fields.values():
+        if not isinstance(val, _SCALARS):
+            try:
+                blob = json_encode(fields, pretty=False)
+            except (TypeError, ValueError):
+                blob = repr(fields)
+            break
+    else:
+        blob = repr(fields)  # fast path
+
+    digest = hashlib.md5(blob.encode('utf-8')).hexdigest()[:16]
+    return f"{index}:{type(tsk).__name__}:{digest}"
+
+
+class Journal:
+    ''' append-only journal of completed tasks '''
+
+    BATCH_SIZE = 1000
+    FLUSH_SECONDS = 1
+
+    def __init__(self, filename: str, *, save_results=False,
+                 batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.filename = filename
+        self.save_results = save_results
+        self._batch_size = batch_size
+        self._flush_seconds = flush_seconds
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._tail_checked = False  # torn tail of the file terminated
+
+    def load(self) -> dict:
+        ''' completed tasks recorded so far, key => serialized result
+
+            the serialized result is None if results are not saved.
+        '''
+        done = {}
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        rec = json.loads(line)
+                        done[rec['key']] = rec.get('result')
+                    except (ValueError, TypeError, KeyError):
+                        continue  # torn by an interrupted run
+        except FileNotFoundError:
+            pass
+        return done
+
+    @staticmethod
+    def decode_result(blob):
+        ''' restore a result saved by record() '''
+        return None if blob is None else json_decode(blob)
+
+    def record(self, key: str, result=None, save_result=False):
+        ''' records a completed task
+
+            save_result: saves the result even if save_results is disabled,
+            e.g. the result is an input of other tasks.
+        '''
+        if self.save_results or save_result:
+            try:
+                blob = json_encode(result, pretty=False)
+            except (TypeError, ValueError):
+                return  # not serializable, the task will run again.
+            line = '{"key": %s, "result": %s}' % (_quote(key), _quote(blob))
+        else:
+            line = '{"key": %s}' % _quote(key)
+
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self._batch_size or \
+                    time.monotonic() - self._last_flush >= self._flush_seconds:
+                self._flush()
+
+    def flush(self):
+        ''' writes buffered records to file '''
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+
+        data = '\n'.join(self._buffer) + '\n'
+        self._buffer = []
+        if not self._tail_checked:
+            self._tail_checked = True
+            if self._torn():
+                data = '\n' + data  # not glued to the torn record
+        with open(self.filename, 'a', encoding='utf-8') as file:
+            file.write(data)
+
+    def _torn(self) -> bool:
+        ''' the file ends with a partially written record '''
+        try:
+            with open(self.filename, 'rb') as file:
+                file.seek(0, os.SEEK_END)
+                if file.tell() == 0:
+                    return False
+                file.seek(-1, os.SEEK_END)
+                return file.read(1) != b'\n'
+        except FileNotFoundError:
+            return False
+
+    def clear(self):
+        ''' forget all completed tasks '''
+        with self._lock:
+            self._buffer = []
+            self._tail_checked = True
+            with open(self.filename, 'w', encoding='utf-8'):
+                pass
+
+
+def resolve_journal(journal):
+    ''' journal from a Journal object or a file name '''
+    if journal is None or isinstance(journal, Journal):
+        return journal
+    return Journal(journal)
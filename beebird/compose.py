@@ -10,26 +10,40 @@
 
 import threading
 import collections
+import itertools
+from array import array
 import copy
 import time
 import queue
+import types
 
 from beebird.task import Task
 from beebird.job import Job, JobStopError
 from beebird.decorators import runtask
+from beebird.checkpoint import resolve_journal, task_key
+from beebird import runner
+
+_MISSING = object()  # field / argument not set
+_END = object()  # end of a stream of events / items
 
 
 def _flatten(tasks, cls) -> list:
     ''' flatten the nesting serial/parallel tasks '''
     result = []
     for i in tasks:
-        if isinstance(i, cls):
+        # a bounded parallel keeps its own concurrency limit
+        if isinstance(i, cls) and getattr(i, '_source', None) is None:
             result.extend(i._tasks)  # pylint: disable=protected-access
         else:
             result.append(i)
 
     return result
 
+
+def _is_task(obj):
+    return isinstance(obj, Task) or \
+        (isinstance(obj, type) and issubclass(obj, Task))
+
 def _resolve_task(cls_or_task)->Task:
     ''' resolve a task instance '''
     if isinstance(cls_or_task, Task):
@@ -39,6 +53,17 @@ def _resolve_task(cls_or_task)->Task:
     raise ValueError('input must be a task object or a subclass of Task')
 
 
+def _sum_costs(tasks):
+    ''' estimated cost of a composition: sum of the costs of its tasks, the
+        unknown ones count as the mean of the known ones (1 if none is known)
+    '''
+    costs = [i.estimated_cost() for i in tasks]
+    known = [i for i in costs if i is not None]
+    if not known:
+        return len(costs)
+    return sum(known) * len(costs) / len(known)
+
+
 class Parallel(Task):
     ''' execute tasks in parallel
 
@@ -46,18 +71,50 @@ class Parallel(Task):
         task.run()  # tA, tB, tC runs in parallel
 
         assert task.result == [ tA.result, tB.result, tC.result ]
+
+        Bounded concurrency: with a single iterable (e.g. a generator) of
+        tasks, or with max_in_flight, children are pulled and started only
+        as earlier ones finish, at most max_in_flight (default: number of
+        runner workers) at a time; results are still in input order.
+
+        task = Parallel((Resize(f) for f in files), max_in_flight=8)
+
+        A lazy parallel does not keep its children, its memory does not grow
+        with their number; keep_tasks keeps the started ones, in input
+        order, for inspection after the run (e.g. report.Report).
+
+        Progress: the progress of children is folded in, weighted by their
+        estimated costs (see Task.estimated_cost), a lazy or bounded
+        parallel counts its finished children.
     '''
+    _history_ = False
 
-    def __init__(self, *tasks):
+    def __init__(self, *tasks, max_in_flight=None, keep_tasks=False):
         super().__init__()
-        self._tasks = _flatten([_resolve_task(i) for i in tasks], Parallel)
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError('max_in_flight must >= 1')
+        self._max_in_flight = max_in_flight
+        self._keep_tasks = keep_tasks
+
+        if len(tasks) == 1 and not _is_task(tasks[0]):
+            self._tasks = []
+            self._source = tasks[0]  # lazy iterable, resolved while running
+        elif max_in_flight is not None:
+            # children are held by the source anyway
+            self._tasks = self._source = [_resolve_task(i) for i in tasks]
+        else:
+            self._tasks = _flatten([_resolve_task(i)
+                                    for i in tasks], Parallel)
+            self._source = None
+
+    def estimated_cost(self):
+        if self._cost_ is not None or self._source is not None:
+            return self._cost_
+        return _sum_costs(self._tasks)
 
 
 @runtask(Parallel)
 class _ParalletJob(Job):
-    # maximum waiting time for status checking.
-    MAX_WAIT_SECONDS = 1000
-
     def __init__(self, task):
         super().__init__(task)
 
@@ -66,6 +123,10 @@ class _ParalletJob(Job):
         self._total = 0
         self._error = None
 
+    def on_stop(self):
+        with self._cv:
+            self._cv.notify_all()  # wakes up the scheduling loop
+
     def task_done_callback(self, task):  # pylint: disable=unused-argument
         ''' called when task is done '''
         with self._cv:
@@ -75,21 +136,36 @@ class _ParalletJob(Job):
                 self._error = task.error
             else:  # success
                 self._count += 1
+                self._task._notify_child_done(task)
 
+            task._parent_job = None  # pylint: disable=protected-access
             self._cv.notify()
 
     def __call__(self):
         super().__call__()
 
+        if self._task._source is not None:
+            return self._run_bounded()
+
         tasks = self._task._tasks
 
         self._total = len(tasks)
         self._count = 0
-        self._task.progress = 0
+        self._task._fold_in(tasks)
+
+        try:
+            self._wait_all(tasks)
+        finally:
+            self._task._fold_out(tasks)
 
+        self._task.progress = 1
+        return [t.result for t in tasks]
+
+    def _wait_all(self, tasks):
         if self._total > 0:
             jobs = []
             for i in tasks:
+                i._parent_job = self  # pylint: disable=protected-access
                 i.add_done_callback(self.task_done_callback)
                 jobs.append(i.run(wait=False))
 
@@ -104,24 +180,926 @@ class _ParalletJob(Job):
 
                         raise JobStopError()
 
-                    self._task.progress = self._count / self._total
-
                     if self._count == self._total:
                         break
 
-                    self._cv.wait(_ParalletJob.MAX_WAIT_SECONDS)
+                    self._cv.wait()
 
-        return [t.result for t in tasks]
+    def _bounded_done_callback(self, task):
+        ''' called when a child of bounded parallel is done '''
+        task.remove_done_callback(self._bounded_done_callback)
+        task._parent_job = None  # pylint: disable=protected-access
+        with self._cv:
+            index, _ = self._running.pop(id(task))
+            if task.aborted:
+                self._stop = True
+            elif task.error_code == Task.ErrorCode.ERROR:
+                self._error = task.error
+            else:  # success
+                self._results[index] = task.result
+                self._count += 1
+                self._task._notify_child_done(task)
+
+            self._cv.notify()
+
+    def _run_bounded(self):
+        ''' starts children one by one, at most max_in_flight at a time '''
+        source = self._task._source
+        limit = self._task._max_in_flight or runner.max_workers()
+        try:
+            self._total = len(source)
+        except TypeError:
+            self._total = None  # unknown until exhausted
+        self._task.progress = 0
+
+        self._results = []
+        self._running = {}  # id(task) => (index, job)
+        kept = None  # started children, in input order, if kept
+        if self._task._keep_tasks and source is not self._task._tasks:
+            kept = self._task._tasks
+            kept.clear()  # of a previous run
+        self._count = 0
+
+        children = iter(source)
+        exhausted = False
+        while True:
+            # pulls new children outside of the lock
+            started = []
+            while not exhausted and len(self._running) + len(started) < limit:
+                try:
+                    started.append(_resolve_task(next(children)))
+                except StopIteration:
+                    exhausted = True
+
+            with self._cv:
+                for tsk in started:
+                    index = len(self._results)
+                    self._results.append(None)
+                    if kept is not None:
+                        kept.append(tsk)
+                    tsk._parent_job = self  # pylint: disable=protected-access
+                    tsk.add_done_callback(self._bounded_done_callback)
+                    self._running[id(tsk)] = (index, None)
+                    job_ = tsk.run(wait=False)
+                    if id(tsk) in self._running:  # not done in place
+                        self._running[id(tsk)] = (index, job_)
+
+                if self._stop or self._error:
+                    for _, job_ in list(self._running.values()):
+                        if job_:
+                            job_.stop()
+
+                    if self._error:
+                        raise self._error
+
+                    raise JobStopError()
+
+                if self._total:
+                    self._task.progress = self._count / self._total
+
+                if exhausted and not self._running:
+                    break
+
+                if len(self._running) >= limit or exhausted:
+                    self._cv.wait()
+
+        self._task.progress = 1
+        return self._results
+
+
+# ----------- ParallelMap -------------
+
+def _call_in_place(tsk, job_=None):
+    ''' executes a task in current thread, returns its result '''
+    call = getattr(tsk, 'call', None)
+    if call is not None:
+        return call(_job_=job_)
+    return tsk.get_job_class()(tsk)()
+
+
+def _map_task(task_cls, item):
+    ''' task of a map item: tuple => positional args, dict => keyword args '''
+    if isinstance(item, tuple):
+        return task_cls(*item)
+    if isinstance(item, dict):
+        return task_cls(**item)
+    return task_cls(item)
+
+
+class _MapChunk(Task):
+    ''' a chunk of ParallelMap items, executed by a single job '''
+
+    def __init__(self, task_cls, index, items):
+        super().__init__()
+        self._task_cls = task_cls
+        self._index = index
+        self._items = items
+
+
+@runtask(_MapChunk)
+class _MapChunkJob(Job):
+    ''' runs the items of a chunk one by one in the same thread
+
+        the chunk job is passed as '_job_' to the item tasks.
+    '''
+
+    def __call__(self):
+        super().__call__()
+
+        task_cls = self._task._task_cls
+        results = []
+        for item in self._task._items:
+            self.check_stop()
+            results.append(_call_in_place(_map_task(task_cls, item), self))
+        return results
+
+
+class ParallelMap(Task):
+    ''' maps a task class over a (large) input collection in chunks
+
+        tsk = ParallelMap(Resize, files, chunksize=100)
+        tsk.run()
+
+        assert tsk.result == [Resize(f).run() for f in files]
+
+        Each chunk of items runs as a single job which executes the item
+        tasks one by one in place, so the per-item overhead of a task job is
+        paid once per chunk. An item is passed to the task class as
+        positional arguments if it is a tuple, keyword arguments if it is a
+        dict, or as the only argument otherwise.
+
+        chunksize: items per chunk, None for automatic sizing from the
+                   measured per-item cost (chunks of about CHUNK_SECONDS)
+        ordered: results in input order, or in chunk completion order
+        max_in_flight: maximum running chunks (default: runner workers)
+
+        Items are pulled lazily from the iterable; stream() yields the
+        results as soon as their chunks are done.
+    '''
+    _history_ = False
+    CHUNK_SECONDS = 0.05  # target running time of an automatic chunk
+    MAX_CHUNK_SIZE = 10000
+
+    def __init__(self, task_cls, iterable, *, chunksize=None, ordered=True,
+                 max_in_flight=None):
+        super().__init__()
+        if chunksize is not None and chunksize < 1:
+            raise ValueError('chunksize must >= 1')
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError('max_in_flight must >= 1')
+
+        self._task_cls = task_cls
+        self._items = iterable
+        self._chunksize = chunksize
+        self._ordered = ordered
+        self._max_in_flight = max_in_flight
+        self._listener = None  # receives (chunk index, results) if streaming
+
+    def stream(self):
+        ''' runs the map and yields the item results as chunks are done
+
+            results are yielded in input order if ordered, otherwise in
+            completion order. They are not collected: the task's result is
+            None. Leaving the iteration early stops the map.
+        '''
+        events = queue.SimpleQueue()
+        self._listener = events.put
+        job_ = self.run(wait=False)
+
+        pending = {}  # out of order chunks
+        expected = 0
+        try:
+            while True:
+                index, results = events.get()
+                if index is None:  # end of map
+                    if results is not None:
+                        raise results
+                    break
+
+                if not self._ordered:
+                    yield from results
+                    continue
+
+                pending[index] = results
+                while expected in pending:
+                    yield from pending.pop(expected)
+                    expected += 1
+        finally:
+            self._listener = None
+            job_.stop()
+
+
+@runtask(ParallelMap)
+class _ParallelMapJob(Job):
+    def __init__(self, task):
+        super().__init__(task)
+
+        self._cv = threading.Condition()
+        self._running = {}  # id(chunk) => job
+        self._results = {}  # chunk index => results
+        self._count = 0  # items done
+        self._cost = None  # measured seconds per item
+        self._error = None
+        self._listener = None  # results are streamed, not collected
+
+    def on_stop(self):
+        with self._cv:
+            self._cv.notify_all()  # wakes up the scheduling loop
+
+    def _chunk_size(self):
+        size = self._task._chunksize
+        if size:
+            return size
+        if self._cost is None:
+            return 1  # no measure yet
+        if self._cost <= 0:
+            return ParallelMap.MAX_CHUNK_SIZE
+        return max(1, min(ParallelMap.MAX_CHUNK_SIZE,
+                          int(ParallelMap.CHUNK_SECONDS / self._cost)))
+
+    def chunk_done_callback(self, chunk):
+        ''' called when a chunk is done '''
+        # pylint: disable=protected-access
+        chunk.remove_done_callback(self.chunk_done_callback)
+        with self._cv:
+            self._running.pop(id(chunk), None)
+            if chunk.aborted:
+                self._stop = True
+            elif chunk.error_code == Task.ErrorCode.ERROR:
+                self._error = chunk.error
+            else:  # success
+                results = chunk.result
+                self._count += len(results)
+
+                cost = (chunk._time_done - chunk._time_started) / \
+                    len(chunk._items)
+                self._cost = cost if self._cost is None else \
+                    (self._cost + cost) / 2
+
+                if self._listener:
+                    self._listener((chunk._index, results))
+                else:
+                    self._results[chunk._index] = results
+
+            self._cv.notify()
+
+    def __call__(self):
+        super().__call__()
+
+        listener = self._listener = self._task._listener
+        try:
+            result = self._map()
+        except Exception as ex:
+            if listener:
+                listener((None, ex))
+            raise
+
+        if listener:
+            listener((None, None))
+        return result
+
+    def _map(self):
+        task = self._task
+        items = iter(task._items)
+        limit = task._max_in_flight or runner.max_workers()
+        try:
+            total = len(task._items)
+        except TypeError:
+            total = None
+        task.progress = 0
+
+        index = 0  # next chunk
+        exhausted = False
+        while True:
+            # pulls new chunks outside of the lock
+            started = []
+            while not exhausted and len(self._running) + len(started) < limit:
+                items_ = list(itertools.islice(items, self._chunk_size()))
+                if items_:
+                    started.append(_MapChunk(task._task_cls, index, items_))
+                    index += 1
+                else:
+                    exhausted = True
+
+            with self._cv:
+                for chunk in started:
+                    chunk.add_done_callback(self.chunk_done_callback)
+                    self._running[id(chunk)] = None
+                    job_ = chunk.run(wait=False)
+                    if id(chunk) in self._running:  # not done in place
+                        self._running[id(chunk)] = job_
+
+                if self._stop or self._error:
+                    for job_ in list(self._running.values()):
+                        if job_:
+                            job_.stop()
+
+                    if self._error:
+                        raise self._error
+
+                    raise JobStopError()
+
+                if total:
+                    task.progress = self._count / total
+
+                if exhausted and not self._running:
+                    break
+
+                if len(self._running) >= limit or exhausted:
+                    self._cv.wait()
+
+        task.progress = 1
+        if self._listener:
+            return None
+
+        ordered = self._results if task._ordered else \
+            dict(enumerate(self._results.values()))
+        return [r for i in range(index) for r in ordered[i]]
+
+
+# ----------- Reduce -------------
+
+def _apply(combine, values):
+    ''' combines values by a function or a task class '''
+    if isinstance(combine, type) and issubclass(combine, Task):
+        return _call_in_place(combine(*values))
+    return combine(*values)
+
+
+class _Combine(Task):
+    ''' combines partial results [lo, hi) of a Reduce '''
+
+    def __init__(self, combine, lo, hi, height, values):
+        # pylint: disable=too-many-arguments
+        super().__init__()
+        self._combine = combine
+        self._lo = lo
+        self._hi = hi
+        self._height = height
+        self._values = values
+
+
+@runtask(_Combine)
+class _CombineJob(Job):
+    ''' runs a combine in a worker thread '''
+
+    def __call__(self):
+        super().__call__()
+
+        # the partial results are not needed any more once combined
+        values, self._task._values = self._task._values, None
+        return _apply(self._task._combine, values)
+
+
+class Reduce(Task):
+    ''' folds the results of tasks by a tree of combines
+
+        task = Reduce(add, tA, tB, tC, tD)
+        task.run()
+
+        assert task.result == add(add(tA.result, tB.result),
+                                  add(tC.result, tD.result))
+
+        Partial results are combined as soon as `arity` of them of the same
+        tree level are available, while the other tasks are still running;
+        combines run in parallel as tasks of their own, so there is no
+        barrier between the tasks and the reduction, and the reduction tree
+        is about log(n) deep. The remaining partial results are combined
+        once all tasks are done.
+
+        combine: function or task class combining 2..arity values, it must
+                 be associative
+        arity: maximum number of values combined at once
+        commutative: any partial results can be combined, otherwise only
+                     the adjacent ones (in task order)
+        initial: leftmost value of the reduction, required if there may be
+                 no task at all
+        max_in_flight: maximum running tasks (default: runner workers)
+
+        As Parallel, a single iterable of tasks is pulled lazily.
+    '''
+    _history_ = False
+
+    def __init__(self, combine, *tasks, arity=2, commutative=False,
+                 initial=_MISSING, max_in_flight=None):
+        # pylint: disable=too-many-arguments
+        super().__init__()
+        if arity < 2:
+            raise ValueError('arity must >= 2')
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError('max_in_flight must >= 1')
+
+        self._combine = combine
+        self._arity = arity
+        self._commutative = commutative
+        self._initial = initial
+        self._max_in_flight = max_in_flight
+
+        if len(tasks) == 1 and not _is_task(tasks[0]):
+            self._source = tasks[0]  # lazy iterable, resolved while running
+        else:
+            self._source = [_resolve_task(i) for i in tasks]
+
+
+class MapReduce(Reduce):
+    ''' maps a task class over inputs and reduces the results
+
+        task = MapReduce(WordCount, files, merge_counts, commutative=True)
+
+        An input item is passed to the task class as ParallelMap does; the
+        tasks are created lazily, at most max_in_flight at a time.
+    '''
+    def __init__(self, task_cls, iterable, combine, **kwargs):
+        super().__init__(combine, (_map_task(task_cls, i) for i in iterable),
+                         **kwargs)
+
+
+@runtask(Reduce)
+class _ReduceJob(Job):
+    def __init__(self, task):
+        super().__init__(task)
+
+        self._cv = threading.Condition()
+        self._events = []  # done tasks and combines
+        self._running = {}  # id(task) => job of tasks and combines
+        self._positions = {}  # id(task) => leaf position of running tasks
+
+        # available partial results
+        self._heights = {}  # commutative: height => [(0, 0, height, value)]
+        self._segments = {}  # lo => (hi, height, value)
+        self._ends = {}  # hi => lo
+
+    def on_stop(self):
+        with self._cv:
+            self._cv.notify_all()  # wakes up the scheduling loop
+
+    def task_done_callback(self, task):
+        ''' called when a task or combine is done '''
+        task.remove_done_callback(self.task_done_callback)
+        with self._cv:
+            self._events.append(task)
+            self._cv.notify()
+
+    def _start(self, task):
+        task.add_done_callback(self.task_done_callback)
+        self._running[id(task)] = None
+        job_ = task.run(wait=False)
+        if task.status != Task.Status.DONE:  # not done in place
+            self._running[id(task)] = job_
+
+    def _combine(self, items):
+        ''' starts a combine of [(lo, hi, height, value)] '''
+        self._start(_Combine(self._task._combine, items[0][0], items[-1][1],
+                             max(i[2] for i in items) + 1,
+                             [i[3] for i in items]))
+
+    def _put(self, lo, hi, height, value):
+        ''' a partial result is available
+
+            arity partial results of the same height are combined at once,
+            like the carry of a counter, which keeps the tree balanced while
+            the partial results come in any order.
+        '''
+        arity = self._task._arity
+        if self._task._commutative:
+            same = self._heights.setdefault(height, [])
+            same.append((0, 0, height, value))
+            if len(same) == arity:
+                del self._heights[height]
+                self._combine(same)
+            return
+
+        self._segments[lo] = (hi, height, value)
+        self._ends[hi] = lo
+
+        # leftmost adjacent segment of the same height
+        start, count = lo, 1
+        while count < arity and start in self._ends and \
+                self._segments[self._ends[start]][1] == height:
+            start = self._ends[start]
+            count += 1
+
+        run = []
+        pos = start
+        while len(run) < arity and pos in self._segments and \
+                self._segments[pos][1] == height:
+            run.append((pos, *self._segments[pos]))
+            pos = self._segments[pos][0]
+
+        if len(run) == arity:
+            for i in run:
+                del self._segments[i[0]]
+                del self._ends[i[1]]
+            self._combine(run)
+
+    def _flush(self):
+        ''' combines the remaining partial results, no more is coming '''
+        arity = self._task._arity
+        if self._task._commutative:
+            rest = sorted((i for same in self._heights.values() for i in same),
+                          key=lambda i: i[2])
+            self._heights = {}
+        else:
+            rest = [(lo, *self._segments[lo]) for lo in sorted(self._segments)]
+            self._segments = {}
+            self._ends = {}
+
+        for i in range(0, len(rest), arity):
+            items = rest[i:i + arity]
+            if len(items) > 1:
+                self._combine(items)
+            else:  # put back
+                self._put(*items[0])
+
+    def _partials(self) -> list:
+        ''' available partial results '''
+        return [i[3] for same in self._heights.values() for i in same] + \
+            [i[2] for i in self._segments.values()]
+
+    def __call__(self):
+        super().__call__()
+
+        # pylint: disable=protected-access
+        task = self._task
+        tasks = iter(task._source)
+        limit = task._max_in_flight or runner.max_workers()
+        try:
+            total = len(task._source)
+        except TypeError:
+            total = None
+        task.progress = 0
+
+        position = 0  # leaf position of next task
+        if task._initial is not _MISSING:
+            self._put(0, 1, 0, task._initial)
+            position = 1
+
+        count = 0  # tasks done
+        exhausted = False
+        while True:
+            # pulls new tasks outside of the lock
+            while not exhausted and len(self._positions) < limit:
+                try:
+                    child = _resolve_task(next(tasks))
+                except StopIteration:
+                    exhausted = True
+                    break
+                self._positions[id(child)] = position
+                position += 1
+                self._start(child)
+
+            with self._cv:
+                if not self._events and not self._stop and \
+                        (self._running or not exhausted):
+                    self._cv.wait()
+                events, self._events = self._events, []
+
+            for done in events:
+                self._running.pop(id(done), None)
+                if done.aborted:
+                    self._stop = True
+                elif done.error_code == Task.ErrorCode.ERROR:
+                    self._abort()
+                    raise done.error
+                elif isinstance(done, _Combine):
+                    self._put(done._lo, done._hi, done._height, done.result)
+                else:
+                    pos = self._positions.pop(id(done))
+                    count += 1
+                    self._put(pos, pos + 1, 0, done.result)
+
+            if self._stop:
+                self._abort()
+                raise JobStopError()
+
+            if total:
+                task.progress = count / total
+
+            if exhausted and not self._running:
+                if len(self._partials()) <= 1:
+                    break
+                self._flush()
+
+        task.progress = 1
+        values = self._partials()
+        if not values:
+            raise ValueError('reduce of no task without initial value')
+        return values[0]
+
+    def _abort(self):
+        for job_ in list(self._running.values()):
+            if job_:
+                job_.stop()
+
+
+# ----------- Pipeline -------------
+
+class Stage:
+    ''' a stage of Pipeline: a task class called for every input item
+
+        workers: number of threads running the stage
+        queue_size: capacity of the input queue of the stage (default: the
+                    pipeline's queue size)
+    '''
+
+    def __init__(self, task_cls, workers=1, queue_size=None):
+        if workers < 1:
+            raise ValueError('workers must >= 1')
+        if queue_size is not None and queue_size < 1:
+            raise ValueError('queue_size must >= 1')
+        self.task_cls = task_cls
+        self.workers = workers
+        self.queue_size = queue_size
+
+
+class _Channel:
+    ''' bounded queue between pipeline stages
+
+        a put / get blocked on a closed channel raises JobStopError at once,
+        so a stopped or failed pipeline does not wait for its stages.
+    '''
+
+    def __init__(self, maxsize):
+        self._items = collections.deque()
+        self._maxsize = maxsize
+        self._closed = False
+        lock = threading.Lock()
+        self._not_empty = threading.Condition(lock)
+        self._not_full = threading.Condition(lock)
+
+    def put(self, item):
+        ''' appends an item, waits while the channel is full '''
+        with self._not_full:
+            while len(self._items) >= self._maxsize and not self._closed:
+                self._not_full.wait()
+            if self._closed:
+                raise JobStopError()
+            self._items.append(item)
+            self._not_empty.notify()
+
+    def get(self):
+        ''' removes the first item, waits while the channel is empty '''
+        with self._not_empty:
+            while not self._items and not self._closed:
+                self._not_empty.wait()
+            if self._closed:
+                raise JobStopError()
+            item = self._items.popleft()
+            self._not_full.notify()
+            return item
+
+    def close(self):
+        ''' wakes up the blocked producers and consumers '''
+        with self._not_full:
+            self._closed = True
+            self._not_full.notify_all()
+            self._not_empty.notify_all()
+
+
+class Pipeline(Task):
+    ''' streams items through stages connected by bounded queues
+
+        task = Pipeline(lines, Stage(Parse, workers=4), Store)
+        task.run()
+
+        The source is an iterable, a task whose result is an iterable, or a
+        generator task. Every stage is a task class (or a Stage) taking an
+        item as its only argument; the items of a generator task (or a
+        generator result) are passed on one by one, so a stage may yield
+        any number of items per input, any other result is a single item.
+
+        All stages run at the same time in their own threads, a full queue
+        blocks its producers, so throughput is set by the slowest stage and
+        memory by the queue sizes. Items keep their order only if every
+        stage has a single worker.
+
+        The result is the list of the items out of the last stage, stream()
+        yields them instead without collecting.
+    '''
+    _history_ = False
+    QUEUE_SIZE = 16
+
+    def __init__(self, source, *stages, queue_size=QUEUE_SIZE):
+        super().__init__()
+        if queue_size < 1:
+            raise ValueError('queue_size must >= 1')
+        self._source = source
+        self._stages = [i if isinstance(i, Stage) else Stage(i)
+                        for i in stages]
+        self._queue_size = queue_size
+        self._output = None  # receives (True, item) / (False, error) if streaming
+
+    def stream(self):
+        ''' runs the pipeline and yields the items out of the last stage
+
+            the items are not collected: the task's result is None. Leaving
+            the iteration early stops the pipeline.
+        '''
+        output = _Channel(self._queue_size)
+        self._output = output
+        job_ = self.run(wait=False)
+        try:
+            while True:
+                ok, item = output.get()
+                if not ok:  # end of pipeline
+                    if item is not None:
+                        raise item
+                    break
+                yield item
+        finally:
+            self._output = None
+            job_.stop()
+
+
+@runtask(Pipeline)
+class _PipelineJob(Job):
+    def __init__(self, task):
+        super().__init__(task)
+
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+        self._error = None
+        self._fed = 0  # items out of the source
+        self._queues = []  # channels between stages
+
+    def on_stop(self):
+        with self._lock:
+            queues = self._queues
+        output = self._task._output
+        for i in [*queues, *([output] if output else [])]:
+            i.close()
+
+    def _fail(self, err):
+        with self._lock:
+            if self._error is None:
+                self._error = err
+            queues = self._queues
+        self._failed.set()
+        for i in queues:  # the output still receives the error
+            i.close()
+
+    def _check(self, failed=True):
+        if self._stop or (failed and self._failed.is_set()):
+            raise JobStopError()
+
+    def _put(self, que, item, failed=True):
+        self._check(failed)
+        que.put(item)
+
+    def _get(self, que):
+        self._check()
+        return que.get()
+
+    def _feed(self, out, consumers):
+        ''' source thread '''
+        try:
+            def feed(item):
+                self._put(out, item)
+                self._fed += 1
+
+            source = self._task._source
+            if _is_task(source):
+                source = _resolve_task(source)
+                if source.streaming:  # items are published while running
+                    source.subscribe(feed)
+                    # items collected as the result are already fed
+                    _call_in_place(source, self)
+                    source = ()
+                else:
+                    source = _call_in_place(source, self)
+            for item in source:
+                feed(item)
+            for _ in range(consumers):
+                self._put(out, _END)
+        except Exception as ex:  # pylint: disable=broad-except
+            self._fail(ex)
+
+    def _work(self, stage, inp, out, left, consumers):
+        ''' stage worker thread
+
+            left: [running workers of the stage], the last one ends the
+            input of the next stage.
+        '''
+        # pylint: disable=too-many-arguments
+        try:
+            while True:
+                item = self._get(inp)
+                if item is _END:
+                    break
+
+                tsk = stage.task_cls(item)
+                if tsk.streaming:  # items are published while running
+                    tsk.subscribe(lambda i: self._put(out, i))
+                    _call_in_place(tsk, self)
+                    continue
+
+                result = _call_in_place(tsk, self)
+                if isinstance(result, types.GeneratorType):
+                    for i in result:
+                        self._put(out, i)
+                else:
+                    self._put(out, result)
+
+            with self._lock:
+                left[0] -= 1
+                last = left[0] == 0
+            if last:
+                for _ in range(consumers):
+                    self._put(out, _END)
+        except Exception as ex:  # pylint: disable=broad-except
+            self._fail(ex)
+
+    def __call__(self):
+        super().__call__()
+
+        output = self._task._output
+        try:
+            result = self._run()
+        except Exception as ex:
+            if output:
+                self._put(output, (False, ex), failed=False)
+            raise
+
+        if output:
+            self._put(output, (False, None), failed=False)
+        return result
+
+    def _run(self):
+        task = self._task
+        stages = task._stages
+        queues = [_Channel(i.queue_size or task._queue_size) for i in stages]
+        queues.append(_Channel(task._queue_size))  # last outputs
+        with self._lock:
+            self._queues = queues
+        consumers = [i.workers for i in stages] + [1]
+
+        threads = [threading.Thread(target=self._feed, daemon=True,
+                                    args=(queues[0], consumers[0]))]
+        for k, stage in enumerate(stages):
+            left = [stage.workers]
+            threads.extend(
+                threading.Thread(target=self._work, daemon=True,
+                                 args=(stage, queues[k], queues[k + 1], left,
+                                       consumers[k + 1]))
+                for _ in range(stage.workers))
+
+        try:
+            total = len(task._source)
+        except TypeError:
+            total = None
+        task.progress = 0
+
+        for thread in threads:
+            thread.start()
+
+        output = task._output
+        results = []
+        try:
+            while True:
+                item = self._get(queues[-1])
+                if item is _END:
+                    break
+                if output:
+                    self._put(output, (True, item))
+                else:
+                    results.append(item)
+                if total:
+                    task.progress = self._fed / total
+        except JobStopError as ex:
+            self._fail(ex)
+
+        for thread in threads:
+            thread.join()
+
+        if self._error:
+            raise self._error
+
+        task.progress = 1
+        return None if output else results
 
 
 # ----------- Serial -------------
 
 class Serial(Task):
-    ''' execute tasks in serial '''
+    ''' execute tasks in serial
+
+        journal: optional checkpoint journal (Journal or file name), tasks
+        recorded as completed in the journal are skipped.
+
+        Progress: the progress of tasks is folded in, weighted by their
+        estimated costs.
+    '''
+    _history_ = False
 
-    def __init__(self, *tasks):
+    def __init__(self, *tasks, journal=None):
         super().__init__()
         self._tasks = _flatten([_resolve_task(i) for i in tasks], Serial)
+        self._journal = resolve_journal(journal)
+
+    def estimated_cost(self):
+        if self._cost_ is not None:
+            return self._cost_
+        return _sum_costs(self._tasks)
 
 
 @runtask(Serial)
@@ -136,27 +1114,42 @@ class _SerialJob(Job):
         super().__call__()
 
         tasks = self._task._tasks
+        journal = self._task._journal
+        done = journal.load() if journal else {}
 
-        total = len(tasks)
-        self._task.progress = 0
+        self._task._fold_in(tasks)
 
         results = []
-        if total > 0:
-            count = 0
-            for i in tasks:
-                i.run(wait=True)
+        try:
+            for count, i in enumerate(tasks, 1):
+                key = task_key(i, count - 1) if journal else None
+                if key in done:
+                    # completed in previous run
+                    i.on_success(journal.decode_result(done[key]))
+                else:
+                    i._parent_job = self  # pylint: disable=protected-access
+                    try:
+                        i.run(wait=True)
+                    finally:
+                        i._parent_job = None  # pylint: disable=protected-access
+
+                    if self._stop or i.aborted:
+                        raise JobStopError()
 
-                if self._stop or i.aborted:
-                    raise JobStopError()
+                    if i.error_code == Task.ErrorCode.ERROR:
+                        raise i.error
 
-                if i.error_code == Task.ErrorCode.ERROR:
-                    raise i.error
+                    if journal:
+                        journal.record(key, i.result)
 
                 # success
                 results.append(i.result)
-                count += 1
-                self._task.progress = count / total
+        finally:
+            self._task._fold_out(tasks)
+            if journal:
+                journal.flush()
 
+        self._task.progress = 1
         return results
 
 
@@ -172,6 +1165,7 @@ class _Unity(Task):
         unity * task = task
         task * unity = task
     '''
+    _history_ = False
 
     def run(self, wait=True):
         ''' do nothing '''
@@ -223,15 +1217,118 @@ Task.__mul__ = _mul_task
 _TaskDep = collections.namedtuple('TaskDep', ['task', 'pre_tasks'])
 
 
+
+class CSRList:
+    ''' read-only list of index lists in compressed sparse row layout
+
+        item i is indices[offsets[i]:offsets[i+1]], offsets and indices can
+        be any integer sequences (list, array, memoryview), so a huge graph
+        needs no python object per edge.
+    '''
+
+    def __init__(self, offsets, indices):
+        self.offsets = offsets
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self.offsets) - 1:
+            raise IndexError('CSRList index out of range')
+        return self.indices[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        offsets, indices = self.offsets, self.indices
+        for i in range(len(offsets) - 1):
+            yield indices[offsets[i]:offsets[i + 1]]
+
+
+def _dependents(pre_tasks, total) -> CSRList:
+    ''' reverse the pre-task lists: item i lists the tasks depending on i '''
+    offsets = array('Q', bytes(8 * (total + 1)))
+    for pres in pre_tasks:
+        for j in pres:
+            offsets[j + 1] += 1
+    for i in range(total):
+        offsets[i + 1] += offsets[i]
+
+    indices = array('I', bytes(4 * offsets[total]))
+    pos = array('Q', offsets)
+    for i, pres in enumerate(pre_tasks):
+        for j in pres:
+            indices[pos[j]] = i
+            pos[j] += 1
+
+    return CSRList(offsets, indices)
+
+
 class Bucket(Task):
-    ''' interelated tasks '''
+    ''' interelated tasks
+
+        journal: optional checkpoint journal (Journal or file name), tasks
+        recorded as completed in the journal are skipped. Tasks cannot be
+        added to the running bucket then, _BucketJob.add raises ValueError.
 
-    def __init__(self):
+        Progress: the progress of tasks is folded in, weighted by their
+        estimated costs.
+    '''
+    _history_ = False
+
+    def __init__(self, journal=None):
         super().__init__()
-        self.task_deps = {}  # id: TaskDep
+        self._task_deps = {}  # id: TaskDep
+        self._frozen = None  # (tasks, pre_tasks) of a bucket from_graph()
+        self._inputs = {}  # id(task) => {field: pre-task}, dataflow edges
+        self._journal = resolve_journal(journal)
+        # tasks of the last run, with the ones added while running (see
+        # _BucketJob.add), until the bucket is modified
+        self._run_tasks = None
+
+    @classmethod
+    def from_graph(cls, tasks, pre_tasks, journal=None):
+        ''' bucket of an index based graph (see graph())
+
+            pre_tasks can be any sequence of index sequences, e.g. CSRList,
+            the graph is used as is until the bucket is modified.
+        '''
+        bkt = cls(journal=journal)
+        bkt._frozen = (tasks, pre_tasks)
+        return bkt
+
+    @property
+    def task_deps(self):
+        ''' id(task) => TaskDep(task, pre_tasks) '''
+        if self._frozen is not None:
+            tasks, pre_tasks = self._frozen
+            self._frozen = None
+            self._task_deps = {
+                id(t): _TaskDep(t, [tasks[j] for j in pres])
+                for t, pres in zip(tasks, pre_tasks)}
+        return self._task_deps
+
+    @task_deps.setter
+    def task_deps(self, val):
+        self._frozen = None
+        self._task_deps = val
+
+    def add(self, tsk: Task, pre_tasks: list = None, inputs: dict = None):
+        ''' adds a task with pre-tasks
+
+            inputs: dataflow edges {field: pre_task}, the task's field is set
+            to the result of the pre-task before the task runs. The result of
+            such a pre-task is an intermediate: it is released as soon as its
+            last consumer has started, and the consumer's field is reset
+            when the consumer is done.
+        '''
+        self._run_tasks = None
+        if inputs:
+            pre_tasks = list(pre_tasks or [])
+            for i in inputs.values():
+                if i not in pre_tasks:
+                    pre_tasks.append(i)
+            self._inputs.setdefault(id(tsk), {}).update(inputs)
 
-    def add(self, tsk: Task, pre_tasks: list = None):
-        ''' adds a task with pre-tasks '''
         if pre_tasks:
             for i in pre_tasks:
                 task_id = id(i)
@@ -248,7 +1345,7 @@ class Bucket(Task):
             if tdp.pre_tasks == []:
                 # previously defined as task dependency
                 if pre_tasks:
-                    tdp.pre_tasks.append(*pre_tasks)
+                    tdp.pre_tasks.extend(pre_tasks)
             else:
                 if tdp.pre_tasks != pre_tasks:
                     raise ValueError(f'"{type(tsk).__name__}"'
@@ -257,31 +1354,23 @@ class Bucket(Task):
 
     def find_loop(self):
         ''' check loopback, return True if loopback is found '''
+        tasks, pre_tasks = self.graph()
 
-        checked = []  # no loop
-
-        class LoopError(Exception):
-            ''' loopback error '''
-
-        def search(tdp, path):
-            if tdp.pre_tasks:
-                if tdp.task in path:
-                    raise LoopError()
-
-                path.append(tdp.task)
+        # Kahn's algorithm, tasks in a loop never get ready.
+        pending = array('I', [len(i) for i in pre_tasks])
+        nexts = _dependents(pre_tasks, len(tasks))
 
-                for tsk in tdp.pre_tasks:
-                    if tsk not in checked:
-                        search(self.task_deps[id(tsk)], path + [tsk])
-            checked.append(tdp.task)
+        ready = [i for i, n in enumerate(pending) if n == 0]
+        visited = 0
+        while ready:
+            i = ready.pop()
+            visited += 1
+            for j in nexts[i]:
+                pending[j] -= 1
+                if pending[j] == 0:
+                    ready.append(j)
 
-        try:
-            for tdp in self.task_deps.values():
-                if tdp.task not in checked:
-                    search(tdp, [])
-            return False
-        except LoopError:
-            return True
+        return visited != len(tasks)
 
     def find_leaf_tasks(self):
         ''' get tasks without any pre-tasks '''
@@ -289,6 +1378,7 @@ class Bucket(Task):
 
     def remove_tasks(self, tasks):
         ''' remove tasks from bucket '''
+        self._run_tasks = None
         for tsk in tasks:
             del self.task_deps[id(tsk)]
 
@@ -305,6 +1395,8 @@ class Bucket(Task):
     def clear(self):
         ''' remove all tasks '''
         self.task_deps = {}
+        self._inputs = {}
+        self._run_tasks = None
 
     def run(self, wait=True):
         ''' run the tasks in this bucket '''
@@ -316,13 +1408,48 @@ class Bucket(Task):
     @property
     def total(self):
         ''' total tasks in bucket '''
+        if self._frozen is not None:
+            return len(self._frozen[0])
         return len(self.task_deps)
 
+    def graph(self):
+        ''' index based snapshot of the bucket
+
+            returns (tasks, pre_tasks), pre_tasks[i] is the list of indices
+            (into tasks) of the pre-tasks of tasks[i].
+        '''
+        if self._frozen is not None:
+            return self._frozen
+
+        tasks = [tdp.task for tdp in self.task_deps.values()]
+        index = {id(t): i for i, t in enumerate(tasks)}
+        pre_tasks = [[index[id(t)] for t in tdp.pre_tasks]
+                     for tdp in self.task_deps.values()]
+        return tasks, pre_tasks
+
+    def estimated_cost(self):
+        if self._cost_ is not None:
+            return self._cost_
+        if self._frozen is not None:
+            return _sum_costs(self._frozen[0])
+        return _sum_costs([tdp.task for tdp in self.task_deps.values()])
+
 
 @runtask(Bucket)
 class _BucketJob(Job):
-    ''' job executing tasks in a bucket '''
-    MAX_WAIT_SECONDS = 1
+    ''' job executing tasks in a bucket
+
+        the bucket itself is left untouched, the job keeps its own count of
+        unfinished pre-tasks for each task, so the bucket can be inspected
+        (or run again) after the job is done.
+
+        A running task can add new tasks to the run via its job's parent:
+
+            @task
+            def scan(folder, _job_):
+                for fname in os.listdir(folder):
+                    _job_.parent.add(Process(fname), [_job_.task])
+    '''
 
     def __init__(self, task: Bucket):
         super().__init__(task)
@@ -330,14 +1457,71 @@ class _BucketJob(Job):
         self._cv = threading.Condition()
         self._stop = False
 
-        self._total = self._task.total  # total tasks in bucket
+        tasks, pre_tasks = self._task.graph()
+        self._tasks = self._task._run_tasks = list(tasks)
+        self._index = {id(t): i for i, t in enumerate(tasks)}
+        self._journal = self._task._journal
         self._count = 0  # total successful tasks
+
+        # tasks completed in previous run, a pre-task whose result is an
+        # input of others runs again if its result was not saved
+        completed = bytearray(len(tasks))
+        done = self._journal.load() if self._journal else None
+        if done:
+            producers = {id(i) for inputs in self._task._inputs.values()
+                         for i in inputs.values()}
+            for i, tsk in enumerate(tasks):
+                key = task_key(tsk, i)
+                if key in done and (done[key] is not None or
+                                    id(tsk) not in producers):
+                    tsk.on_success(self._journal.decode_result(done[key]))
+                    completed[i] = 1
+                    self._count += 1
+
+        # unfinished pre-tasks
+        self._pending = array('I', [len(i) for i in pre_tasks])
+        self._next = _dependents(pre_tasks, len(tasks))  # dependent tasks
+        if done:
+            for i, nexts in enumerate(self._next):
+                if completed[i]:
+                    for j in nexts:
+                        self._pending[j] -= 1
+        self._ready = [i for i, n in enumerate(self._pending)
+                       if n == 0 and not completed[i]]
+
+        self._done = completed  # successful tasks
+        self._added_next = {}  # dependent tasks added while running
+
+        # dataflow: task => [(field, pre-task)], consumers left of pre-tasks
+        self._inputs = {}
+        self._consumers = {}
+        self._injected = {}  # started task => [(field, original value)]
+        for task_id, inputs in self._task._inputs.items():
+            index = self._index[task_id]
+            if not completed[index]:  # a completed task takes no inputs
+                self._add_inputs(index, inputs)
+        if done:
+            for task_id, inputs in self._task._inputs.items():
+                for i in inputs.values():
+                    index = self._index[id(i)]
+                    if completed[index] and index not in self._consumers:
+                        # no consumer left, releases the restored result
+                        self._consumers[index] = 0
+                        i._result = None  # pylint: disable=protected-access
+
+        self._total = len(tasks)  # total tasks in bucket
         self._jobs = {}  # running jobs, task_id => submitted job
 
         self._error_task = None  # task done with error (first one)
 
+    def on_stop(self):
+        with self._cv:
+            self._cv.notify_all()  # wakes up the scheduling loop
+
     def task_done_callback(self, task):  # pylint: disable=unused-argument
         ''' called when task is done '''
+        task.remove_done_callback(self.task_done_callback)
+        task._parent_job = None  # pylint: disable=protected-access
         with self._cv:
             try:
                 del self._jobs[id(task)]
@@ -345,32 +1529,154 @@ class _BucketJob(Job):
                 pass
 
             if task.error_code == Task.ErrorCode.SUCCESS:
-                self._task.decimate_pre_task(task)
+                index = self._index[id(task)]
+                if index in self._injected:
+                    self._restore(index)
+                if self._journal:  # keyed by fields without inputs
+                    self._journal.record(task_key(task, index), task.result,
+                                         save_result=index in self._consumers)
+                self._done[index] = 1
+                if index < len(self._next):
+                    self._release(self._next[index])
+                if index in self._added_next:
+                    self._release(self._added_next.pop(index))
                 self._count += 1
+                self._task._notify_child_done(task)
             elif task.aborted:
                 self._stop = True
             else:  # on error
+                index = self._index[id(task)]
+                if index in self._injected:
+                    self._restore(index)
                 if self._error_task is None:  # first exception only
                     self._error_task = task
 
             self._cv.notify()
 
+    def _add_inputs(self, index, inputs):
+        flows = [(field, self._index[id(i)]) for field, i in inputs.items()]
+        self._inputs[index] = flows
+        for _, i in flows:
+            self._consumers[i] = self._consumers.get(i, 0) + 1
+
+    def _inject(self, index):
+        ''' sets input fields of a task to results of its pre-tasks '''
+        # pylint: disable=protected-access
+        tsk = self._tasks[index]
+        injected = []
+        for field, i in self._inputs[index]:
+            injected.append((field, tsk.__dict__.get(field, _MISSING)))
+            setattr(tsk, field, self._tasks[i]._result)
+
+            self._consumers[i] -= 1
+            if self._consumers[i] == 0:
+                # last consumer started, releases the intermediate result
+                self._tasks[i]._result = None
+        self._injected[index] = injected
+
+    def _restore(self, index):
+        ''' drops injected inputs of a finished task '''
+        tsk = self._tasks[index]
+        for field, val in self._injected.pop(index):
+            if val is _MISSING:
+                delattr(tsk, field)
+            else:
+                setattr(tsk, field, val)
+
+    def _release(self, nexts):
+        ''' a pre-task of the tasks is done '''
+        for i in nexts:
+            self._pending[i] -= 1
+            if self._pending[i] == 0:
+                self._ready.append(i)
+
+    def add(self, tsk: Task, pre_tasks: list = None, inputs: dict = None):
+        ''' adds a new task to the running bucket (thread-safe)
+
+            pre_tasks must be tasks of this run, the new task is scheduled as
+            soon as they are all done; inputs are dataflow edges as in
+            Bucket.add(), a pre-task whose last consumer already started
+            has released its result and cannot be an input any more.
+            The bucket itself is not changed, the task belongs to this run
+            only.
+
+            A task nested in a composite of the bucket (e.g. a Serial)
+            reaches this job by Job.bucket, Job.parent is the composite's.
+
+            raises ValueError if the bucket has a journal: the task adding
+            others would be skipped when resumed, and so would the tasks it
+            adds.
+        '''
+        if self._journal:
+            raise ValueError('tasks cannot be added to a running bucket with'
+                             ' a journal')
+        if inputs:
+            pre_tasks = list(pre_tasks or [])
+            pre_tasks.extend(i for i in inputs.values() if i not in pre_tasks)
+
+        with self._cv:
+            if id(tsk) in self._index:
+                raise ValueError(f'"{type(tsk).__name__}" task already added')
+
+            pres = []
+            for i in pre_tasks or []:
+                try:
+                    pres.append(self._index[id(i)])
+                except KeyError:
+                    raise ValueError(f'"{type(i).__name__}" pre-task is not'
+                                     ' in the bucket') from None
+
+            for i in (inputs or {}).values():
+                if self._consumers.get(self._index[id(i)]) == 0:
+                    raise ValueError(f'"{type(i).__name__}" result is'
+                                     ' already released')
+
+            index = len(self._tasks)
+            self._tasks.append(tsk)
+            self._index[id(tsk)] = index
+            self._done.append(0)
+
+            pending = 0
+            for j in set(pres):
+                if not self._done[j]:
+                    self._added_next.setdefault(j, []).append(index)
+                    pending += 1
+            self._pending.append(pending)
+            if inputs:
+                self._add_inputs(index, inputs)
+            if pending == 0:
+                self._ready.append(index)
+
+            self._total += 1
+            self._task._fold_in([tsk])
+            self._cv.notify()
+
     def __call__(self):
         super().__call__()
 
-        bkt = self._task
+        self._task._fold_in(self._tasks)
+        for tsk, done in zip(self._tasks, self._done):
+            if done:  # completed in previous run
+                tsk.progress = 1
 
-        while True:
-            with self._cv:
+        try:
+            self._schedule()
+        finally:
+            self._task._fold_out(self._tasks)
+            if self._journal:
+                self._journal.flush()
 
-                self._task.progress = self._count / self._total
+        self._task.progress = 1
 
+    def _schedule(self):
+        while True:
+            with self._cv:
                 if self._total == self._count:  # empty, done.
                     break
 
                 if self._stop or self._error_task:
                     # a task ends abnormally, exiting the bucket execution
-                    for i in self._jobs:
+                    for i in list(self._jobs.values()):
                         i.stop()
 
                     # ?? should we wait for the ending of all running jobs
@@ -382,26 +1688,177 @@ class _BucketJob(Job):
                     # this job is stopped.
                     raise JobStopError()
 
-                tasks = bkt.find_leaf_tasks()
-                if tasks:
-                    bkt.remove_tasks(tasks)
-                    for i in tasks:
-                        i.add_done_callback(self.task_done_callback)
-                        self._jobs[id(i)] = i.run(wait=False)  # job
+                ready, self._ready = self._ready, []
+                for i in ready:
+                    if i in self._inputs:
+                        self._inject(i)
+                    tsk = self._tasks[i]
+                    tsk._parent_job = self  # pylint: disable=protected-access
+                    tsk.add_done_callback(self.task_done_callback)
+                    job_ = tsk.run(wait=False)
+                    if tsk.status != Task.Status.DONE:  # not done in place
+                        self._jobs[id(tsk)] = job_
+
+                if not self._ready:
+                    self._cv.wait()
+
+
+# ----------- as_completed -----------
+
+class _Completions:
+    ''' completed children of a running (or done) Parallel / Bucket
+
+        Children completing from now on are fed to put() by the composite job,
+        those completed before are replayed from the composite's children.
+    '''
+    def __init__(self, tsk, put):
+        if isinstance(tsk, Bucket):
+            self._children = tsk.graph()[0]
+        elif isinstance(tsk, Parallel):
+            # a lazy parallel keeps its children only if keep_tasks
+            self._children = tsk._tasks  # pylint: disable=protected-access
+        else:
+            raise ValueError(f"as_completed() does not support task type "
+                             f"({type(tsk).__name__})")
+
+        self._task = tsk
+        self._put = put
+        self._seen = set()
+
+        tsk._add_child_listener(put)  # pylint: disable=protected-access
+        tsk.add_done_callback(self._on_done)
+
+        self._started = tsk.status == Task.Status.INIT
+        if self._started:
+            tsk.run(wait=False)
+
+    def _on_done(self, _):
+        self._put(_END)
+
+    def close(self):
+        ''' stops listening to the composite '''
+        self._task._remove_child_listener(self._put)  # pylint: disable=protected-access
+        self._task.remove_done_callback(self._on_done)
+
+    @property
+    def done(self):
+        ''' the composite is done, no more completion events '''
+        return self._task.status == Task.Status.DONE
+
+    def accept(self, child) -> bool:
+        ''' first time seeing a completed child '''
+        if id(child) in self._seen:
+            return False
+        self._seen.add(id(child))
+        return True
+
+    def replay(self) -> list:
+        ''' children completed in this run and not seen yet '''
+        if self._started:
+            return []  # all events are listened
+
+        # pylint: disable=protected-access
+        since = self._task._time_submitted
+        return [i for i in self._children
+                if i.status == Task.Status.DONE and
+                i.error_code == Task.ErrorCode.SUCCESS and
+                i._time_done is not None and since is not None and
+                i._time_done >= since and self.accept(i)]
+
+    def check(self):
+        ''' raises the error of the composite if failed '''
+        tsk = self._task
+        if tsk.error_code == Task.ErrorCode.CANCELLED:
+            raise JobStopError()
+        if tsk.error_code != Task.ErrorCode.SUCCESS:
+            raise tsk.error
+
+
+def as_completed(tsk):
+    ''' iterates (task, result) of children of a Parallel or Bucket as they
+        complete successfully.
+
+        The composite is started if not yet; if it is already running (e.g.
+        in other thread), the children completed so far are yielded first.
+        The iterator ends when the composite is done and raises its error if
+        it failed. A lazy Parallel (children from an iterable) does not keep
+        its children unless keep_tasks, those completed before iterating are
+        not replayed.
+
+            for child, result in as_completed(bkt):
+                ...
+    '''
+    events = queue.SimpleQueue()
+    completions = _Completions(tsk, events.put)
+    try:
+        for child in completions.replay():
+            yield child, child.result
+
+        if not completions.done:
+            while True:
+                child = events.get()
+                if child is _END:
+                    break
+                if completions.accept(child):
+                    yield child, child.result
+
+        # completed but not seen when the composite was done
+        for child in completions.replay():
+            yield child, child.result
+        completions.check()
+    finally:
+        completions.close()
+
+
+async def as_completed_async(tsk):
+    ''' asynchronous version of as_completed()
+
+            async for child, result in as_completed_async(bkt):
+                ...
+    '''
+    import asyncio  # pylint: disable=import-outside-toplevel
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def put(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    completions = _Completions(tsk, put)
+    try:
+        for child in completions.replay():
+            yield child, child.result
+
+        if not completions.done:
+            while True:
+                child = await events.get()
+                if child is _END:
+                    break
+                if completions.accept(child):
+                    yield child, child.result
 
-                self._cv.wait(_BucketJob.MAX_WAIT_SECONDS)
+        for child in completions.replay():
+            yield child, child.result
+        completions.check()
+    finally:
+        completions.close()
 
 
 # -------------- Control Flow --------------
 
 class do(Task): # pylint: disable=invalid-name
     ''' do then catch '''
+    _history_ = False
 
     def __init__(self, task_cond):
         super().__init__()
         self._then = [_resolve_task(task_cond)]
         self._catch = None
 
+    def estimated_cost(self):
+        if self._cost_ is not None:
+            return self._cost_
+        return _sum_costs(self._then)
+
     def then(self, task_then):
         ''' run the task if all preceding tasks are done successfully '''
         self._then.append(_resolve_task(task_then))
@@ -415,13 +1872,14 @@ class do(Task): # pylint: disable=invalid-name
 
 @runtask(do)
 class _JobDo(Job):
-    MAX_WAIT_SECONDS = 1
-
     def __init__(self, task):
         super().__init__(task)
 
         self._event = threading.Event()
 
+    def on_stop(self):
+        self._event.set()  # wake up
+
     def _on_tasks_done(self, _):
         ''' called when the then tasks are done '''
         self._event.set()  # wake up
@@ -463,7 +1921,7 @@ class _JobDo(Job):
 
                 return handler.error
 
-            self._event.wait(_JobDo.MAX_WAIT_SECONDS)
+            self._event.wait()
 
 # ---------- safe_run ---------
 class TryRun(Task):
@@ -476,6 +1934,7 @@ class TryRun(Task):
                       0: no sleep
         returns task result on success, otherwise error of last run is raised.
     '''
+    _history_ = False
     def __init__(self, tsk, *, max_tries=3, sleep_seconds=1):
         super().__init__()
         self._task = _resolve_task(tsk)
@@ -488,6 +1947,11 @@ class TryRun(Task):
             raise ValueError('sleep_seconds must >=0')
         self._sleep_seconds = sleep_seconds
 
+    def estimated_cost(self):
+        if self._cost_ is not None:
+            return self._cost_
+        return self._task.estimated_cost()
+
 @runtask(TryRun)
 class _TryRunJob(Job):
     def __call__(self):
@@ -520,14 +1984,38 @@ class FIFO(Task):
 
         FIFO is different from Serial in that it will not not terminate
         until stopped.
+
+        workers: number of tasks running at the same time
+        key: optional function of task, tasks of the same key run one by
+             one in the order they are added
+
+        fifo = FIFO(100, workers=8, key=lambda t: t.account)
+        fifo.run(wait=False)
+        fifo.add_many(transfers)
+        print(fifo.stats())
     '''
+    _history_ = False
 
     MAX_WAIT_SECONDS = 1
 
-    def __init__(self, max_queue_size=10, max_wait_seconds=MAX_WAIT_SECONDS):
+    def __init__(self, max_queue_size=10, max_wait_seconds=MAX_WAIT_SECONDS,
+                 *, workers=1, key=None):
         super().__init__()
-        self._tasks = queue.Queue(maxsize=max_queue_size)
+        if workers < 1:
+            raise ValueError('workers must >= 1')
+
+        self._queue = collections.deque()
+        self._cv = threading.Condition()
+        self._max_queue_size = max_queue_size  # <= 0: unlimited
         self._max_wait_seconds = max_wait_seconds
+        self._workers = workers
+        self._key = key
+
+        # statistics, updated by the job
+        self._running = {}  # id(task) => (task, key)
+        self._parked = 0  # tasks waiting for the previous one of same key
+        self._processed = 0
+        self._busy_seconds = 0
 
     def check_status(self):
         ''' make sure the FIFO is still working properly '''
@@ -538,12 +2026,33 @@ class FIFO(Task):
 
     def add(self, tsk: Task)->bool:
         ''' adds a task to the queue '''
-        try:
-            self.check_status()
-            self._tasks.put(tsk, block=True, timeout=self._max_wait_seconds)
-            return True
-        except queue.Full:
-            return False
+        return self.add_many([tsk]) == 1
+
+    def add_many(self, tasks) -> int:
+        ''' adds tasks to the queue in order
+
+            waits at most max_wait_seconds for room in the queue, returns
+            the number of tasks added.
+        '''
+        self.check_status()
+        tasks = list(tasks)
+        count = 0
+        deadline = time.monotonic() + self._max_wait_seconds
+        with self._cv:
+            while count < len(tasks):
+                room = len(tasks) - count if self._max_queue_size <= 0 else \
+                    self._max_queue_size - len(self._queue)
+                if room > 0:
+                    self._queue.extend(tasks[count:count + room])
+                    count += min(room, len(tasks) - count)
+                    self._cv.notify_all()
+                    continue
+
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                self._cv.wait(timeout)
+        return count
 
     def get(self)->Task:
         ''' try retrieving a task.
@@ -551,24 +2060,130 @@ class FIFO(Task):
             return a task if within a maximum period (1 second), or None
             if no task available during this time period.
         '''
-        try:
-            self.check_status()
-            return self._tasks.get(block=True, timeout=self._max_wait_seconds)
-        except queue.Empty:
-            return None
+        self.check_status()
+        with self._cv:
+            if not self._queue:
+                self._cv.wait_for(lambda: self._queue, self._max_wait_seconds)
+            if not self._queue:
+                return None
+            tsk = self._queue.popleft()
+            self._cv.notify_all()
+            return tsk
+
+    @property
+    def depth(self) -> int:
+        ''' tasks waiting to run '''
+        return len(self._queue) + self._parked
+
+    @property
+    def utilisation(self) -> float:
+        ''' busy time of workers / time of workers since the FIFO is running '''
+        if self._time_started is None:
+            return 0
+        now = time.perf_counter()
+        end = self._time_done or now
+        busy = self._busy_seconds + sum(
+            now - (t._time_started or now)  # pylint: disable=protected-access
+            for t, _ in list(self._running.values()))
+        elapsed = (end - self._time_started) * self._workers
+        return min(1, busy / elapsed) if elapsed > 0 else 0
+
+    def stats(self) -> dict:
+        ''' queue and worker statistics '''
+        return {'depth': self.depth, 'running': len(self._running),
+                'workers': self._workers, 'processed': self._processed,
+                'utilisation': self.utilisation}
+
 
 @runtask(FIFO)
 class _FIFOJob(Job):
+    def __init__(self, task):
+        super().__init__(task)
+
+        # shares the condition of the FIFO, wakes up on new tasks, done
+        # tasks and stop.
+        self._cv = task._cv
+        self._jobs = {}  # id(task) => job
+        self._parked = {}  # key => tasks waiting for the running one
+        self._error = None
+
+    def on_stop(self):
+        with self._cv:
+            self._cv.notify_all()  # wakes up the scheduling loop
+
+    def task_done_callback(self, tsk):
+        ''' called when a task is done '''
+        # pylint: disable=protected-access
+        tsk.remove_done_callback(self.task_done_callback)
+        fifo = self._task
+        with self._cv:
+            self._jobs.pop(id(tsk), None)
+            _, key = fifo._running.pop(id(tsk), (None, None))
+            fifo._processed += 1
+            if tsk._time_started is not None:
+                fifo._busy_seconds += tsk._time_done - tsk._time_started
+
+            if tsk.error_code != Task.ErrorCode.SUCCESS:
+                if self._error is None:
+                    self._error = tsk.error or JobStopError()
+            elif key is not None:
+                waiting = self._parked.get(key)
+                if waiting:
+                    fifo._parked -= 1
+                    self._start(waiting.popleft(), key)
+                else:
+                    self._parked.pop(key, None)
+
+            self._cv.notify_all()
+
+    def _start(self, tsk, key):
+        # pylint: disable=protected-access
+        self._task._running[id(tsk)] = (tsk, key)
+        tsk.add_done_callback(self.task_done_callback)
+        job_ = tsk.run(wait=False)
+        if id(tsk) in self._task._running:  # not done in place
+            self._jobs[id(tsk)] = job_
+
+    def _dispatch(self, tsk):
+        # pylint: disable=protected-access
+        fifo = self._task
+        key = fifo._key(tsk) if fifo._key else None
+        with self._cv:
+            if key is not None:
+                if key in self._parked:  # a task of the key is running
+                    self._parked[key].append(tsk)
+                    fifo._parked += 1
+                    return
+                self._parked[key] = collections.deque()
+            self._start(tsk, key)
+
+    def _stop_running(self, _=None):
+        with self._cv:
+            jobs = list(self._jobs.values())
+        for job_ in jobs:
+            job_.stop()
+
+    def _check_error(self):
+        if self._error is not None:
+            self._stop_running()
+            raise self._error
+
     def __call__(self):
         super().__call__()
 
         task = self._task
-
+        limit = max(task._max_queue_size, 1)  # maximum parked tasks
         while True:
-            self.check_stop()
-
-            tsk = task.get()
-            if tsk:
-                tsk.run(wait=True)
-                if tsk.error_code != Task.ErrorCode.SUCCESS:
-                    raise tsk.error
+            with self._cv:
+                # waits for a free worker and a task
+                while self._error is None and not self._stop and \
+                        (len(task._running) >= task._workers or
+                         task._parked >= limit or not task._queue):
+                    self._cv.wait()
+
+                self.check_stop(self._stop_running)
+                self._check_error()
+
+                tsk = task._queue.popleft()
+                self._cv.notify_all()  # room for adding tasks
+                self._dispatch(tsk)
@@ -4,7 +4,7 @@ import inspect
 from py_json_serialize import json_serialize
 
 from .task import Task, TaskMan
-from .job import Job, CallableTaskJob, JOB_PARAM
+from .job import Job, BatchJob, CallableTaskJob, JOB_PARAM
 
 
 class Empty:  # pylint: disable=too-few-public-methods
@@ -70,7 +70,47 @@ def _task_class(cls_task, public):
     return Wraptask
 
 
-def _task_func(func, public):
+class _Drain:
+    ''' publishes the items of a generator task, one by one '''
+
+    def __init__(self, tsk, job_, total, collect):
+        self._task = tsk
+        self._job = job_
+        self._total = total
+        self._count = 0
+        self.collected = [] if collect else None
+
+    def add(self, item):
+        ''' publishes an item, collects it if asked '''
+        if self._job is not None:
+            self._job.check_stop()
+        self._task.publish(item)
+        self._count += 1
+        if self._total:
+            self._task.progress = min(1, self._count / self._total)
+        if self.collected is not None:
+            self.collected.append(item)
+
+
+def _drain(tsk, items, job_, total, collect):
+    ''' publishes the items of a generator task, returns the collected ones '''
+    drain = _Drain(tsk, job_, total, collect)
+    for item in items:
+        drain.add(item)
+    tsk.progress = 1
+    return drain.collected
+
+
+async def _adrain(tsk, items, job_, total, collect):
+    ''' _drain() of an async generator task '''
+    drain = _Drain(tsk, job_, total, collect)
+    async for item in items:
+        drain.add(item)
+    tsk.progress = 1
+    return drain.collected
+
+
+def _task_func(func, public, batch=None, stream=None):
     ''' @task decorating function
 
         the function is turned into a task class:
@@ -96,6 +136,18 @@ def _task_func(func, public):
         f = A(a=1, b=2) # f.a=1 f.b=2
 
         f.run()
+
+        batch: (max_batch_size, max_linger_seconds) of a batch task, see
+        BatchJob. The function is called with a list of values for each
+        parameter, one per task, and returns the list of results.
+
+        A generator (or async generator) function streams its items: each
+        item is published as a partial result to the subscribers of the
+        task (see Task.subscribe, Task.stream), Task.streaming is set.
+        stream: (total, collect) of a generator function, total is the
+        number of items expected, or a function of the task returning it,
+        for progress; if collect, the result is the list of items,
+        otherwise None.
     '''
 
     params = inspect.signature(func).parameters
@@ -138,20 +190,64 @@ def _task_func(func, public):
 
         fields = {**fields, name: val}
 
-    def direct_call(self, *, _job_=None):
-        ''' Execute the task in current thread '''
+    is_gen = inspect.isgeneratorfunction(func)
+    is_async_gen = inspect.isasyncgenfunction(func)
+    if stream is not None and not (is_gen or is_async_gen):
+        raise ValueError(f"task '{task_name}' is not a generator function")
+    total, collect = stream or (None, False)
+
+    def call_func(self, _job_):
         orig_params = {x: self.__getattribute__(x) for x in param_names}
         if has_job_param:
             return func.__call__(**{JOB_PARAM: _job_, **orig_params})
         return func.__call__(**orig_params)
 
+    if batch is None and (is_gen or is_async_gen):
+        def direct_call(self, *, _job_=None):
+            ''' Execute the task in current thread, publishing its items '''
+            expected = total(self) if callable(total) else total
+            items = call_func(self, _job_)
+            if is_gen:
+                return _drain(self, items, _job_, expected, collect)
+            # asyncio is slow to import, only async generators need it
+            import asyncio  # pylint: disable=import-outside-toplevel
+            return asyncio.run(_adrain(self, items, _job_, expected, collect))
+    elif batch is None:
+        def direct_call(self, *, _job_=None):
+            ''' Execute the task in current thread '''
+            return call_func(self, _job_)
+    else:
+        if has_job_param:
+            raise ValueError(f"batch task '{task_name}' cannot have "
+                             f"'{JOB_PARAM}' parameter")
+
+        def invoke(tasks):
+            return func(**{x: [t.__getattribute__(x) for t in tasks]
+                           for x in param_names})
+
+        def direct_call(self, *, _job_=None):
+            ''' Execute the task in current thread, as a batch of one '''
+            result = invoke([self])[0]
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
     wrap_task = type(task_name, (Task,), {
-        **fields, **{'__init__': init, 'call': direct_call, '__doc__': func.__doc__}})
+        **fields, **{'__init__': init, 'call': direct_call, '__doc__': func.__doc__,
+                     '_streaming_': is_gen or is_async_gen}})
 
     if public:
         # pylint: disable= no-member
         TaskMan.instance().register(json_serialize(wrap_task))
 
+    if batch is not None:
+        class WrapBatchJob(BatchJob):
+            ''' wrapper job to run the task in batches '''
+
+        WrapBatchJob.setup(invoke, *batch)
+        wrap_task.set_job_class(WrapBatchJob)
+        return wrap_task
+
     class WrapJob(Job):
         ''' wrapper job to run the task'''
 
@@ -177,7 +273,10 @@ def _private_task(cls_or_func):
     return _task_func(cls_or_func, False)
 
 
-def task(public=True):
+def task(public=True, *, batch=False,
+         max_batch_size=BatchJob.MAX_BATCH_SIZE,
+         max_linger_seconds=BatchJob.MAX_LINGER_SECONDS,
+         total=None, collect=False):
     '''
     # public tasks
     @task
@@ -198,11 +297,34 @@ def task(public=True):
 
     @task(False)
     class PrivateHello(object):pass
+
+    # batch task, pending calls are coalesced (see BatchJob)
+    @task(batch=True, max_batch_size=100)
+    def Lookup(key):
+        return [db[k] for k in key]
+
+    # generator task streaming its rows, result is the list of rows
+    @task(total=lambda t: t.count, collect=True)
+    def Query(sql, count):
+        yield from db.execute(sql)
     '''
 
     if isinstance(public, type) or type(public).__name__ == 'function':
         return _public_task(public)
 
+    options = {}
+    if batch:
+        options['batch'] = (max_batch_size, max_linger_seconds)
+    if total is not None or collect:
+        options['stream'] = (total, collect)
+
+    if options:
+        def task_with_options(func):
+            if isinstance(func, type):
+                raise ValueError('options are only for task function')
+            return _task_func(func, public, **options)
+        return task_with_options
+
     return _public_task if public else _private_task
 
 
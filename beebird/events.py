@@ -0,0 +1,163 @@
+''' Progress and status event bus
+
+    Tasks report their progress and status changes to the bus, subscribers
+    receive them coalesced, at most max_rate times per second:
+
+        def on_updates(updates):
+            for tsk, status, progress in updates:
+                ...
+
+        sub = ProgressBus.instance().subscribe(on_updates, max_rate=10)
+        ...
+        ProgressBus.instance().unsubscribe(sub)
+
+    Reporting is cheap: a task only marks itself changed the first time its
+    progress or status changes after a delivery, the values are read when
+    they are delivered, so a hot loop can set task.progress millions of
+    times. Nothing is recorded at all while there is no subscriber.
+
+    Subscribers are called in the dispatcher thread of the bus, each gets the
+    latest state of the tasks changed since its last delivery.
+'''
+
+import collections
+import os
+import threading
+import time
+
+from py_singleton import singleton
+
+# the bus has subscribers, tasks report changes only if set
+ACTIVE = False
+
+Update = collections.namedtuple('Update', ['task', 'status', 'progress'])
+
+
+class _Subscription:  # pylint: disable=too-few-public-methods
+    ''' a subscriber of the bus '''
+
+    def __init__(self, callback, max_rate, tasks):
+        self.callback = callback
+        self.interval = 1 / max_rate
+        self.tasks = None if tasks is None else {id(i) for i in tasks}
+        self.pending = {}  # id(task) => task changed since last delivery
+        self.due = 0  # time of next delivery
+
+
+@singleton
+class ProgressBus:
+    ''' publish / subscribe channel of task progress and status '''
+
+    MAX_RATE = 10  # default deliveries per second
+
+    def __init__(self):
+        self._cv = threading.Condition()
+        self._changed = []  # tasks changed since last collecting
+        self._subs = []
+        self._pid = None  # process running the dispatcher thread
+        self._delivering = threading.Lock()
+
+    def _forked(self):
+        ''' in a forked child: the subscribers, the dispatcher thread and
+            maybe the locks held belong to the parent process
+        '''
+        global ACTIVE  # pylint: disable=global-statement
+        for tsk in self._changed:
+            tsk._changed = False  # pylint: disable=protected-access
+        self._cv = threading.Condition()
+        self._changed = []
+        self._subs = []
+        self._pid = None
+        self._delivering = threading.Lock()
+        ACTIVE = False
+
+    def subscribe(self, callback, max_rate=MAX_RATE, tasks=None):
+        ''' callback(updates) receives the changed tasks as a list of
+            Update(task, status, progress), at most max_rate times per
+            second.
+
+            tasks: only the updates of these tasks, default: all tasks
+            returns the subscription, to unsubscribe.
+        '''
+        global ACTIVE  # pylint: disable=global-statement
+        if max_rate <= 0:
+            raise ValueError('max_rate must > 0')
+
+        sub = _Subscription(callback, max_rate, tasks)
+        with self._cv:
+            if self._pid != os.getpid():  # first use, or forked
+                self._pid = os.getpid()
+                threading.Thread(target=self._dispatch, daemon=True).start()
+            self._subs = [*self._subs, sub]
+            ACTIVE = True
+            self._cv.notify()
+        return sub
+
+    def unsubscribe(self, sub):
+        ''' stops a subscription '''
+        global ACTIVE  # pylint: disable=global-statement
+        with self._cv:
+            self._subs = [i for i in self._subs if i is not sub]
+            ACTIVE = bool(self._subs)
+
+    def changed(self, tsk):
+        ''' called by a task when its progress or status is changed '''
+        # pylint: disable=protected-access
+        tsk._changed = True
+        with self._cv:
+            self._changed.append(tsk)
+            if len(self._changed) == 1:
+                self._cv.notify()
+
+    def flush(self):
+        ''' delivers pending updates now, in the calling thread '''
+        self._deliver(time.monotonic(), force=True)
+
+    def _collect(self):
+        ''' moves changed tasks into the pending updates of subscribers '''
+        with self._cv:
+            changed, self._changed = self._changed, []
+            subs = self._subs
+
+        for tsk in changed:
+            # changes after this are reported again
+            tsk._changed = False  # pylint: disable=protected-access
+
+        for sub in subs:
+            for tsk in changed:
+                if sub.tasks is None or id(tsk) in sub.tasks:
+                    sub.pending[id(tsk)] = tsk
+        return subs
+
+    def _deliver(self, now, force=False):
+        # pylint: disable=protected-access
+        with self._delivering:
+            for sub in self._collect():
+                if not sub.pending or (now < sub.due and not force):
+                    continue
+                pending, sub.pending = sub.pending, {}
+                sub.due = now + sub.interval
+                # values are read now, the latest ones
+                sub.callback([Update(i, i.status, i._progress)
+                              for i in pending.values()])
+
+    def _dispatch(self):
+        ''' dispatcher thread '''
+        while True:
+            with self._cv:
+                while not self._subs or not self._changed and \
+                        not any(i.pending for i in self._subs):
+                    self._cv.wait()
+                interval = min(i.interval for i in self._subs)
+
+            self._deliver(time.monotonic())
+            time.sleep(interval)
+
+
+def changed(tsk):
+    ''' reports a change of task progress or status to the bus '''
+    ProgressBus.instance().changed(tsk)  # pylint: disable=no-member
+
+
+os.register_at_fork(
+    after_in_child=lambda: ProgressBus.instance()._forked())  # pylint: disable=no-member, protected-access
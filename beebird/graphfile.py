@@ -0,0 +1,235 @@
+''' Compact binary file format of huge Bucket DAGs
+
+    Building a DAG of hundreds of thousands of tasks through Bucket.add()
+    is slow and memory hungry, the graph file stores it in columns:
+
+        header      magic 'BEEG', version, #tasks, #edges, #strings
+        strings     offsets (uint64 * (#strings + 1))
+        task class  string index of the task class id (uint32 * #tasks)
+        task fields string index of json encoded fields (uint32 * #tasks)
+        csr offsets pre-tasks of task i are indices[offsets[i]:offsets[i+1]]
+                    (uint64 * (#tasks + 1))
+        csr indices (uint32 * #edges)
+        string blob utf-8 strings, identical strings are stored once
+
+    Every section is 8-byte aligned and little-endian. The file is
+    memory-mapped when loaded and the CSR arrays are used in place, so a
+    loaded bucket has one python object per task but none per edge:
+
+        save_bucket(bkt, 'etl.beeg')
+        bkt = load_bucket('etl.beeg')
+        bkt.run()
+
+    Only public (registered) tasks can be saved, they are resolved by their
+    class id when loaded.
+'''
+
+import collections
+import itertools
+import mmap
+import operator
+import struct
+import sys
+from array import array
+
+from py_json_serialize import json_decode, json_encode
+
+from .task import TaskMan
+from .compose import Bucket, CSRList
+
+_MAGIC = b'BEEG'
+_VERSION = 1
+
+# magic, version, reserved, tasks, edges, strings
+_HEADER = struct.Struct('<4sHHQQQ')
+
+# field types whose decoded value can be shared by tasks
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _pad(size):
+    return -size % 8
+
+
+def _to_le(arr):
+    ''' array in little-endian byte order '''
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr
+
+
+def _ascending(arr) -> bool:
+    ''' True if values of arr never decrease '''
+    return all(map(operator.le, arr, itertools.islice(arr, 1, None)))
+
+
+def write_graph(filename: str, nodes):
+    ''' writes a graph file
+
+        nodes: iterable of (class_id, fields_json, pre_task_indices), the
+        fields_json is the json string of the task's public fields.
+    '''
+    strings = {}  # string => index
+
+    def intern(text):
+        try:
+            return strings[text]
+        except KeyError:
+            strings[text] = len(strings)
+            return strings[text]
+
+    classes = array('I')
+    fields = array('I')
+    offsets = array('Q', [0])
+    indices = array('I')
+    for clsid, blob, pre_tasks in nodes:
+        classes.append(intern(clsid))
+        fields.append(intern(blob))
+        indices.extend(pre_tasks)
+        offsets.append(len(indices))
+
+    encoded = [i.encode('utf-8') for i in strings]
+    str_offsets = array('Q', [0])
+    for i in encoded:
+        str_offsets.append(str_offsets[-1] + len(i))
+
+    with open(filename, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(classes),
+                                len(indices), len(encoded)))
+        for arr in (str_offsets, classes, fields, offsets, indices):
+            data = _to_le(arr).tobytes()
+            file.write(data)
+            file.write(bytes(_pad(len(data))))
+        file.write(b''.join(encoded))
+
+
+def save_bucket(bkt: Bucket, filename: str):
+    ''' saves a bucket of public tasks to a graph file '''
+    tasks, pre_tasks = bkt.graph()
+    taskman = TaskMan.instance()  # pylint: disable=no-member
+
+    checked = set()
+
+    def node(tsk, pres):
+        cls = type(tsk)
+        if cls not in checked:
+            try:
+                found = taskman.find(cls.__name__)
+            except ValueError:
+                found = None
+            if found is not cls:
+                raise ValueError(
+                    f"task '{cls.__name__}' is not public, cannot be saved")
+            checked.add(cls)
+
+        fields = {k: v for k, v in vars(tsk).items() if not k.startswith('_')}
+        return cls.__name__, json_encode(fields, pretty=False), pres
+
+    write_graph(filename, (node(t, p) for t, p in zip(tasks, pre_tasks)))
+
+
+def load_graph(filename: str):
+    ''' loads a graph file
+
+        returns (tasks, pre_tasks), pre_tasks is a CSRList over the
+        memory-mapped file.
+
+        The sections are range-checked before use, a truncated or corrupt
+        file raises ValueError.
+    '''
+    with open(filename, 'rb') as file:
+        if file.seek(0, 2) < _HEADER.size:
+            raise ValueError(f"'{filename}' is not a task graph file")
+        buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buf)
+
+    magic, version, _, n_tasks, n_edges, n_strings = _HEADER.unpack_from(view)
+    if magic != _MAGIC:
+        raise ValueError(f"'{filename}' is not a task graph file")
+    if version != _VERSION:
+        raise ValueError(f"unsupported task graph file version: {version}")
+
+    pos = _HEADER.size
+
+    def corrupt(what):
+        return ValueError(f"corrupt task graph file '{filename}': {what}")
+
+    def take(typecode, count):
+        nonlocal pos
+        size = count * array(typecode).itemsize
+        if pos + size > len(view):
+            raise corrupt('truncated')
+        arr = view[pos:pos + size].cast(typecode)
+        pos += size + _pad(size)
+        if sys.byteorder == 'big':
+            arr = array(typecode, arr)
+            arr.byteswap()
+        return arr
+
+    str_offsets = take('Q', n_strings + 1)
+    classes = take('I', n_tasks)
+    fields = take('I', n_tasks)
+    offsets = take('Q', n_tasks + 1)
+    indices = take('I', n_edges)
+    blob = view[pos:]
+
+    # the CSR arrays are used in place, out of range values would only
+    # fail (or not) when the bucket runs
+    if offsets[0] != 0 or offsets[-1] != n_edges or not _ascending(offsets):
+        raise corrupt('bad pre-task offsets')
+    if n_edges and max(indices) >= n_tasks:
+        raise corrupt('pre-task index out of range')
+    if str_offsets[0] != 0 or str_offsets[-1] != len(blob) or \
+            not _ascending(str_offsets):
+        raise corrupt('bad string offsets')
+    if n_tasks and max(max(classes), max(fields)) >= n_strings:
+        raise corrupt('string index out of range')
+
+    def string(k):
+        return str(blob[str_offsets[k]:str_offsets[k + 1]], 'utf-8')
+
+    taskman = TaskMan.instance()  # pylint: disable=no-member
+    cls_cache = {}
+
+    # decodes all distinct fields in one go
+    uses = collections.Counter(fields)
+    uniq = list(uses)
+    decoded = dict(zip(uniq, json_decode(
+        '[' + ','.join(string(k) for k in uniq) + ']')))
+
+    tasks = []
+    for cls_idx, fld_idx in zip(classes, fields):
+        try:
+            cls = cls_cache[cls_idx]
+        except KeyError:
+            cls = cls_cache[cls_idx] = taskman.find(string(cls_idx))
+
+        values = decoded[fld_idx]
+        if uses[fld_idx] > 1 and \
+                not all(isinstance(v, _SCALARS) for v in values.values()):
+            # tasks must not share mutable values
+            values = json_decode(string(fld_idx))
+
+        tsk = cls()
+        tsk.__dict__.update(values)
+        tasks.append(tsk)
+
+    return tasks, CSRList(offsets, indices)
+
+
+def load_bucket(filename: str, journal=None) -> Bucket:
+    ''' loads a ready-to-run bucket from a graph file '''
+    tasks, pre_tasks = load_graph(filename)
+    return Bucket.from_graph(tasks, pre_tasks, journal=journal)
+
+
+def graph_info(filename: str) -> dict:
+    ''' header information of a graph file '''
+    with open(filename, 'rb') as file:
+        magic, version, _, n_tasks, n_edges, n_strings = _HEADER.unpack(
+            file.read(_HEADER.size))
+    if magic != _MAGIC:
+        raise ValueError(f"'{filename}' is not a task graph file")
+    return {'version': version, 'tasks': n_tasks, 'edges': n_edges,
+            'strings': n_strings}
@@ -2,6 +2,9 @@
   Job: task is doc, job is to run / control a task at runtime.
 
 '''
+import os
+import time
+import threading
 from concurrent import futures
 
 from . import runner
@@ -30,6 +33,27 @@ class Job:
         ''' task to be executed by this job '''
         return self._task
 
+    @property
+    def parent(self):
+        ''' job of the composite task running this job's task, or None '''
+        return self._task._parent_job  # pylint: disable=protected-access
+
+    @property
+    def bucket(self):
+        ''' job of the nearest Bucket running this job's task, up the chain
+            of composite jobs (e.g. a Serial in a Bucket), to add tasks to
+            the running bucket (see _BucketJob.add).
+
+            raises ValueError if the task is not run by a Bucket.
+        '''
+        job_ = self.parent
+        while job_ is not None and not callable(getattr(job_, 'add', None)):
+            job_ = job_.parent
+        if job_ is None:
+            raise ValueError(f'"{type(self._task).__name__}" task is not run'
+                             ' by a bucket')
+        return job_
+
     def __call__(self):
         ''' job being executed
 
@@ -50,7 +74,16 @@ class Job:
           executing.
         '''
         self._stop = True
-        return self._future.cancel()
+        self.on_stop()
+        future = self._future
+        return future.cancel() if future else False
+
+    def on_stop(self):
+        ''' called when the job is requested to stop
+
+            A job waiting for events should wake up here to check the stop
+            signal, instead of polling it periodically.
+        '''
 
     def check_stop(self, on_stop=None):
         ''' check stop signal, raise JobStopError on stopping '''
@@ -66,12 +99,15 @@ class Job:
                 task result if sync (wait==True) else job itself
         '''
         self._task.on_submitted()
-        self._future = runner.submit_job(self)
-        self._future.add_done_callback(self._callback_done)
-        return self._future.result() if wait else self
+        future = self._future = runner.submit_job(self)
+        future.add_done_callback(self._callback_done)
+        return future.result() if wait else self
 
     def _callback_done(self, future):
         ''' callback when job is done '''
+        # the future holds the result and refers back to this job, breaks
+        # the cycle so a released task result is really freed.
+        self._future = None
         try:
             self._task.on_success(future.result())
         except futures.CancelledError:
@@ -96,3 +132,170 @@ class CallableTaskJob(Job):
     def __call__(self):
         super().__call__()
         return self._task.call(_job_=self)
+
+
+class _Batcher:
+    ''' coalesces pending jobs of a batch task class into batch calls
+
+        invoke(tasks) returns the list of results of the tasks, an exception
+        in the list is the error of its task.
+    '''
+
+    def __init__(self, invoke, max_batch_size, max_linger_seconds):
+        self._invoke = invoke
+        self._max_batch_size = max_batch_size
+        self._max_linger_seconds = max_linger_seconds
+
+        self._cv = threading.Condition(threading.Lock())
+        self._pending = []  # (job, time queued)
+        self._pid = None  # process running the flusher thread
+
+    def put(self, job_):
+        ''' queues a job to be called in a batch '''
+        with self._cv:
+            if self._pid != os.getpid():  # first use, or forked
+                self._pid = os.getpid()
+                self._pending = []
+                threading.Thread(target=self._flush, daemon=True).start()
+
+            self._pending.append((job_, time.monotonic()))
+            if len(self._pending) in (1, self._max_batch_size):
+                self._cv.notify()
+
+    def cancel(self, job_) -> bool:
+        ''' cancels a job not yet called, returns True if cancelled '''
+        with self._cv:
+            for i, (pending, _) in enumerate(self._pending):
+                if pending is job_:
+                    del self._pending[i]
+                    return True
+        return False
+
+    def _flush(self):
+        ''' flusher thread: a batch is called when full or lingered enough '''
+        size = self._max_batch_size
+        while True:
+            with self._cv:
+                while len(self._pending) < size:
+                    if self._pending:
+                        timeout = self._pending[0][1] + \
+                            self._max_linger_seconds - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self._cv.wait(timeout)
+
+                batch = [job_ for job_, _ in self._pending[:size]]
+                del self._pending[:size]
+
+            runner.submit_job(lambda batch=batch: self._call(batch))
+
+    def call_now(self, job_):
+        ''' calls a job in the current thread, in a batch with the pending
+            jobs (at most max_batch_size in all)
+        '''
+        with self._cv:
+            batch = [job_]
+            if self._pid == os.getpid():
+                size = self._max_batch_size - 1
+                batch += [pending for pending, _ in self._pending[:size]]
+                del self._pending[:size]
+        self._call(batch)
+
+    def _call(self, batch):
+        for job_ in batch:
+            job_.task.on_running()
+
+        try:
+            results = self._invoke([job_.task for job_ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f'batch of {len(batch)} tasks returns '
+                                 f'{len(results)} results')
+        except Exception as ex:  # pylint: disable=broad-except
+            results = [ex] * len(batch)
+
+        for job_, result in zip(batch, results):
+            job_.done(result)
+
+
+class BatchJob(Job):
+    ''' Job of a batch task
+
+        Jobs of the same batch task class are not executed one by one, the
+        pending ones are coalesced into one call of the task function, at
+        most MAX_BATCH_SIZE of them, after waiting at most
+        MAX_LINGER_SECONDS for more jobs to come.
+
+        e.g.
+
+            @task(batch=True)
+            def lookup(user_id):
+                # user_id is the list of user_id of the batched tasks
+                return db.users.find_many(user_id)
+
+        A batch job has no future of its own, it is completed by the batch.
+        A synchronous run from a worker of the runner (e.g. a task of a
+        Parallel calling a batch task) does not wait for the flusher, which
+        would hold the worker and could starve the pool: the batch is called
+        in the worker itself, with the jobs pending so far.
+    '''
+    MAX_BATCH_SIZE = 64
+    MAX_LINGER_SECONDS = 0.002
+
+    _batcher = None  # batcher of the task class
+
+    def __init__(self, tsk):
+        super().__init__(tsk)
+        self._event = None  # set when done, for synchronous run
+
+    @classmethod
+    def setup(cls, invoke, max_batch_size=MAX_BATCH_SIZE,
+              max_linger_seconds=MAX_LINGER_SECONDS):
+        ''' sets the function calling a batch of tasks '''
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must >= 1')
+        if max_linger_seconds < 0:
+            raise ValueError('max_linger_seconds must >= 0')
+        cls._batcher = _Batcher(invoke, max_batch_size, max_linger_seconds)
+
+    def execute(self, wait=True):
+        ''' queues the job to the batcher of its task class '''
+        self._task.on_submitted()
+        if not wait:
+            self._batcher.put(self)
+            return self
+
+        if runner.in_worker():
+            self._batcher.call_now(self)
+        else:
+            self._event = threading.Event()
+            self._batcher.put(self)
+            self._event.wait()
+        tsk = self._task
+        if tsk.error is not None:
+            raise tsk.error
+        if tsk.aborted:
+            raise futures.CancelledError()
+        return tsk.result
+
+    def stop(self):
+        ''' cancels the job if its batch is not called yet '''
+        self._stop = True
+        self.on_stop()
+        if self._batcher.cancel(self):
+            self.done(futures.CancelledError())
+            return True
+        return False
+
+    def done(self, result):
+        ''' called by the batch with the result (or error) of the task '''
+        if isinstance(result, futures.CancelledError):
+            self._task.on_cancelled()
+        elif isinstance(result, BaseException):
+            self._task.on_error(result)
+        else:
+            self._task.on_success(result)
+
+        if self._event is not None:
+            self._event.set()
@@ -0,0 +1,253 @@
+''' Manifest of task modules
+
+    Importing every module of a task library just to register its tasks is
+    slow for a large library. The manifest of a folder lists the public
+    tasks of its modules, found by parsing their source (ast), with their
+    doc and fields:
+
+        for module, tasks in scan(folder, package):
+            ...
+
+    TaskMan registers the tasks lazily (see TaskMan.register_lazy), a module
+    is imported when one of its tasks is asked for by TaskMan.find().
+
+    Only tasks declared with the @task decorator (public) are found. A module
+    registering tasks or jobs any other way (@runtask, @job, TaskMan calls
+    ...) cannot be described statically, it is imported eagerly, as is a
+    module which cannot be parsed. A module without any task is not imported.
+
+    The manifest is cached in the __pycache__ folder, an entry is parsed
+    again when the modification time or size of its file changes.
+'''
+
+import ast
+import collections
+import json
+import os
+import pkgutil
+
+# fields: [(name, annotation, default)], annotation is the source of the
+# annotation (or a type), None if not annotated; REQUIRED default if none
+TaskInfo = collections.namedtuple('TaskInfo', ['name', 'module', 'doc',
+                                               'fields'])
+
+
+class _Required:  # pylint: disable=too-few-public-methods
+    def __repr__(self):
+        return 'REQUIRED'
+
+
+REQUIRED = _Required()  # default value of a field without default
+
+VERSION = 1  # version of the cached manifest format
+CACHE_FILE = 'beebird-manifest.json'
+
+_DECORATOR = 'task'
+# names the tasks of a module cannot be described without running it
+_DYNAMIC = {'runtask', 'job', 'register', 'set_job_class', 'TaskMan',
+            'import_tasks'}
+
+
+class _Dynamic(Exception):
+    ''' the module must be imported '''
+
+
+def _name(node):
+    ''' name of a decorator: task, decorators.task ... '''
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+def _is_public(decorator) -> bool:
+    ''' the task decorator is public: @task, @task(True), @task(batch=...) '''
+    if not isinstance(decorator, ast.Call):
+        return True
+    args = [*decorator.args[:1],
+            *(i.value for i in decorator.keywords if i.arg == 'public')]
+    if not args:
+        return True
+    try:
+        return bool(ast.literal_eval(args[0]))
+    except ValueError:
+        raise _Dynamic() from None
+
+
+def _default(node):
+    try:
+        value = ast.literal_eval(node)
+        json.dumps(value)
+        return value
+    except (ValueError, TypeError):
+        return ast.unparse(node)  # not a json literal, shown as source
+
+
+def _func_fields(func):
+    args = func.args
+    params = [*args.posonlyargs, *args.args, *args.kwonlyargs]
+    defaults = [None] * (len(args.posonlyargs) + len(args.args) -
+                         len(args.defaults)) + args.defaults + args.kw_defaults
+    return [(arg.arg,
+             ast.unparse(arg.annotation) if arg.annotation else None,
+             REQUIRED if default is None else _default(default))
+            for arg, default in zip(params, defaults) if arg.arg != '_job_']
+
+
+def _class_fields(cls):
+    fields = []
+    for node in cls.body:
+        if isinstance(node, ast.Assign):
+            fields.extend((i.id, None, _default(node.value))
+                          for i in node.targets if isinstance(i, ast.Name))
+        elif isinstance(node, ast.AnnAssign) and \
+                isinstance(node.target, ast.Name):
+            fields.append((node.target.id, ast.unparse(node.annotation),
+                           REQUIRED if node.value is None else
+                           _default(node.value)))
+    return [i for i in fields if not i[0].startswith('_')]
+
+
+def scan_source(source, module) -> list:
+    ''' public tasks of a module source, raises _Dynamic if the module must
+        be imported
+    '''
+    tree = ast.parse(source)
+    decorators = {id(j) for i in tree.body
+                  for j in getattr(i, 'decorator_list', ())}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Name, ast.Attribute)) and \
+                _name(node) in _DYNAMIC:
+            raise _Dynamic()
+        if isinstance(node, ast.Call) and id(node) not in decorators and \
+                _name(node) == _DECORATOR:
+            raise _Dynamic()  # task created by a call
+
+    tasks = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                 ast.ClassDef)):
+            continue
+        for decorator in node.decorator_list:
+            if _name(decorator) == _DECORATOR and _is_public(decorator):
+                fields = _class_fields(node) if isinstance(
+                    node, ast.ClassDef) else _func_fields(node)
+                tasks.append(TaskInfo(node.name, module,
+                                      ast.get_docstring(node, clean=False),
+                                      fields))
+    return tasks
+
+
+def _sources(folder, package):
+    ''' (module, file) of modules under a folder, recursively in packages '''
+    for _, name, ispkg in pkgutil.iter_modules([str(folder)]):
+        module = f'{package}.{name}'
+        if not ispkg:
+            yield module, os.path.join(folder, name + '.py')
+            continue
+        path = os.path.join(folder, name)
+        yield module, os.path.join(path, '__init__.py')
+        yield from _sources(path, module)
+
+
+def _encode(info):
+    ''' json value of a TaskInfo '''
+    return [*info[:3], [[name, annotation] if default is REQUIRED else
+                        [name, annotation, default]
+                        for name, annotation, default in info.fields]]
+
+
+def _decode(value):
+    name, module, doc, fields = value
+    return TaskInfo(name, module, doc, [(*i, REQUIRED) if len(i) == 2 else
+                                        tuple(i) for i in fields])
+
+
+def _load_cache(fname):
+    try:
+        with open(fname, 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+        if cache.get('version') == VERSION:
+            return cache['files']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def _save_cache(fname, files):
+    try:
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        tmp = f'{fname}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump({'version': VERSION, 'files': files}, file)
+        os.replace(tmp, fname)
+    except OSError:
+        pass  # read-only folder, parsed again next time
+
+
+def scan(folder, package) -> list:
+    ''' manifest of the modules under a folder
+
+        returns [(module, tasks)] of the top level modules / packages of the
+        folder, tasks is None if the module must be imported.
+    '''
+    folder = str(folder)
+    cache_file = os.path.join(folder, '__pycache__', CACHE_FILE)
+    cache = _load_cache(cache_file)
+    files = {}
+
+    result = collections.OrderedDict()  # top level module => tasks
+    for module, fname in _sources(folder, package):
+        top = '.'.join(module.split('.')[:package.count('.') + 2])
+        try:
+            stat = os.stat(fname)
+        except OSError:
+            continue
+        key = os.path.relpath(fname, folder)
+        entry = cache.get(key)
+        if entry is None or entry['mtime'] != stat.st_mtime_ns or \
+                entry['size'] != stat.st_size:
+            try:
+                with open(fname, 'rb') as file:
+                    tasks = [_encode(i)
+                             for i in scan_source(file.read(), module)]
+            except (_Dynamic, SyntaxError, ValueError):
+                tasks = None
+            entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+                     'tasks': tasks}
+        files[key] = entry
+
+        tasks = result.setdefault(top, [])
+        if tasks is None or entry['tasks'] is None:
+            result[top] = None
+        else:
+            tasks.extend(_decode(i) for i in entry['tasks'])
+
+    if files != cache:
+        _save_cache(cache_file, files)
+    return list(result.items())
+
+
+def task_info(cls_task) -> TaskInfo:
+    ''' TaskInfo of a task class '''
+    # pylint: disable=import-outside-toplevel
+    from .decorators import Empty
+
+    tsk = cls_task()
+    fields = tsk.get_fields()
+    # in order of declaration
+    declared = dict.fromkeys(i for cls in reversed(cls_task.__mro__)
+                             for i in vars(cls) if i in fields)
+
+    infos = []
+    for field in [*declared, *sorted(i for i in fields if i not in declared)]:
+        val = getattr(tsk, field)
+        if isinstance(val, Empty):  # no default value
+            infos.append((field, val.annotation, REQUIRED))
+        else:
+            infos.append((field, None, val))
+    return TaskInfo(cls_task.__name__, cls_task.__module__, cls_task.__doc__,
+                    infos)
@@ -0,0 +1,395 @@
+''' Partitioned Bucket execution across multiple processes
+
+    A single interpreter cannot schedule and run a huge bucket fast enough,
+    PartitionedBucket splits the DAG into subgraphs and runs the scheduler of
+    each subgraph in its own process:
+
+        bkt = PartitionedBucket(processes=4)
+        bkt.add(tB, [tA])
+        ...
+        bkt.run()
+
+    The child processes are forked, so each one works on its inherited copy
+    of the bucket and the tasks need not be picklable; it requires the 'fork'
+    start method (POSIX).
+
+    The parent process routes the completion events of tasks having
+    dependents in other partitions, and copies the result (or error) of every
+    task back to the task objects in the parent, so task results and errors
+    must be picklable; Buffer results are moved to shared memory so only
+    their names are sent. The bucket itself behaves as a normal Bucket: it
+    has no result, and the error of the first failed task is raised.
+
+    Progress is rolled up as in a Bucket and children done are reported to
+    the child listeners (e.g. as_completed); while the event bus has
+    subscribers (see ProgressBus), the partitions also forward the progress
+    of their running tasks. Stopping the bucket terminates the partitions.
+'''
+
+import os
+import queue
+import threading
+import multiprocessing
+from multiprocessing import connection
+
+from . import events
+from .task import Task
+from .job import Job, JobError, JobStopError
+from .compose import Bucket
+from .buffer import Buffer
+from .decorators import runtask
+
+
+def partition(pre_tasks, parts: int) -> list:
+    ''' assigns DAG nodes to parts
+
+        pre_tasks: pre_tasks[i] is the list of pre-task indices of node i
+        returns: part number of each node
+
+        Nodes of the same depth are evenly distributed among parts so all
+        partitions have work to do at the same time; within that limit, a
+        node goes to the part owning most of its pre-tasks to minimise the
+        edges cut between partitions.
+    '''
+    total = len(pre_tasks)
+    nexts = [[] for _ in range(total)]
+    pending = [len(i) for i in pre_tasks]
+    for i, pres in enumerate(pre_tasks):
+        for j in pres:
+            nexts[j].append(i)
+
+    # nodes grouped by depth (Kahn's algorithm)
+    level = [i for i in range(total) if pending[i] == 0]
+    assign = [-1] * total
+    while level:
+        capacity = -(-len(level) // parts)
+        size = [0] * parts
+
+        for k, i in enumerate(level):
+            votes = {}
+            for j in pre_tasks[i]:
+                part = assign[j]
+                if size[part] < capacity:
+                    votes[part] = votes.get(part, 0) + 1
+
+            if votes:
+                part = max(votes, key=lambda p: (votes[p], -size[p]))
+            else:
+                # no pre-task (or all full): contiguous blocks keep nodes
+                # which are close in the graph close in the partition.
+                part = k // capacity
+                if size[part] >= capacity:
+                    part = size.index(min(size))
+
+            assign[i] = part
+            size[part] += 1
+
+        next_level = []
+        for i in level:
+            for j in nexts[i]:
+                pending[j] -= 1
+                if pending[j] == 0:
+                    next_level.append(j)
+        level = next_level
+
+    if -1 in assign:
+        raise ValueError('bucket has loopback')
+
+    return assign
+
+
+class PartitionedBucket(Bucket):
+    ''' bucket executing its partitions in separate processes
+
+        processes: number of processes (default: number of cpus)
+    '''
+    _cls_job_ = None  # not the job class of Bucket
+
+    def __init__(self, processes=None):
+        super().__init__()
+        self._processes = processes or os.cpu_count() or 1
+
+    @property
+    def processes(self):
+        ''' number of processes to run the bucket '''
+        return self._processes
+
+
+class _PartitionScheduler:  # pylint: disable=too-many-instance-attributes
+    ''' scheduler of one partition, running in a forked child process '''
+
+    def __init__(self, conn, tasks, pre_tasks, assign, part):
+        # pylint: disable=too-many-arguments
+        self._conn = conn
+        self._tasks = tasks
+        self._events = queue.SimpleQueue()
+
+        self._index = {}
+        self._pending = {}  # local node => unfinished pre-tasks
+        self._next = {}  # node => local dependent nodes
+        for i, owner in enumerate(assign):
+            if owner != part:
+                continue
+            self._index[id(tasks[i])] = i
+            self._pending[i] = len(pre_tasks[i])
+            for j in pre_tasks[i]:
+                self._next.setdefault(j, []).append(i)
+
+        self._ready = [i for i, n in self._pending.items() if n == 0]
+        self._left = len(self._pending)
+        self._jobs = {}  # running jobs, node => job
+        self._failed = False
+        self._lock = threading.Lock()  # sending from the progress thread
+
+    def _on_done(self, tsk):
+        self._events.put(tsk)
+
+    def _listen(self):
+        ''' receives completions of remote pre-tasks from parent '''
+        while True:
+            try:
+                msg = self._conn.recv()
+            except (EOFError, OSError):
+                msg = None
+            self._events.put(msg)
+            if msg is None:
+                break
+
+    def _release(self, i):
+        for j in self._next.get(i, ()):
+            self._pending[j] -= 1
+            if self._pending[j] == 0:
+                self._ready.append(j)
+
+    def _send(self, out):
+        with self._lock:
+            try:
+                self._conn.send(out)
+            except Exception:  # pylint: disable=broad-except
+                # some result / error cannot be pickled
+                for i, ecode, value in out:
+                    try:
+                        self._conn.send([(i, ecode, value)])
+                    except Exception as ex:  # pylint: disable=broad-except
+                        err = JobError(f'cannot send result of task #{i}: '
+                                       f'{ex}')
+                        self._conn.send([(i, int(Task.ErrorCode.ERROR), err)])
+
+    def _forward(self, updates):
+        ''' sends the progress of running tasks, node => progress '''
+        progress = {self._index[id(tsk)]: value
+                    for tsk, status, value in updates
+                    if status == Task.Status.RUNNING}
+        if progress:
+            with self._lock:
+                try:
+                    self._conn.send(progress)
+                except OSError:
+                    pass  # parent gone
+
+    def _handle(self, event, out):
+        ''' handles an event, returns False on stop '''
+        if event is None:
+            return False
+
+        if isinstance(event, list):  # remote pre-tasks are done
+            for i in event:
+                self._release(i)
+            return True
+
+        i = self._index[id(event)]
+        self._jobs.pop(i, None)
+        self._left -= 1
+        if event.error_code == Task.ErrorCode.SUCCESS:
+            self._release(i)
+            result = event.result
+            if isinstance(result, Buffer):
+                result = result.share()  # sent by name, not by content
+            out.append((i, int(event.error_code), result))
+        else:
+            self._failed = True  # waits for parent to stop
+            out.append((i, int(event.error_code), event.error))
+        return True
+
+    def run(self, forward=False):
+        ''' runs the partition until all tasks are done or stopped
+
+            forward: sends the progress of running tasks to the parent
+        '''
+        threading.Thread(target=self._listen, daemon=True).start()
+        if forward:
+            events.ProgressBus.instance().subscribe(  # pylint: disable=no-member
+                self._forward, tasks=[self._tasks[i] for i in self._pending])
+
+        running = True
+        while running:
+            if not self._failed:
+                ready, self._ready = self._ready, []
+                for i in ready:
+                    tsk = self._tasks[i]
+                    tsk.add_done_callback(self._on_done)
+                    self._jobs[i] = tsk.run(wait=False)
+
+            if self._left == 0:
+                break
+
+            out = []
+            running = self._handle(self._events.get(), out)
+            while running:
+                try:
+                    event = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                running = self._handle(event, out)
+
+            if out:
+                self._send(out)
+
+        for job_ in list(self._jobs.values()):
+            job_.stop()
+
+
+def _run_partition(conn, tasks, pre_tasks, assign, part, forward):
+    ''' entry of partition process '''
+    # pylint: disable=too-many-arguments
+    _PartitionScheduler(conn, tasks, pre_tasks, assign, part).run(forward)
+
+
+@runtask(PartitionedBucket)
+class _PartitionedBucketJob(Job):
+    ''' job running bucket partitions in child processes '''
+
+    def __init__(self, task):
+        super().__init__(task)
+        self._wake = None  # pipe waking up the collector on stop
+
+    def on_stop(self):
+        wake = self._wake
+        if wake is not None:
+            try:
+                wake[1].send(None)
+            except OSError:
+                pass  # done
+
+    def __call__(self):
+        super().__call__()
+
+        if self._task._inputs:  # pylint: disable=protected-access
+            raise ValueError('dataflow inputs are not supported across '
+                             'processes')
+
+        tasks, pre_tasks = self._task.graph()
+        total = len(tasks)
+        self._task.progress = 0
+        if total == 0:
+            self._task.progress = 1
+            return None
+
+        parts = min(self._task.processes, total)
+        assign = partition(pre_tasks, parts)
+
+        # partitions depending on a node, other than the node's own partition
+        routes = {}
+        for i, pres in enumerate(pre_tasks):
+            for j in pres:
+                if assign[j] != assign[i]:
+                    routes.setdefault(j, set()).add(assign[i])
+
+        ctx = multiprocessing.get_context('fork')
+        conns = []
+        procs = []
+        finished = False
+        forward = events.ACTIVE  # progress is watched
+        self._wake = ctx.Pipe(duplex=False)
+        self._task._fold_in(tasks)  # pylint: disable=protected-access
+        try:
+            for part in range(parts):
+                conn, child_conn = ctx.Pipe()
+                proc = ctx.Process(target=_run_partition, daemon=True,
+                                   args=(child_conn, tasks, pre_tasks,
+                                         assign, part, forward))
+                proc.start()
+                child_conn.close()
+                conns.append(conn)
+                procs.append(proc)
+
+            self._collect(tasks, assign, conns, routes)
+            finished = True
+        finally:
+            self._task._fold_out(tasks)  # pylint: disable=protected-access
+            for conn in conns:
+                try:
+                    conn.send(None)  # stop
+                except OSError:
+                    pass
+            for proc in procs:
+                if not finished:  # running tasks are not waited for
+                    proc.terminate()
+                proc.join()
+            for conn in [*conns, *self._wake]:
+                conn.close()
+
+        self._task.progress = 1
+        return None
+
+    def _collect(self, tasks, assign, conns, routes):
+        ''' applies task completions and routes them to dependent partitions '''
+        total = len(tasks)
+        count = 0
+        left = [0] * len(conns)  # unfinished tasks of each partition
+        for part in assign:
+            left[part] += 1
+
+        wake = self._wake[0]
+        active = [*conns, wake]
+        while count < total:
+            self.check_stop()
+
+            for conn in connection.wait(active):
+                if conn is wake:
+                    continue  # stopped, checked above
+
+                try:
+                    messages = conn.recv()
+                except EOFError as ex:
+                    if left[conns.index(conn)] > 0:
+                        raise JobError('partition process exited abnormally') \
+                            from ex
+                    active.remove(conn)  # partition is finished
+                    continue
+
+                if isinstance(messages, dict):  # progress of running tasks
+                    _apply_progress(tasks, messages)
+                    continue
+
+                outbox = {}
+                for i, ecode, value in messages:
+                    tsk = tasks[i]
+                    if ecode == Task.ErrorCode.SUCCESS:
+                        tsk.on_success(value)
+                        self._task._notify_child_done(tsk)  # pylint: disable=protected-access
+                        count += 1
+                        left[assign[i]] -= 1
+                        for part in routes.get(i, ()):
+                            outbox.setdefault(part, []).append(i)
+                    elif ecode == Task.ErrorCode.ERROR:
+                        tsk.on_error(value)
+                        raise value
+                    else:
+                        tsk.on_error(JobStopError())
+                        raise JobStopError()
+
+                for part, done in outbox.items():
+                    conns[part].send(done)
+
+
+def _apply_progress(tasks, progress):
+    ''' progress of tasks running in a partition, node => progress '''
+    for i, value in progress.items():
+        tsk = tasks[i]
+        if tsk.status == Task.Status.DONE:
+            continue  # completion received first
+        if tsk.status != Task.Status.RUNNING:
+            tsk.on_running()
+        if value >= 0:
+            tsk.progress = value
@@ -0,0 +1,401 @@
+''' Execution plan of a task composition
+
+    A composition like "a + b * c + do(x).then(y)" is a tree of Parallel,
+    Serial, do ... tasks, running it starts a job (and a worker thread) for
+    every composite node. compile_plan() lowers the tree into one flat DAG
+    executed by a single scheduler:
+
+        plan = compile_plan(a + b * c + do(x).then(y).catch(z))
+        plan.run()
+        plan.run()  # again, without compiling
+
+    Plan nodes:
+
+        leaf    a task which is not lowered, run by its own job
+        join    collects the values of its pre-nodes (result of Parallel,
+                Serial, Bucket)
+        catch   ends the region of do(): on error in the region, the catch
+                handler runs
+        retry   ends the region of TryRun(): on error in the region, the
+                region is reset and runs again
+
+    An error in a region stops the running nodes of the region and is
+    handled by the region's catch / retry node; an unhandled error stops the
+    plan. The value of the root node is the plan's result, the same as the
+    result of running the composition itself.
+
+    Parallel, Serial, Bucket, do and TryRun are lowered, any other task is a
+    leaf; so are the composites using features of their own jobs: bounded
+    or lazy Parallel, Serial / Bucket with a journal and Bucket with dataflow
+    inputs. Only leaf tasks are run, the lowered composites are not, and
+    tasks added to a running Bucket (Job.parent.add) are not supported.
+
+    A plan keeps the task objects, so changing the composition after
+    compiling does not change the plan.
+'''
+
+import copy
+import heapq
+import threading
+import time
+
+from .task import Task
+from .job import Job, JobStopError
+from .decorators import runtask
+from .compose import Parallel, Serial, Bucket, TryRun, do, _Unity
+
+_LEAF, _JOIN, _CATCH, _RETRY = range(4)
+
+
+class _Node:  # pylint: disable=too-few-public-methods
+    ''' node of plan
+
+        collect: indices of nodes whose values are collected as a list
+                 (None: no value), or the protected nodes of a catch
+        region: index of the innermost enclosing catch / retry node
+        arg: catch: value of a single protected node
+             retry: (max_tries, sleep_seconds)
+    '''
+    __slots__ = ('kind', 'task', 'pre', 'collect', 'region', 'arg')
+
+    def __init__(self, kind, task=None, pre=None, collect=None, region=None,
+                 arg=None):
+        # pylint: disable=too-many-arguments
+        self.kind = kind
+        self.task = task
+        self.pre = list(pre or ())
+        self.collect = collect
+        self.region = region
+        self.arg = arg
+
+
+class _Compiler:
+    ''' lowers a composition tree into plan nodes '''
+
+    def __init__(self):
+        self.nodes = []
+        self.regions = []  # stack of enclosing catch / retry nodes
+        self.members = {}  # region node => nodes in the region (nested)
+
+    def add(self, node) -> int:
+        ''' appends a node in current region '''
+        index = len(self.nodes)
+        node.region = self.regions[-1] if self.regions else None
+        self.nodes.append(node)
+        for i in self.regions:
+            self.members[i].append(index)
+        return index
+
+    def compile(self, tsk, deps) -> int:
+        ''' compiles a task depending on nodes deps, returns its exit node '''
+        # pylint: disable=protected-access
+        if isinstance(tsk, Parallel) and tsk._source is None:
+            exits = [self.compile(i, deps) for i in tsk._tasks]
+            return self.add(_Node(_JOIN, pre=exits or deps, collect=exits))
+
+        if isinstance(tsk, Serial) and tsk._journal is None:
+            exits = self._chain(tsk._tasks, deps)
+            return self.add(_Node(_JOIN, pre=exits[-1:] or deps,
+                                  collect=exits))
+
+        if isinstance(tsk, Bucket) and tsk._journal is None and \
+                not tsk._inputs and type(tsk).get_job_class() is \
+                Bucket.get_job_class():
+            return self._compile_bucket(tsk, deps)
+
+        if isinstance(tsk, do):
+            return self._region(_Node(_CATCH, task=tsk._catch),
+                                lambda: self._chain(tsk._then, deps), deps)
+
+        if isinstance(tsk, TryRun):
+            return self._region(
+                _Node(_RETRY, arg=(tsk._max_tries, tsk._sleep_seconds)),
+                lambda: [self.compile(tsk._task, deps)], deps)
+
+        if isinstance(tsk, _Unity):
+            return self.add(_Node(_JOIN, pre=deps))
+
+        return self.add(_Node(_LEAF, task=tsk, pre=deps))
+
+    def _chain(self, tasks, deps) -> list:
+        ''' compiles tasks running one after another, returns their exits '''
+        exits = []
+        for i in tasks:
+            exits.append(self.compile(i, exits[-1:] or deps))
+        return exits
+
+    def _region(self, control, body, deps) -> int:
+        ''' compiles a catch / retry region, returns the control node '''
+        index = self.add(control)
+        self.members[index] = []
+        self.regions.append(index)
+        try:
+            exits = body()
+        finally:
+            self.regions.pop()
+
+        if control.kind == _CATCH:
+            control.collect = exits
+            control.arg = len(exits) == 1
+            control.pre = exits[-1:] or list(deps)
+        else:
+            control.pre = exits
+        return index
+
+    def _compile_bucket(self, bkt, deps) -> int:
+        tasks, pre_tasks = bkt.graph()
+        entries, exits = [], []
+        for i in tasks:
+            if _lowered(i):
+                gate = self.add(_Node(_JOIN, pre=deps))
+                entries.append(gate)
+                exits.append(self.compile(i, [gate]))
+            else:
+                exits.append(self.compile(i, deps))
+                entries.append(exits[-1])
+
+        for entry, pres in zip(entries, pre_tasks):
+            self.nodes[entry].pre.extend(exits[j] for j in pres)
+
+        return self.add(_Node(_JOIN, pre=exits or deps))
+
+
+def _lowered(tsk) -> bool:
+    ''' task is lowered into more than one plan node '''
+    return isinstance(tsk, (Parallel, Serial, Bucket, do, TryRun, _Unity))
+
+
+class Plan(Task):
+    ''' flat execution plan of a composition, see compile_plan() '''
+    _history_ = False
+
+    def __init__(self, nodes, members):
+        super().__init__()
+        self._nodes = nodes
+        self._members = members
+        self._root = len(nodes) - 1
+
+        self._nexts = [[] for _ in nodes]
+        for i, node in enumerate(nodes):
+            for j in node.pre:
+                self._nexts[j].append(i)
+
+        self._leaves = sum(1 for i in nodes if i.kind == _LEAF)
+        self._check_loop()
+
+    @property
+    def size(self) -> int:
+        ''' number of nodes '''
+        return len(self._nodes)
+
+    @property
+    def leaves(self) -> int:
+        ''' number of leaf tasks '''
+        return self._leaves
+
+    def _check_loop(self):
+        pending = [len(i.pre) for i in self._nodes]
+        ready = [i for i, n in enumerate(pending) if n == 0]
+        count = 0
+        while ready:
+            i = ready.pop()
+            count += 1
+            for j in self._nexts[i]:
+                pending[j] -= 1
+                if pending[j] == 0:
+                    ready.append(j)
+        if count != len(self._nodes):
+            raise ValueError('composition has loopback')
+
+
+def compile_plan(tsk: Task) -> Plan:
+    ''' compiles a task composition into a flat plan '''
+    compiler = _Compiler()
+    root = compiler.compile(tsk, [])
+    nodes = compiler.nodes
+    if root != len(nodes) - 1:  # the root is a region node, added first
+        nodes.append(_Node(_JOIN, pre=[root], collect=[root], arg=True))
+    return Plan(nodes, compiler.members)
+
+
+@runtask(Plan)
+class _PlanJob(Job):
+    ''' the single scheduler of a plan '''
+    def __init__(self, task):
+        super().__init__(task)
+
+        nodes = task._nodes
+        self._cv = threading.Condition()
+        self._events = []  # done tasks
+
+        self._tasks = [i.task for i in nodes]  # tasks of current attempt
+        self._pending = [len(i.pre) for i in nodes]
+        self._done = bytearray(len(nodes))
+        self._values = [None] * len(nodes)
+        self._running = {}  # id(task) => (node, task, job)
+        self._tries = {}  # retry node => failed tries
+        self._timers = []  # (deadline, retry node)
+        self._ready = [i for i, n in enumerate(self._pending) if n == 0]
+        self._count = 0  # leaves done
+
+    def on_stop(self):
+        with self._cv:
+            self._cv.notify_all()  # wakes up the scheduling loop
+
+    def task_done_callback(self, tsk):
+        ''' called when a leaf task or catch handler is done '''
+        tsk.remove_done_callback(self.task_done_callback)
+        with self._cv:
+            self._events.append(tsk)
+            self._cv.notify()
+
+    def _start(self, index, tsk):
+        tsk.add_done_callback(self.task_done_callback)
+        self._running[id(tsk)] = (index, tsk, None)
+        job_ = tsk.run(wait=False)
+        if id(tsk) in self._running and tsk.status != Task.Status.DONE:
+            self._running[id(tsk)] = (index, tsk, job_)
+
+    def _complete(self, index, value):
+        self._done[index] = 1
+        self._values[index] = value
+        for j in self._task._nexts[index]:
+            self._pending[j] -= 1
+            if self._pending[j] == 0:
+                self._ready.append(j)
+
+    def _dispatch(self, index):
+        node = self._task._nodes[index]
+        values = self._values
+        if node.kind == _LEAF:
+            self._start(index, self._tasks[index])
+        elif node.kind == _JOIN:
+            if node.arg:  # value of the only pre-node
+                value = values[node.collect[0]]
+            elif node.collect is not None:
+                value = [values[i] for i in node.collect]
+            else:
+                value = None
+            self._complete(index, value)
+        elif node.kind == _CATCH:
+            if node.arg:
+                value = values[node.collect[0]]
+            else:
+                value = [values[i] for i in node.collect]
+            self._complete(index, value)
+        else:  # retry
+            self._complete(index, values[node.pre[0]])
+
+    def _abandon(self, region):
+        ''' stops the running nodes of a region '''
+        members = self._task._members[region]
+        for i in members:
+            self._done[i] = 0
+        inside = set(members)
+        for key, (index, _, job_) in list(self._running.items()):
+            if index in inside:
+                del self._running[key]
+                if job_:
+                    job_.stop()
+        self._ready = [i for i in self._ready if i not in inside]
+
+    def _reset(self, region):
+        ''' runs a region again '''
+        nodes = self._task._nodes
+        for i in self._task._members[region]:
+            node = nodes[i]
+            self._pending[i] = sum(1 for j in node.pre if not self._done[j])
+            if node.kind == _LEAF:
+                self._tasks[i] = copy.copy(node.task)
+            if self._pending[i] == 0:
+                self._ready.append(i)
+
+    def _fail(self, index, err):
+        ''' handles the error of a node by its region '''
+        region = self._task._nodes[index].region
+        if region is None:
+            raise err
+
+        self._abandon(region)
+        node = self._task._nodes[region]
+        if node.kind == _CATCH:
+            if node.task is None or isinstance(err, JobStopError):
+                self._fail(region, err)
+            else:
+                node.task.err = err  # sets the error to handle
+                self._start(region, node.task)
+        else:  # retry
+            tries = self._tries[region] = self._tries.get(region, 0) + 1
+            max_tries, sleep_seconds = node.arg
+            if 0 < max_tries <= tries:
+                self._fail(region, err)
+            else:
+                heapq.heappush(self._timers,
+                               (time.monotonic() + sleep_seconds, region))
+
+    def _handle(self, tsk):
+        try:
+            index, _, _ = self._running.pop(id(tsk))
+        except KeyError:
+            return  # from an abandoned region
+
+        node = self._task._nodes[index]
+        if node.kind == _CATCH:  # error handler is done
+            if tsk.aborted:
+                self._fail(index, JobStopError())
+            elif tsk.error_code == Task.ErrorCode.SUCCESS:
+                self._complete(index, tsk.result)
+            else:
+                self._complete(index, tsk.error)
+            return
+
+        if tsk.error_code == Task.ErrorCode.SUCCESS:
+            self._count += 1
+            self._complete(index, tsk.result)
+        elif tsk.aborted:
+            self._fail(index, JobStopError())
+        else:
+            self._fail(index, tsk.error)
+
+    def __call__(self):
+        super().__call__()
+
+        plan = self._task
+        plan.progress = 0
+        try:
+            return self._schedule()
+        finally:
+            for _, _, job_ in list(self._running.values()):
+                if job_:
+                    job_.stop()
+
+    def _schedule(self):
+        plan = self._task
+        root = plan._root
+        while True:
+            while self._ready:
+                self._dispatch(self._ready.pop())
+
+            if self._done[root]:
+                plan.progress = 1
+                return self._values[root]
+
+            with self._cv:
+                if not self._events and not self._stop:
+                    timeout = None  # until an event, or the next retry
+                    if self._timers:
+                        timeout = max(0, self._timers[0][0] - time.monotonic())
+                    self._cv.wait(timeout)
+                events, self._events = self._events, []
+
+            if self._stop:
+                raise JobStopError()
+
+            for tsk in events:
+                self._handle(tsk)
+
+            while self._timers and self._timers[0][0] <= time.monotonic():
+                self._reset(heapq.heappop(self._timers)[1])
+
+            if plan.leaves:
+                plan.progress = min(1, self._count / plan.leaves)
@@ -0,0 +1,233 @@
+''' Post-run report of composite tasks
+
+    After a composite task (Parallel, Serial, Bucket) is done, the report
+    tells why it took as long as it did:
+
+        tsk = Parallel(tA, Serial(tB, tC))
+        tsk.run()
+
+        print(Report(tsk))
+
+    work:        sum of the running time of all leaf tasks;
+    span:        running time of the critical path, it is the lower bound of
+                 the elapsed time with unlimited workers;
+    parallelism: work / span, the achievable parallelism;
+    queue wait:  time a task is ready (submitted) but waiting for a worker;
+    idle:        worker time not used by any job during the run.
+
+    A lazy Parallel (children from an iterable) counts as a single leaf
+    task, unless it keeps its children (see Parallel keep_tasks).
+
+    A parallelism far above the number of workers with large queue waits
+    means more workers help; a span close to the elapsed time means only
+    splitting or speeding up the tasks on the critical path helps.
+'''
+
+import collections
+
+from . import runner
+from .task import Task
+from .compose import Parallel, Serial, Bucket
+
+
+def _duration(tsk):
+    ''' running time of a task, 0 if not run '''
+    if tsk._time_started is None or tsk._time_done is None:  # pylint: disable=protected-access
+        return 0.0
+    return tsk._time_done - tsk._time_started  # pylint: disable=protected-access
+
+
+def _queue_wait(tsk):
+    ''' time the task is submitted but not started yet '''
+    # pylint: disable=protected-access
+    if tsk._time_submitted is None or tsk._time_started is None:
+        return 0.0
+    return tsk._time_started - tsk._time_submitted
+
+
+class _Graph:
+    ''' flattened dependency graph of leaf tasks.
+
+        barrier nodes (task is None) join the tails of a group to the heads
+        of the next group, so a Serial of two wide Parallels does not need
+        n*m edges.
+    '''
+
+    def __init__(self):
+        self.tasks = []  # node => leaf task, None for barrier
+        self.next = []  # node => list of dependent nodes
+        self.composites = []  # composite tasks in the tree
+
+    def add_node(self, tsk):
+        ''' adds a node, returns its index '''
+        self.tasks.append(tsk)
+        self.next.append([])
+        return len(self.tasks) - 1
+
+    def join(self, tails, heads):
+        ''' all heads depend on all tails '''
+        if not tails or not heads:
+            return
+        if len(tails) == 1 or len(heads) == 1:
+            for i in tails:
+                self.next[i].extend(heads)
+        else:
+            barrier = self.add_node(None)
+            for i in tails:
+                self.next[i].append(barrier)
+            self.next[barrier].extend(heads)
+
+    def expand(self, tsk):
+        ''' expands a task (tree) into graph, returns (heads, tails) '''
+        # pylint: disable=protected-access
+        if isinstance(tsk, Parallel) and (tsk._tasks or tsk._source is None):
+            self.composites.append(tsk)
+            heads, tails = [], []
+            for i in tsk._tasks:
+                hds, tls = self.expand(i)
+                heads.extend(hds)
+                tails.extend(tls)
+            return heads, tails
+
+        if isinstance(tsk, Serial):
+            self.composites.append(tsk)
+            heads, tails = [], []
+            for i in tsk._tasks:
+                hds, tls = self.expand(i)
+                if not hds:
+                    continue
+                if tails:
+                    self.join(tails, hds)
+                else:
+                    heads = hds
+                tails = tls
+            return heads, tails
+
+        if isinstance(tsk, Bucket):
+            self.composites.append(tsk)
+            tasks, pre_tasks = tsk.graph()
+            parts = [self.expand(i) for i in tasks]
+            has_next = [False] * len(tasks)
+            heads, tails = [], []
+            for i, pres in enumerate(pre_tasks):
+                for j in pres:
+                    has_next[j] = True
+                    self.join(parts[j][1], parts[i][0])
+                if not pres:
+                    heads.extend(parts[i][0])
+            for i, part in enumerate(parts):
+                if not has_next[i]:
+                    tails.extend(part[1])
+            return heads, tails
+
+        node = self.add_node(tsk)
+        return [node], [node]
+
+    def critical_path(self):
+        ''' longest path by running time, returns (span, [leaf tasks]) '''
+        total = len(self.tasks)
+        indegree = [0] * total
+        for nexts in self.next:
+            for j in nexts:
+                indegree[j] += 1
+
+        finish = [0.0] * total  # longest path time ending at node
+        prev = [None] * total
+        ready = [i for i in range(total) if indegree[i] == 0]
+        for i in ready:
+            finish[i] = _duration(self.tasks[i]) if self.tasks[i] else 0.0
+
+        while ready:
+            i = ready.pop()
+            for j in self.next[i]:
+                cost = _duration(self.tasks[j]) if self.tasks[j] else 0.0
+                if finish[i] + cost >= finish[j]:
+                    finish[j] = finish[i] + cost
+                    prev[j] = i
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    ready.append(j)
+
+        if not total:
+            return 0.0, []
+
+        node = max(range(total), key=lambda i: finish[i])
+        span = finish[node]
+        path = []
+        while node is not None:
+            if self.tasks[node] is not None:
+                path.append(self.tasks[node])
+            node = prev[node]
+        path.reverse()
+        return span, path
+
+
+_Entry = collections.namedtuple('Entry', ['task', 'name', 'duration', 'wait'])
+
+
+def _entry(tsk):
+    return _Entry(tsk, type(tsk).__name__, _duration(tsk), _queue_wait(tsk))
+
+
+class Report:  # pylint: disable=too-many-instance-attributes
+    ''' critical-path and parallelism report of a finished task '''
+
+    def __init__(self, tsk: Task):
+        if tsk.status != Task.Status.DONE:
+            raise ValueError('report is only available when task is done')
+
+        self.task = tsk
+
+        graph = _Graph()
+        graph.expand(tsk)
+
+        leaves = [i for i in graph.tasks if i is not None]
+        self.leaves = [_entry(i) for i in leaves]
+
+        span, path = graph.critical_path()
+        self.span = span
+        self.critical_path = [_entry(i) for i in path]
+        self.work = sum(i.duration for i in self.leaves)
+        self.parallelism = self.work / self.span if self.span > 0 else 1.0
+
+        # pylint: disable=protected-access
+        if tsk._time_submitted is not None and tsk._time_done is not None:
+            self.elapsed = tsk._time_done - tsk._time_submitted
+        else:
+            self.elapsed = 0.0
+
+        self.queue_wait = sum(i.wait for i in self.leaves)
+
+        # every job, composite or not, occupies a worker while running.
+        busy = sum(_duration(i) for i in graph.composites) + self.work
+        self.workers = runner.max_workers()
+        self.idle = max(0.0, self.workers * self.elapsed - busy)
+
+    def to_text(self, top=10):
+        ''' human readable report '''
+        lines = [
+            f"elapsed:     {self.elapsed:.3f}s",
+            f"work:        {self.work:.3f}s ({len(self.leaves)} tasks)",
+            f"span:        {self.span:.3f}s",
+            f"parallelism: {self.parallelism:.2f} (workers: {self.workers})",
+            f"queue wait:  {self.queue_wait:.3f}s",
+            f"idle:        {self.idle:.3f}s",
+            "",
+            "critical path:",
+        ]
+        for i in self.critical_path:
+            lines.append(f"  {i.name:<30} {i.duration:10.3f}s"
+                         f"  (wait {i.wait:.3f}s)")
+
+        waits = sorted((i for i in self.leaves if i.wait > 0),
+                       key=lambda i: i.wait, reverse=True)[:top]
+        if waits:
+            lines.append("")
+            lines.append("longest queue waits:")
+            for i in waits:
+                lines.append(f"  {i.name:<30} {i.wait:10.3f}s")
+
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.to_text()
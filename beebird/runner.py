@@ -1,16 +1,32 @@
 ''' Execution Engine for all tasks '''
 
+import os
+import threading
 from concurrent import futures
 
 from py_singleton import singleton
 
+_worker = threading.local()  # flag of worker threads
+
+
+def _init_worker():
+    _worker.active = True
+
 
 @singleton
 class _Runner: # pylint: disable=too-few-public-methods
     """ job executor """
 
+    MAX_WORKERS = 10
+
     def __init__(self):
-        self._executor = futures.ThreadPoolExecutor(max_workers=10)
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=_Runner.MAX_WORKERS, initializer=_init_worker)
+
+    @property
+    def max_workers(self):
+        ''' number of worker threads '''
+        return _Runner.MAX_WORKERS
 
     def submit(self, job):
         ''' submit a job to be executed by thread pool '''
@@ -20,3 +36,24 @@ class _Runner: # pylint: disable=too-few-public-methods
 def submit_job(job):
     ''' submit a job for execution '''
     return _Runner.instance().submit(job) # pylint: disable=no-member
+
+
+def max_workers():
+    ''' number of workers executing jobs '''
+    return _Runner.instance().max_workers # pylint: disable=no-member
+
+
+def in_worker() -> bool:
+    ''' True in a worker thread of the runner '''
+    return getattr(_worker, 'active', False)
+
+
+def _reset_after_fork():
+    ''' worker threads do not survive fork(), a forked child process needs
+        its own thread pool.
+    '''
+    _Runner.inst = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,185 @@
+''' Daemon running json tasks submitted over a unix domain socket
+
+    Starting the interpreter, importing modules and registering tasks costs
+    every bee command hundreds of milliseconds. A server keeps them loaded,
+    with the runner's workers, and runs the tasks its clients submit:
+
+        with Server() as server:    # bee serve
+            server.serve_forever()
+
+        for record in submit(['{"_CLSID_": "add", "a": 1}']):
+            print(record)           # {'line': 1, 'result': 2}
+
+        with Client() as client:    # a task at a time
+            record = client.run('{"_CLSID_": "add", "a": 1}')
+
+    A connection is a batch (see run_batch): the client sends json tasks, one
+    per line, and receives a json line per task as it is done, in
+    completion order, identified by its line number on the connection.
+    Results are written while tasks are read, a client can wait for the
+    result of a task before sending the next one over the same connection.
+
+    Task modules imported by the server stay imported: lazy registered tasks
+    (see TaskMan.register_lazy) are imported by the first task using them.
+'''
+
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+
+from .batch import run_batch
+from . import runner
+
+
+def default_socket() -> str:
+    ''' path of the socket: $BEEBIRD_SOCKET, or beebird.sock in the runtime
+        folder of the user
+    '''
+    path = os.environ.get('BEEBIRD_SOCKET')
+    if path:
+        return path
+    folder = os.environ.get('XDG_RUNTIME_DIR')
+    if folder:
+        return os.path.join(folder, 'beebird.sock')
+    return os.path.join(tempfile.gettempdir(), f'beebird-{os.getuid()}.sock')
+
+
+class _LineWriter:
+    ''' text writer of a socket, run_batch flushes it before waiting '''
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._buffer = []
+
+    def write(self, text):
+        self._buffer.append(text)
+
+    def flush(self):
+        data, self._buffer = ''.join(self._buffer), []
+        self._wfile.write(data.encode('utf-8'))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    ''' a connection, a batch of tasks '''
+
+    def handle(self):
+        out = _LineWriter(self.wfile)
+        try:
+            run_batch(self.rfile, out, self.server.jobs)
+        except OSError:
+            pass  # client gone
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    ''' task server listening on a unix domain socket
+
+        jobs: tasks of a connection running at most, default: number of
+        workers of runner
+    '''
+    daemon_threads = True
+
+    def __init__(self, path=None, jobs=0):
+        self.path = path or default_socket()
+        self.jobs = jobs
+        if os.path.exists(self.path):
+            _remove_stale(self.path)
+        runner.max_workers()  # workers are started before the first task
+        super().__init__(self.path, _Handler)
+
+    def server_bind(self):
+        # the socket file is created private: a chmod after bind leaves a
+        # window for other users to connect
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def _remove_stale(path):
+    ''' removes the socket file of a server not running anymore '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+            return
+    raise OSError(f"a server is listening on '{path}'")
+
+
+def submit(lines, path=None):
+    ''' sends json tasks to a server, yields the records of the results as
+        they are done (see run_batch)
+    '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path or default_socket())
+
+        def send():
+            try:
+                with sock.makefile('wb') as file:
+                    for line in lines:
+                        if isinstance(line, str):
+                            line = line.encode('utf-8')
+                        file.write(line if line.endswith(b'\n')
+                                   else line + b'\n')
+                        file.flush()  # the line may wait for a result
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass  # server gone, reported by the reading side
+
+        # sent while results are read, the server reads as tasks are done
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        with sock.makefile('rb') as file:
+            for line in file:
+                yield json.loads(line)
+        sender.join()
+
+
+class Client:
+    ''' connection to a server running tasks one at a time, no startup cost
+        but a round trip per task:
+
+            with Client() as client:
+                record = client.run('{"_CLSID_": "add", "a": 1}')
+    '''
+
+    def __init__(self, path=None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(path or default_socket())
+        except OSError:
+            self._sock.close()
+            raise
+        self._file = self._sock.makefile('rb')
+
+    def run(self, jstr) -> dict:
+        ''' runs a json task, returns the record of its result '''
+        if isinstance(jstr, str):
+            jstr = jstr.encode('utf-8')
+        self._sock.sendall(jstr.rstrip(b'\n') + b'\n')
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('connection closed by server')
+        return json.loads(line)
+
+    def close(self):
+        ''' closes the connection '''
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
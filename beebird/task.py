@@ -2,12 +2,59 @@
 Task
 """
 
+import time
+import queue
+import threading
+import importlib
+import json
 from enum import IntEnum
 
-from py_json_serialize import json_decode, json_encode
+from py_json_serialize import json_decode, json_encode, JsonSerializeError
 from py_singleton import singleton
 
 from . import job
+from . import events
+from . import manifest
+
+
+# guards the progress rollup of composite tasks (see Task._fold_in)
+_rollup_lock = threading.Lock()
+
+# task class => average duration (seconds) of its successful runs
+_durations = {}
+_DURATION_SMOOTHING = 0.2  # weight of the latest run in the average
+
+_FOLD_STEP = 0.001  # least progress change folded into composite tasks
+
+
+def _record_duration(cls, seconds):
+    mean = _durations.get(cls)
+    _durations[cls] = seconds if mean is None else \
+        mean + (seconds - mean) * _DURATION_SMOOTHING
+
+
+def _propagate(tsk):
+    ''' folds the progress change of a task into the composite tasks above
+        it, O(depth). called with _rollup_lock held.
+
+        changes smaller than _FOLD_STEP are kept until they add up, so a
+        task setting its progress in a hot loop rarely touches its parents.
+    '''
+    # pylint: disable=protected-access
+    parent = tsk._rollup
+    while parent is not None:
+        progress = max(tsk._progress, 0)
+        delta = progress - tsk._folded
+        if not delta or (-_FOLD_STEP < delta < _FOLD_STEP and progress < 1):
+            return
+        tsk._folded = progress
+        parent._rollup_sum += tsk._weight * delta
+        if parent._rollup_total > 0:
+            parent._progress = min(
+                1, max(0, parent._rollup_sum / parent._rollup_total))
+        if events.ACTIVE and not parent._changed:
+            events.changed(parent)
+        tsk, parent = parent, parent._rollup
 
 
 class Group:  # pylint: disable=too-few-public-methods
@@ -53,6 +100,8 @@ class TaskMan:
 
     def __init__(self):
         self.tasks = []  # array of task classes
+        self._names = {}  # name => task class
+        self._lazy = {}  # name => TaskInfo of a task not imported yet
 
     def register(self, cls_task):
         ''' register a task class '''
@@ -63,18 +112,52 @@ class TaskMan:
         #print(f"registering {cls_task.__name__}\r\n")
 
         self.tasks.append(cls_task)
+        self._names.setdefault(cls_task.__name__, cls_task)
+        self._lazy.pop(cls_task.__name__, None)
+
+    def register_lazy(self, info):
+        ''' register a task (manifest.TaskInfo) of a module not imported,
+            the module is imported when the task is found
+        '''
+        if info.name not in self._names:
+            self._lazy.setdefault(info.name, info)
 
     def find(self, name):
         ''' find registered task class by its name  '''
+        cls = self._names.get(name)
+        if cls is not None:
+            return cls
+
         for i in self.tasks:
             # pylint: disable=protected-access
-            if i.__name__ == name or (i._metaInfo_ and i._metaInfo_.name == name):
+            if i._metaInfo_ and i._metaInfo_.name == name:
                 return i
 
+        # registered tasks first, then the ones not imported yet
+        info = self._lazy.pop(name, None)
+        if info is not None:
+            importlib.import_module(info.module)
+            if name in self._names:
+                return self._names[name]
+
         raise ValueError(f"task class name '{name}' not found")
 
+    def info(self, name) -> manifest.TaskInfo:
+        ''' doc and fields of a registered task, without importing it '''
+        if name in self._lazy:
+            return self._lazy[name]
+        return manifest.task_info(self.find(name))
+
+    def infos(self) -> list:
+        ''' TaskInfo of all registered tasks, imported or not '''
+        return [*(manifest.TaskInfo(i.__name__, i.__module__, i.__doc__,
+                                    None) for i in self.tasks),
+                *self._lazy.values()]
+
     def all(self):
-        ''' get all registered task classes '''
+        ''' get all registered task classes, importing lazy ones '''
+        for name in list(self._lazy):
+            self.find(name)
         return self.tasks
 
 
@@ -98,12 +181,33 @@ class Task:  # pylint: disable=too-many-public-methods
 
     _cls_job_ = None  # job class to execute the task
     _metaInfo_ = None  # task meta-info
+    _cost_ = None  # declared cost (e.g. seconds), weight of task's progress
+    _history_ = True  # durations of the class are recorded as its cost
 
     _status = Status.INIT
     _ec = ErrorCode.INVALID
     _error = None  # task error on failure
     _result = None  # task result on success
     _progress: float = 0
+    _changed = False  # change of progress / status reported to event bus
+
+    # time stamps (time.perf_counter) of task's life cycle, None if not reached
+    _time_submitted = None
+    _time_started = None
+    _time_done = None
+
+    # job of the composite task running this task (see Job.parent)
+    _parent_job = None
+
+    # progress rollup: composite task folding in the progress of this task,
+    # weighted by _weight, _folded is the progress it has folded in; of a
+    # composite: weighted sum of its children's progress and total weight
+    _rollup = None
+    _weight = 0
+    _folded = 0
+    _rollup_sum = 0
+    _rollup_total = 0
+    _rollup_count = 0
 
     # external callbacks called when task is finished.  signature: Callback(task)
     _done_callbacks = None
@@ -118,9 +222,91 @@ class Task:  # pylint: disable=too-many-public-methods
 
         self._done_callbacks.append(callback)
 
+    def remove_done_callback(self, callback):
+        ''' remove done event callback '''
+        if self._done_callbacks and callback in self._done_callbacks:
+            self._done_callbacks.remove(callback)
+
+    # composite task: callbacks called when a child task is done successfully
+    _child_listeners = ()
+
+    def _add_child_listener(self, listener):
+        self._child_listeners = (*self._child_listeners, listener)
+
+    def _remove_child_listener(self, listener):
+        self._child_listeners = tuple(
+            i for i in self._child_listeners if i is not listener)
+
+    def _notify_child_done(self, child):
+        ''' called by composite job when a child task is done successfully '''
+        for listener in self._child_listeners:
+            listener(child)
+
+    # partial results
+    _streaming_ = False  # the task publishes its items as partial results
+    _partial_listeners = ()
+
+    @property
+    def streaming(self):
+        ''' the task publishes its items as partial results '''
+        return self._streaming_
+
+    def subscribe(self, listener):
+        ''' listener(item) is called with every partial result published '''
+        self._partial_listeners = (*self._partial_listeners, listener)
+
+    def unsubscribe(self, listener):
+        ''' stops calling listener with partial results '''
+        self._partial_listeners = tuple(
+            i for i in self._partial_listeners if i is not listener)
+
+    def publish(self, item):
+        ''' publishes a partial result to subscribers, called while running '''
+        for listener in self._partial_listeners:
+            listener(item)
+
+    def stream(self, max_buffered=16):
+        ''' runs the task and yields its partial results
+
+            at most max_buffered items are waiting for the consumer, the
+            publishing task is blocked until there is room. The error of
+            the task is raised at the end; leaving the iteration early stops
+            the task.
+        '''
+        items = queue.Queue(maxsize=max_buffered)
+        put = items.put
+        end = object()
+        job_ = None
+
+        def on_done(_):
+            put(end)
+
+        self.subscribe(put)
+        self.add_done_callback(on_done)
+        try:
+            job_ = self.run(wait=False)
+            while True:
+                item = items.get()
+                if item is end:
+                    break
+                yield item
+            if self._ec != Task.ErrorCode.SUCCESS:
+                raise self._error or job.JobStopError()
+        finally:
+            self.remove_done_callback(on_done)
+            self.unsubscribe(put)
+            if job_ is not None and self._status != Task.Status.DONE:
+                job_.stop()
+            while not items.empty():  # unblocks the publisher
+                items.get_nowait()
+
     def _call_done_callbacks(self):
+        if events.ACTIVE and not self._changed:
+            events.changed(self)
+
         if self._done_callbacks:
-            for callback in self._done_callbacks:
+            # a callback may remove itself
+            for callback in list(self._done_callbacks):
                 callback(self)
 
     def __init__(self):
@@ -152,7 +338,8 @@ class Task:  # pylint: disable=too-many-public-methods
         # both class and object fields are needed to create a task
         cls = type(self)
         cls_fields = [x for x in dir(cls) if not x.startswith('_') and type(
-            getattr(cls, x)).__name__ not in ('function', 'method', 'property', 'EnumMeta')]
+            getattr(cls, x)).__name__ not in ('function', 'method', 'property', 'EnumMeta',
+                                              'EnumType')]
         obj_fields = [x for x in self.__dict__ if not x.startswith('_')]
         return {*cls_fields, *obj_fields}
 
@@ -213,19 +400,106 @@ class Task:  # pylint: disable=too-many-public-methods
     @progress.setter
     def progress(self, val: float):
         self._progress = val
+        if events.ACTIVE and not self._changed:
+            events.changed(self)
+
+        if self._rollup is not None:
+            delta = val - self._folded
+            if val >= 1 or delta >= _FOLD_STEP or delta <= -_FOLD_STEP:
+                with _rollup_lock:
+                    _propagate(self)
+
+    @property
+    def eta(self):
+        ''' estimated seconds until the task is done, from its progress and
+            running time; None if unknown
+        '''
+        if self._status != Task.Status.RUNNING or self._progress <= 0:
+            return None
+        elapsed = time.perf_counter() - self._time_started
+        return elapsed * (1 - self._progress) / self._progress
+
+    def estimated_cost(self):
+        ''' relative cost of the task, weight of its progress in the progress
+            of a composite task: the declared _cost_, or the average duration
+            of done tasks of the same class, None if unknown
+        '''
+        if self._cost_ is not None:
+            return self._cost_
+        return _durations.get(type(self)) if self._history_ else None
+
+    def _fold_in(self, children):
+        ''' composite task: folds the progress of children (about to run)
+            into the progress of this task, weighted by their costs
+
+            every change of a child's progress is then added to its parents
+            in O(depth), without scanning the children.
+        '''
+        costs = [i.estimated_cost() for i in children]
+        known = [i for i in costs if i is not None]
+        if known:
+            default = sum(known) / len(known)
+        elif self._rollup_count:
+            default = self._rollup_total / self._rollup_count
+        else:
+            default = 1
+
+        with _rollup_lock:
+            for tsk, cost in zip(children, costs):
+                tsk._rollup = self
+                tsk._weight = default if cost is None else cost
+                if tsk._progress > 0:
+                    tsk._progress = 0  # runs again
+                tsk._folded = 0
+                self._rollup_total += tsk._weight
+                self._rollup_count += 1
+
+            if self._rollup_total > 0:
+                self._progress = min(1, self._rollup_sum / self._rollup_total)
+            if events.ACTIVE and not self._changed:
+                events.changed(self)
+            _propagate(self)
+
+    def _fold_out(self, children):
+        ''' composite task: ends the rollup of children '''
+        with _rollup_lock:
+            for tsk in children:
+                if tsk._rollup is self:
+                    tsk._rollup = None
+            self._rollup_sum = self._rollup_total = self._rollup_count = 0
 
     # io
     @staticmethod
     def from_json(jstr: str):
         ''' create task instance from a serialized json string '''
-        return json_decode(jstr)
+        try:
+            return json_decode(jstr)
+        except JsonSerializeError:
+            # classes of lazy registered tasks (see TaskMan.register_lazy)
+            taskman = TaskMan.instance()  # pylint: disable=no-member
+            found = False
+
+            def resolve(dic):
+                nonlocal found
+                if '_CLSID_' in dic:
+                    try:
+                        taskman.find(dic['_CLSID_'].split(':')[0])
+                        found = True
+                    except ValueError:
+                        pass
+                return dic
+
+            json.loads(jstr, object_hook=resolve)
+            if not found:
+                raise
+            return json_decode(jstr)
 
     @staticmethod
     def load_from_file(fname: str):
         ''' load task from a json file '''
         with open(fname, "r") as file:
             jstr = file.read()
-        return json_decode(jstr)
+        return Task.from_json(jstr)
 
     def save_to_file(self, fname: str):
         ''' save task to file in json format '''
@@ -256,17 +530,30 @@ class Task:  # pylint: disable=too-many-public-methods
     def on_submitted(self):
         ''' called when task is submitted to executor engine '''
         self._status = Task.Status.SUBMITTED
+        if events.ACTIVE and not self._changed:
+            events.changed(self)
+        self._time_submitted = time.perf_counter()
+        self._time_started = self._time_done = None
 
     def on_running(self):
         ''' called when task is being executed by executor engine '''
         self._status = Task.Status.RUNNING
+        if events.ACTIVE and not self._changed:
+            events.changed(self)
+        self._time_started = time.perf_counter()
 
     def on_success(self, result):
         ''' called when task is done successfully '''
         self._ec = Task.ErrorCode.SUCCESS
         self._status = Task.Status.DONE
+        self._time_done = time.perf_counter()
         self._result = result
 
+        if self._history_ and self._time_started is not None:
+            _record_duration(type(self), self._time_done - self._time_started)
+        if self._rollup is not None:
+            self.progress = 1
+
         self._call_done_callbacks()
 
     def on_error(self, err):
@@ -277,6 +564,7 @@ class Task:  # pylint: disable=too-many-public-methods
             self._ec = Task.ErrorCode.ERROR
         self._error = err
         self._status = Task.Status.DONE
+        self._time_done = time.perf_counter()
 
         self._call_done_callbacks()
 
@@ -284,5 +572,6 @@ class Task:  # pylint: disable=too-many-public-methods
         ''' called when task is cancelled '''
         self._ec = Task.ErrorCode.CANCELLED
         self._status = Task.Status.DONE
+        self._time_done = time.perf_counter()
 
         self._call_done_callbacks()
@@ -1,8 +1,8 @@
 ''' built-in tasks '''
 
-# imports all tasks in this folder
+# registers all tasks in this folder, imported when used
 import pathlib
 
 import beebird.utils
 
-beebird.utils.import_tasks(pathlib.Path(__file__).parent, __name__)
+beebird.utils.import_tasks(pathlib.Path(__file__).parent, __name__, lazy=True)
@@ -1,3 +1,3 @@
 ''' Task UI modules '''
 
-from .ui import TaskUI
+from .ui import TaskUI, task_children
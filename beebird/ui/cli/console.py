@@ -2,11 +2,16 @@
 """ Console based TaskUI implementation """
 
 
+import collections
+import itertools
+import sys
 import threading
+import time
 
-from beebird.ui import TaskUI
+from beebird.ui import TaskUI, task_children
 
 from beebird.task import Task
+from beebird.events import ProgressBus
 
 # Print iterations progress
 
@@ -37,41 +42,222 @@ def print_progress_bar(iteration, total, prefix='', suffix='', decimals=1,
         print()
 
 
-class _TaskUIConsole(TaskUI):
-    def __init__(self, task):
-        super().__init__(task)
-        self.timer = None
+# displayed states of tasks: the status, or the error code once done
+_WAITING, _QUEUED, _RUNNING, _DONE, _FAILED, _STOPPED = range(6)
+_STATE_NAMES = ('waiting', 'queued', 'running', 'done', 'failed', 'stopped')
+_DONE_STATES = {Task.ErrorCode.SUCCESS: _DONE, Task.ErrorCode.ERROR: _FAILED,
+                Task.ErrorCode.STOPPED: _STOPPED,
+                Task.ErrorCode.CANCELLED: _STOPPED}
 
-    def update(self):
-        ''' update process ui '''
-        task_name = 'task'
-        print_progress_bar(self._task.progress*100, 100, prefix=task_name)
 
-    def run(self):
-        ''' start running task in console mode '''
+def _state(tsk, status):
+    ''' displayed state of a task of status '''
+    if status != Task.Status.DONE:
+        return int(status)
+    return _DONE_STATES.get(tsk.error_code, _FAILED)
+
+
+def _bar(progress, length):
+    filled = int(length * min(max(progress, 0), 1))
+    return '█' * filled + '-' * (length - filled)
+
+
+def _duration(seconds):
+    if seconds is None:
+        return '--:--:--'
+    seconds = int(seconds)
+    return f'{seconds // 3600}:{seconds // 60 % 60:02}:{seconds % 60:02}'
+
+
+class Dashboard:
+    ''' live console view of a running composition
+
+        shows the top of the composition tree with progress bars, counts of
+        the leaf tasks by state, throughput, ETA and the slowest running
+        tasks:
+
+            board = Dashboard(tsk)
+            board.start()
+            tsk.run()
+            board.stop()
+
+        The board is rendered by the event bus thread (see ProgressBus), at
+        most max_rate times per second: an update costs O(changed tasks),
+        whatever the size of the tree, and only the changed lines are
+        redrawn.
+    '''
+    MAX_RATE = 5  # screen updates per second
+    TOP = 5  # slowest running tasks shown
+    DEPTH = 1  # levels of the composition tree shown below the root
+    MAX_ROWS = 10  # rows of the composition tree
+    BAR_LENGTH = 30
+    WINDOW_SECONDS = 5  # throughput is averaged over this period
+
+    def __init__(self, task, out=None, *, max_rate=MAX_RATE, top=TOP,
+                 depth=DEPTH):
+        self._root = task
+        self._out = out or sys.stdout
+        self._max_rate = max_rate
+        self._top = top
+
+        # top of the tree, (level, task)
+        self._rows = []
+        self._leaves = []
+        self._walk(task, depth)
+
+        self._state = {}  # id(leaf) => state
+        self._counts = [0] * len(_STATE_NAMES)
+        self._running = {}  # id(leaf) => running leaf, in order of start
+        for i in self._leaves:
+            state = self._state[id(i)] = _state(i, i.status)
+            self._counts[state] += 1
+            if state == _RUNNING:
+                self._running[id(i)] = i
 
-        lck = threading.Lock()
-        lck.acquire()
+        self._samples = collections.deque()  # (time, leaves done)
+        self._lines = []  # lines on screen
+        self._sub = None
 
-        self._task.run(wait=False)
+    def _walk(self, root, depth):
+        stack = [(root, 0)]
+        while stack:
+            tsk, level = stack.pop()
+            if level <= depth and len(self._rows) < Dashboard.MAX_ROWS:
+                self._rows.append((level, tsk))
+            children = task_children(tsk)
+            if not children:
+                self._leaves.append(tsk)
+            stack.extend((i, level + 1) for i in reversed(children))
 
-        self.update()
+    def start(self):
+        ''' starts updating the board '''
+        self._draw(self.render())
+        bus = ProgressBus.instance()  # pylint: disable=no-member
+        self._sub = bus.subscribe(self.on_updates, self._max_rate,
+                                  [*self._leaves, self._root])
 
-        def task_monitor():
-            self.update()
-            if self._task.status != Task.Status.DONE:
-                self.timer = threading.Timer(1, task_monitor)
-                self.timer.start()
+    def stop(self):
+        ''' stops updating, draws the last state of the board '''
+        if self._sub is None:
+            return
+        bus = ProgressBus.instance()  # pylint: disable=no-member
+        bus.flush()  # updates not delivered yet
+        bus.unsubscribe(self._sub)
+        self._sub = None
+        self._draw(self.render())
+
+    def on_updates(self, updates):
+        ''' applies the updates of tasks, redraws the board '''
+        # pylint: disable=protected-access
+        states, counts, running = self._state, self._counts, self._running
+        for tsk, status, _ in updates:
+            key = id(tsk)
+            old = states.get(key)
+            if old is None:  # the root
+                continue
+            # inlined _state()
+            new = status if status != Task.Status.DONE else \
+                _DONE_STATES.get(tsk._ec, _FAILED)
+            if new != old:
+                states[key] = new
+                counts[old] -= 1
+                counts[new] += 1
+                if new == _RUNNING:
+                    running[key] = tsk
+                elif old == _RUNNING:
+                    del running[key]
+        self._draw(self.render())
+
+    def throughput(self, now=None) -> float:
+        ''' leaf tasks done per second, over the last WINDOW_SECONDS '''
+        now = time.monotonic() if now is None else now
+        done = self._counts[_DONE]
+        samples = self._samples
+        samples.append((now, done))
+        while samples[0][0] < now - Dashboard.WINDOW_SECONDS:
+            samples.popleft()
+        start, count = samples[0]
+        return (done - count) / (now - start) if now > start else 0
+
+    def eta(self, rate):
+        ''' estimated seconds until the composition is done, from the
+            progress of the root or the throughput rate; None if unknown
+        '''
+        eta = self._root.eta
+        if eta is None and rate > 0:
+            eta = (len(self._leaves) - self._counts[_DONE]) / rate
+        return eta
+
+    def render(self) -> list:
+        ''' lines of the board '''
+        now = time.perf_counter()
+        width = max(len(type(t).__name__) + 2 * lvl for lvl, t in self._rows)
+
+        lines = []
+        for level, tsk in self._rows:
+            name = '  ' * level + type(tsk).__name__
+            progress = max(tsk._progress, 0)  # pylint: disable=protected-access
+            lines.append(f'{name:<{width}} |{_bar(progress, Dashboard.BAR_LENGTH)}|'
+                         f' {progress * 100:5.1f}%'
+                         f' {_STATE_NAMES[_state(tsk, tsk.status)]}')
+
+        counts = self._counts
+        lines.append(f'tasks: {len(self._leaves)}  ' + '  '.join(
+            f'{_STATE_NAMES[i]}: {counts[i]}'
+            for i in (_RUNNING, _QUEUED, _DONE, _FAILED, _STOPPED)))
+        rate = self.throughput()
+        lines.append(f'throughput: {rate:.1f}/s  '
+                     f'eta: {_duration(self.eta(rate))}')
+
+        # the running tasks started first
+        slowest = list(itertools.islice(self._running.values(), self._top))
+        lines.append('slowest:' if slowest else '')
+        for tsk in slowest:
+            # pylint: disable=protected-access
+            elapsed = now - (tsk._time_started or now)
+            lines.append(f'  {type(tsk).__name__:<{width}} {elapsed:8.1f}s'
+                         f' {max(tsk._progress, 0) * 100:5.1f}%')
+        lines.extend([''] * (self._top - len(slowest)))
+        return lines
+
+    def _draw(self, lines):
+        ''' redraws the changed lines '''
+        prev = self._lines
+        out = []
+        if prev:
+            out.append(f'\x1b[{len(prev)}F')  # up to the first line
+        for i, line in enumerate(lines):
+            if i < len(prev) and prev[i] == line:
+                out.append('\x1b[1E')  # next line
             else:
-                print('\ndone')
-                lck.release()
+                out.append(f'\x1b[2K{line}\n')
+        self._out.write(''.join(out))
+        self._out.flush()
+        self._lines = lines
+
+
+class _TaskUIConsole(TaskUI):
+    MAX_RATE = 5  # screen updates per second
+
+    def run(self):
+        ''' start running task in console mode '''
+
+        done = threading.Event()
 
-        self.timer = threading.Timer(1, task_monitor)
-        self.timer.start()
+        def on_done(_):
+            done.set()
 
-        # wait until the task_monitor() has updated the done status.
-        lck.acquire()
+        board = Dashboard(self._task, max_rate=_TaskUIConsole.MAX_RATE)
+        board.start()
+        self._task.add_done_callback(on_done)
+        try:
+            self._task.run(wait=False)
+            done.wait()
+        finally:
+            self._task.remove_done_callback(on_done)
+            board.stop()
 
+        print('\ndone')
         print('\ngame over!')
 
 
@@ -1,3 +1,4 @@
 ''' QT5 based task UI '''
 
 from .qt import *
+from .model import TaskTreeModel
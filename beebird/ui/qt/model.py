@@ -0,0 +1,221 @@
+''' Item model of a composition tree
+
+    TaskTreeModel shows a task and its sub-tasks (see task_children) in a
+    QTreeView, columns: task, state, progress, elapsed seconds.
+
+    Rows are loaded lazily, only when the view asks for them, and nothing is
+    kept for a leaf row: a Bucket of 100k tasks costs the list of its tasks
+    and their row index, the view paints the visible rows only.
+
+    Progress and status come from the event bus (see ProgressBus): watch()
+    subscribes the model, the batches of updates, at most max_rate per
+    second, are passed to the GUI thread by a queued signal. A batch
+    refreshes the rows of the changed tasks only, by one dataChanged per
+    composite row over its changed rows, and inserts the rows of the
+    children a changed composite got while running (e.g. a lazy Parallel
+    keeping its tasks, a Bucket added to while running).
+'''
+
+import time
+
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, pyqtSignal
+
+from beebird.task import Task
+from beebird.compose import Parallel, Bucket
+from beebird.events import ProgressBus
+from beebird.ui import task_children
+
+
+class _Node:  # pylint: disable=too-few-public-methods
+    ''' a loaded composite row of the model '''
+    __slots__ = ('task', 'parent', 'row', 'children', 'count', 'nodes')
+
+    def __init__(self, task, parent, row, children):
+        self.task = task
+        self.parent = parent
+        self.row = row
+        self.children = children  # sub-tasks
+        self.count = len(children)  # rows of the view
+        self.nodes = {}  # row => _Node, composite rows loaded
+
+
+class TaskTreeModel(QAbstractItemModel):
+    ''' lazy tree model of a task composition
+
+        an index points to the node of its parent row, a node is created only
+        for a composite row when its children are asked for, so leaf rows
+        cost nothing.
+    '''
+
+    COLUMNS = ('Task', 'State', 'Progress', 'Elapsed')
+    MAX_RATE = 30  # updates per second, about one per frame
+
+    _updated = pyqtSignal(list)  # batch of updates, queued to GUI thread
+
+    def __init__(self, task, parent=None):
+        super().__init__(parent)
+        self._root = _Node(None, None, 0, [task])
+        self._nodes = {}  # id(task) => node loaded of a composite
+        self._rows = {id(task): (self._root, 0)}  # id(task) => row loaded
+        self._sub = None
+        self._updated.connect(self._apply, Qt.QueuedConnection)
+
+    @property
+    def task(self):
+        ''' root task '''
+        return self._root.children[0]
+
+    def watch(self, max_rate=MAX_RATE):
+        ''' refreshes rows on progress / status changes of their tasks '''
+        if self._sub is None:
+            bus = ProgressBus.instance()  # pylint: disable=no-member
+            self._sub = bus.subscribe(self._updated.emit, max_rate)
+
+    def unwatch(self):
+        ''' stops refreshing rows '''
+        if self._sub is not None:
+            ProgressBus.instance().unsubscribe(self._sub)  # pylint: disable=no-member
+            self._sub = None
+
+    def _apply(self, updates):
+        ''' refreshes the rows of the changed tasks (GUI thread), the view
+            repaints those visible only
+        '''
+        changed = {}  # node => (first, last) rows changed
+        for update in updates:
+            task_id = id(update.task)
+            node = self._nodes.get(task_id)
+            if node is not None:
+                if not self._grow(node):
+                    return  # reset
+            try:
+                pnode, row = self._rows[task_id]
+            except KeyError:
+                continue  # not loaded
+            first, last = changed.get(pnode, (row, row))
+            changed[pnode] = (min(first, row), max(last, row))
+
+        column = len(TaskTreeModel.COLUMNS) - 1
+        for pnode, (first, last) in changed.items():
+            self.dataChanged.emit(self.createIndex(first, 1, pnode),
+                                  self.createIndex(last, column, pnode))
+
+    def _grow(self, node) -> bool:
+        ''' inserts the rows of the children added to a composite, resets
+            the model if some are removed (e.g. runs again), returns False
+            on reset
+        '''
+        children = task_children(node.task)
+        count = len(children)
+        if count < node.count:
+            self.beginResetModel()
+            self._root.nodes.clear()
+            self._nodes.clear()
+            self._rows = {id(self.task): (self._root, 0)}
+            self.endResetModel()
+            return False
+
+        node.children = children
+        if count > node.count:
+            self.beginInsertRows(self.createIndex(node.row, 0, node.parent),
+                                 node.count, count - 1)
+            for row in range(node.count, count):
+                self._rows[id(children[row])] = (node, row)
+            node.count = count
+            self.endInsertRows()
+        return True
+
+    def _child(self, pnode, row, load=True):
+        ''' node of a row, None for a leaf row '''
+        node = pnode.nodes.get(row)
+        if node is None:
+            tsk = pnode.children[row]
+            children = task_children(tsk)
+            if not children and not load and \
+                    not isinstance(tsk, (Parallel, Bucket)):
+                return None  # a leaf, a parallel or bucket may grow
+            node = pnode.nodes[row] = _Node(tsk, pnode, row, children)
+            self._nodes[id(tsk)] = node
+            for i, child in enumerate(children):
+                self._rows[id(child)] = (node, i)
+        return node
+
+    def _node(self, index):
+        if not index.isValid():
+            return self._root
+        return self._child(index.internalPointer(), index.row())
+
+    def node_count(self) -> int:
+        ''' number of composite rows loaded '''
+        return len(self._nodes)
+
+    # QAbstractItemModel
+    def index(self, row, column, parent=QModelIndex()):
+        # pylint: disable=dangerous-default-value
+        pnode = self._node(parent)
+        if not 0 <= row < pnode.count or \
+                not 0 <= column < len(TaskTreeModel.COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, pnode)
+
+    def parent(self, index=QModelIndex()):
+        # pylint: disable=dangerous-default-value
+        if not index.isValid():
+            return QModelIndex()
+        pnode = index.internalPointer()
+        if pnode is self._root:
+            return QModelIndex()
+        return self.createIndex(pnode.row, 0, pnode.parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        # pylint: disable=invalid-name, dangerous-default-value
+        if parent.column() > 0:
+            return 0
+        return self._node(parent).count
+
+    def columnCount(self, parent=QModelIndex()):
+        # pylint: disable=invalid-name, dangerous-default-value, unused-argument
+        return len(TaskTreeModel.COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        # pylint: disable=invalid-name, dangerous-default-value
+        if not parent.isValid():
+            return True
+        if parent.column() > 0:
+            return False
+        node = self._child(parent.internalPointer(), parent.row(),
+                           load=False)
+        return node is not None and node.count > 0
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        # pylint: disable=invalid-name
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return TaskTreeModel.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        tsk = index.internalPointer().children[index.row()]
+        column = index.column()
+        if role == Qt.UserRole:
+            return tsk
+        if role != Qt.DisplayRole:
+            return None
+
+        # pylint: disable=protected-access
+        if column == 0:
+            return type(tsk).__name__
+        if column == 1:
+            if tsk.status != Task.Status.DONE:
+                return tsk.status.name.lower()
+            return tsk.error_code.name.lower()
+        if column == 2:
+            if not tsk.is_progress_available():
+                return ''
+            return f'{tsk.progress * 100:.1f}%'
+        if tsk._time_started is None:
+            return ''
+        end = tsk._time_done or time.perf_counter()
+        return f'{end - tsk._time_started:.1f}s'
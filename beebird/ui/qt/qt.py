@@ -1,16 +1,17 @@
 """ Qt based TaskUI implementation """
 
 import sys
-import threading
 
 
 from PyQt5.QtWidgets import QMainWindow, QWidget, QProgressBar, QLabel, \
-    QTextEdit, QDialog, QDialogButtonBox, QGridLayout, QVBoxLayout
+    QTextEdit, QDialog, QDialogButtonBox, QGridLayout, QVBoxLayout, QTreeView
 from PyQt5.QtWidgets import QApplication
 
 from beebird.task import Task, TaskMan
 from beebird.ui import TaskUI
 
+from .model import TaskTreeModel
+
 #from PyQt5 import QtGui
 
 
@@ -18,49 +19,55 @@ from beebird.ui import TaskUI
 class _TaskUIQt(TaskUI):
     def __init__(self, task=None):
         super().__init__(task)
-        self.timer = None
+        self.model = None
 
     def run(self):
         ''' run task in Qt GUI'''
 
-        app = QApplication(sys.argv)
+        app = QApplication.instance() or QApplication(sys.argv)
 
         ui_main = QMainWindow()
-        task_name = 'dummy'
+        task_name = type(self._task).__name__
         ui_main.setWindowTitle(f"QBackup: [{task_name}]")
 
-        task_gauge = QProgressBar(ui_main)
+        self.model = TaskTreeModel(self._task, ui_main)
+        view = QTreeView(ui_main)
+        view.setUniformRowHeights(True)  # rows are laid out lazily
+        view.setModel(self.model)
+        view.expand(self.model.index(0, 0))
+        ui_main.setCentralWidget(view)
 
-        if self._task.isProgressAvailable():
+        task_gauge = QProgressBar(ui_main)
+        if self._task.is_progress_available():
             task_gauge.setRange(0, 100)
             task_gauge.setValue(0)
         else:
             task_gauge.setRange(0, 0)
 
-        ui_main.setCentralWidget(task_gauge)
-
-        status_bar = ui_main.status_bar()
-
-        ui_main.setGeometry(300, 300, 350, 50)
-        ui_main.show()
-
-        self._task.run(wait=False)
-        status_bar.showMessage('running...')
-
-        def task_monitor():
-            if self._task.isProgressAvailable():
-                task_gauge.setValue(self._task.progress*100)
+        status_bar = ui_main.statusBar()
+        status_bar.addPermanentWidget(task_gauge)
 
-            if self._task.status != Task.Status.DONE:
-                self.timer = threading.Timer(1, task_monitor)
-                self.timer.start()
-            else:
+        def on_changed(top_left, *_):
+            # the task is row 0 under the invisible root
+            if top_left.parent().isValid() or top_left.row() != 0:
+                return
+            if self._task.is_progress_available():
+                task_gauge.setValue(int(self._task.progress * 100))
+            if self._task.status == Task.Status.DONE:
                 status_bar.showMessage('done')
 
-        self.timer = threading.Timer(1, task_monitor)
-        self.timer.start()
+        self.model.dataChanged.connect(on_changed)
+
+        ui_main.setGeometry(300, 300, 600, 400)
+        ui_main.show()
 
-        app.exec_()
+        self.model.watch()
+        try:
+            self._task.run(wait=False)
+            status_bar.showMessage('running...')
+            app.exec_()
+        finally:
+            self.model.unwatch()
 
     @staticmethod
     def create(obj, fields):
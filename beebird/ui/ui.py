@@ -1,6 +1,7 @@
 ''' User interface for tasks management '''
 
 from ..task import Task
+from .. import compose
 
 
 
@@ -15,3 +16,19 @@ class TaskUI: # pylint: disable=too-few-public-methods
     def task(self):
         ''' task object bundled with ui '''
         return self._task
+
+
+def task_children(tsk) -> list:
+    ''' sub-tasks of a composite task, [] for other tasks '''
+    # pylint: disable=protected-access
+    if isinstance(tsk, (compose.Parallel, compose.Serial)):
+        return tsk._tasks
+    if isinstance(tsk, compose.Bucket):
+        if tsk._run_tasks is not None:  # with the tasks added while running
+            return tsk._run_tasks
+        return tsk.graph()[0]
+    if isinstance(tsk, compose.do):
+        return tsk._then
+    if isinstance(tsk, compose.TryRun):
+        return [tsk._task]
+    return []
@@ -3,13 +3,30 @@
 import importlib
 import pkgutil
 
-def import_tasks(folder, package):
+from . import manifest
+from .task import TaskMan
+
+def import_tasks(folder, package, lazy=False):
     '''
         imports all tasks under a directory
+
+        lazy: the modules whose tasks are described by the folder's manifest
+        are not imported, their tasks are registered lazily and imported when
+        used (see beebird.manifest). Import side effects are delayed and
+        TaskMan.tasks lists imported tasks only, TaskMan.infos() all.
     '''
+    if not lazy:
+        for _, name, _ in pkgutil.iter_modules([folder]):
+            importlib.import_module('.'+name, package=package)
+        return
 
-    for _, name, _ in pkgutil.iter_modules([folder]):
-        importlib.import_module('.'+name, package=package)
+    taskman = TaskMan.instance()  # pylint: disable=no-member
+    for module, tasks in manifest.scan(folder, package):
+        if tasks is None:
+            importlib.import_module(module)
+        else:
+            for info in tasks:
+                taskman.register_lazy(info)
 
 
 def import_builtin_tasks():
@@ -0,0 +1,72 @@
+''' overhead of the checkpoint journal on a bucket of short tasks
+
+    PYTHONPATH=. python benchmarks/bench_checkpoint.py --tasks 20000
+
+    The same bucket of independent tasks runs without journal, with a
+    journal of keys and with a journal of saved results (best of --repeat
+    runs). The journal costs a fixed time per task, the overhead is given
+    per task and relative to a run of 10k tasks per second (100us a task).
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+from beebird.checkpoint import Journal
+from beebird.compose import Bucket
+from beebird.decorators import task
+
+
+@task
+def bench_item(i: int):
+    ''' short task '''
+    return i
+
+
+def run(tasks, journal=None):
+    ''' elapsed time of a bucket of tasks '''
+    bkt = Bucket(journal=journal)
+    for i in range(tasks):
+        bkt.add(bench_item(i))
+    start = time.perf_counter()
+    bkt.run()
+    return time.perf_counter() - start
+
+
+def measure(tasks, repeat, make_journal=None):
+    ''' best elapsed time of repeat runs, a new journal for each '''
+    best = None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(repeat):
+            journal = None
+            if make_journal:
+                journal = make_journal(os.path.join(tmpdir, f'{i}.ckpt'))
+            elapsed = run(tasks, journal)
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    ''' runs the benchmark '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tasks', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    base = measure(args.tasks, args.repeat)
+    print(f"{'no journal':<14} {base:8.3f}s "
+          f"{args.tasks / base:10.0f} tasks/s")
+    for title, make_journal in (
+            ('keys', Journal),
+            ('results', lambda f: Journal(f, save_results=True))):
+        elapsed = measure(args.tasks, args.repeat, make_journal)
+        per_task = (elapsed - base) / args.tasks
+        print(f"{title:<14} {elapsed:8.3f}s "
+              f"{args.tasks / elapsed:10.0f} tasks/s "
+              f"{per_task * 1e6:6.1f}us/task "
+              f"{per_task * 10000 * 100:+5.1f}% at 10k tasks/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+''' load time and memory of a huge bucket: Bucket.add() vs graph file
+
+    PYTHONPATH=. python benchmarks/bench_graphfile.py --tasks 200000 --fanin 5
+
+    Both paths end with the index graph the bucket job schedules from
+    (Bucket.graph()), the peak memory is traced with tracemalloc.
+'''
+
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from beebird.compose import Bucket
+from beebird.decorators import task
+from beebird.graphfile import save_bucket, load_bucket
+
+
+@task
+def bench_node(i: int):
+    ''' graph node '''
+    return i
+
+
+def edges(tasks, fanin, seed=0):
+    ''' pre-task indices of each node, nodes only depend on earlier ones '''
+    rnd = random.Random(seed)
+    for i in range(tasks):
+        yield [rnd.randrange(i) for _ in range(min(i, fanin))]
+
+
+def build_with_add(tasks, fanin):
+    ''' current path: one Bucket.add() per task '''
+    nodes = [bench_node(i) for i in range(tasks)]
+    bkt = Bucket()
+    for i, pres in enumerate(edges(tasks, fanin)):
+        bkt.add(nodes[i], list({nodes[j] for j in pres}))
+    bkt.graph()
+    return bkt
+
+
+def build_from_file(fname):
+    ''' graph file path '''
+    bkt = load_bucket(fname)
+    bkt.graph()
+    return bkt
+
+
+def measure(title, func, *args):
+    ''' prints time and peak memory of func(*args) '''
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    bkt = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{title:<12} {elapsed:8.2f}s {peak / 2**20:10.1f} MiB peak")
+    return bkt
+
+
+def main():
+    ''' runs the benchmark '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tasks', type=int, default=200000)
+    parser.add_argument('--fanin', type=int, default=5)
+    args = parser.parse_args()
+
+    bkt = measure('Bucket.add', build_with_add, args.tasks, args.fanin)
+    _, pre_tasks = bkt.graph()
+    print(f"{args.tasks} tasks, {sum(len(i) for i in pre_tasks)} edges")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, 'bench.beeg')
+        save_bucket(bkt, fname)
+        del bkt, pre_tasks
+        print(f"graph file   {os.path.getsize(fname) / 2**20:8.1f} MiB")
+
+        measure('graph file', build_from_file, fname)
+
+
+if __name__ == '__main__':
+    main()
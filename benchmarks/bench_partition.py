@@ -0,0 +1,78 @@
+''' scaling benchmark of PartitionedBucket on synthetic DAGs
+
+    PYTHONPATH=. python benchmarks/bench_partition.py --max-processes 8
+
+    The DAG is layered: each node depends on up to `fanin` nodes of the
+    previous layer close to its own position, every node burns `work`
+    iterations of CPU.
+'''
+
+import argparse
+import os
+import random
+import time
+
+from beebird.compose import Bucket
+from beebird.decorators import task_
+from beebird.partition import PartitionedBucket
+
+
+@task_
+def burn(i, work):
+    ''' cpu bound dummy work '''
+    total = 0
+    for k in range(work):
+        total += k
+    return i
+
+
+def build(bkt, layers, width, fanin, work, seed=0):
+    ''' fills bucket with a layered synthetic DAG '''
+    rnd = random.Random(seed)
+    prev = []
+    for layer in range(layers):
+        cur = [burn(layer * width + i, work) for i in range(width)]
+        for i, tsk in enumerate(cur):
+            if prev:
+                pres = {prev[min(width - 1, max(0, i + rnd.randint(-2, 2)))]
+                        for _ in range(fanin)}
+                bkt.add(tsk, list(pres))
+            else:
+                bkt.add(tsk)
+        prev = cur
+    return bkt
+
+
+def measure(bkt):
+    ''' seconds to run the bucket '''
+    start = time.perf_counter()
+    bkt.run()
+    return time.perf_counter() - start
+
+
+def main():
+    ''' runs the benchmark '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--layers', type=int, default=20)
+    parser.add_argument('--width', type=int, default=500)
+    parser.add_argument('--fanin', type=int, default=2)
+    parser.add_argument('--work', type=int, default=2000)
+    parser.add_argument('--max-processes', type=int,
+                        default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    nodes = args.layers * args.width
+    print(f"{nodes} nodes, fan-in {args.fanin}, work {args.work}")
+
+    shape = (args.layers, args.width, args.fanin, args.work)
+    base = measure(build(Bucket(), *shape))
+    print(f"{'Bucket':<24} {base:8.3f}s {nodes / base:10.0f} tasks/s")
+
+    for procs in range(1, args.max_processes + 1):
+        elapsed = measure(build(PartitionedBucket(procs), *shape))
+        print(f"{'PartitionedBucket(' + str(procs) + ')':<24} {elapsed:8.3f}s "
+              f"{nodes / elapsed:10.0f} tasks/s  x{base / elapsed:.2f}")
+
+
+if __name__ == '__main__':
+    main()
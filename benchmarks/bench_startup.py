@@ -0,0 +1,91 @@
+''' startup time of the bee command with many registered tasks
+
+    PYTHONPATH=. python benchmarks/bench_startup.py --tasks 10 100 1000 5000
+
+    Times a cold "python -m beebird --version" in a new process first, it
+    counts the interpreter startup and the imports of the bee command.
+
+    Then registers the tasks and times the console entry (beebird.__main__)
+    running "bee --version" and "bee run TASK ...", in process, so the
+    registry is measured without the interpreter startup and imports.
+'''
+
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
+
+import beebird.__main__
+from beebird.decorators import task
+
+
+def register(count, start=0):
+    ''' registers count task functions '''
+    for i in range(start, start + count):
+        def bench_func(a: int, b: int = 1):
+            return a + b
+
+        bench_func.__name__ = bench_func.__qualname__ = f'bench_task_{i}'
+        bench_func.__doc__ = f'benchmark task #{i}'
+        task(bench_func)
+
+
+def measure(argv, repeat=20):
+    ''' best time of running the command line '''
+    best = None
+    for _ in range(repeat):
+        sys.argv = ['bee', *argv]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), \
+                contextlib.suppress(SystemExit):
+            beebird.__main__.main()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_cold(argv, repeat=10):
+    ''' best time of running a new interpreter with the arguments '''
+    # the beebird package of this source tree
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root, *filter(None, [env.get('PYTHONPATH')])])
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    ''' runs the benchmark '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tasks', type=int, nargs='+',
+                        default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    cold = measure_cold(['-m', 'beebird', '--version'])
+    bare = measure_cold(['-c', 'pass'])
+    print(f"cold --version {cold * 1000:.2f}ms "
+          f"(python startup {bare * 1000:.2f}ms)\n")
+
+    print(f"{'tasks':>8} {'--version':>12} {'run TASK':>12}")
+    registered = 0
+    for count in sorted(args.tasks):
+        register(count - registered, registered)
+        registered = count
+        version = measure(['--version'])
+        run = measure(['run', 'bench_task_0', '1', '--b', '2'])
+        print(f"{count:>8} {version * 1000:10.2f}ms {run * 1000:10.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
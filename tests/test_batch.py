@@ -0,0 +1,68 @@
+''' test bulk execution of json tasks '''
+import io
+import json
+import time
+
+import pytest
+
+from beebird.batch import decode_task, run_batch
+from beebird.decorators import task
+
+
+@task
+def bt_sleep(i: int, seconds: float = 0):
+    time.sleep(seconds)
+    if i < 0:
+        raise ValueError(f'bad {i}')
+    return {'i': i}
+
+
+def _lines(*tasks):
+    return [json.dumps({'_CLSID_': 'bt_sleep', **i}) + '\n' for i in tasks]
+
+
+def test_decode_task():
+    ''' same tasks as Task.from_json, only tasks '''
+    tsk = decode_task('{"_CLSID_": "bt_sleep", "i": 3, "nofield": 1}')
+    assert type(tsk).__name__ == 'bt_sleep'
+    assert tsk.i == 3 and tsk.seconds == 0
+    assert not hasattr(tsk, 'nofield')
+
+    with pytest.raises(ValueError):
+        decode_task('{"i": 3}')
+
+
+def test_run_batch():
+    ''' completion order, input order, errors '''
+    lines = [*_lines({'i': 0, 'seconds': 0.2}, {'i': 1}, {'i': -1}),
+             '\n', '{"_CLSID_": "no_such_task"}\n', 'not json\n']
+
+    out = io.StringIO()
+    assert run_batch(lines, out, jobs=3) == (2, 3)
+    records = [json.loads(i) for i in out.getvalue().splitlines()]
+    assert records[-1] == {'line': 1, 'result': {'i': 0}}  # slowest
+    assert {i['line'] for i in records} == {1, 2, 3, 5, 6}
+    assert {'line': 3, 'error': 'ValueError: bad -1'} in records
+
+    out = io.StringIO()
+    assert run_batch(lines, out, jobs=3, ordered=True) == (2, 3)
+    records = [json.loads(i) for i in out.getvalue().splitlines()]
+    assert [i['line'] for i in records] == [1, 2, 3, 5, 6]
+    assert records[1] == {'line': 2, 'result': {'i': 1}}
+
+
+def test_bounded():
+    ''' input is read as tasks are done '''
+    running = []
+    read = 0
+
+    def lines():
+        nonlocal read
+        for line in _lines(*({'i': i, 'seconds': 0.01} for i in range(50))):
+            read += 1
+            running.append(read - out.getvalue().count('\n'))
+            yield line
+
+    out = io.StringIO()
+    assert run_batch(lines(), out, jobs=2, ordered=True, window=4) == (50, 0)
+    assert max(running) <= 4 + 1
@@ -1,5 +1,7 @@
 ''' test task schedule '''
 import sys
+
+import beebird.decorators
 import pytest
 from time import sleep
 
@@ -127,3 +129,107 @@ def test_bucket_error():
     assert bkt.status == Task.Status.DONE
     assert bkt.error_code == Task.ErrorCode.ERROR
     assert isinstance(bkt.error, ValueError)
+
+def test_bucket_expand():
+    ''' running task adds new tasks to its bucket '''
+    results = []
+
+    @task_
+    def work(i):
+        results.append(i)
+        return i
+
+    @task_
+    def scan(n, _job_):
+        for i in range(n):
+            tsk = work(i)
+            _job_.parent.add(tsk, [_job_.task])
+            _job_.parent.add(work(100 + i), [tsk])
+        return n
+
+    t0 = work(-1)
+    t1 = scan(3)
+    bkt = Bucket()
+    bkt.add(t1, [t0])
+
+    bkt.run(wait=True)
+    assert bkt.error_code == Task.ErrorCode.SUCCESS
+    assert sorted(results) == [-1, 0, 1, 2, 100, 101, 102]
+    assert results.index(100) > results.index(0)
+    # the bucket definition is not changed
+    assert bkt.total == 2
+
+    with pytest.raises(ValueError):
+        @task_
+        def bad(_job_):
+            _job_.parent.add(work(0), [work(1)])
+
+        bkt = Bucket()
+        bkt.add(bad())
+        bkt.run(wait=True)
+
+def test_bucket_expand_nested():
+    ''' a task nested in a composite of the bucket adds tasks to it '''
+    results = []
+
+    @task_
+    def work(i):
+        results.append(i)
+        return i
+
+    @task_
+    def scan(n, _job_):
+        results.append(type(_job_.parent.task).__name__)
+        for i in range(n):
+            _job_.bucket.add(work(i))
+        return n
+
+    bkt = Bucket()
+    bkt.add(Serial(work(-1), Parallel(scan(2), work(-2))))
+    bkt.run(wait=True)
+    assert 'Parallel' in results
+    assert sorted(i for i in results if isinstance(i, int)) == [-2, -1, 0, 1]
+
+    with pytest.raises(ValueError, match='not run by a bucket'):
+        Serial(scan(1)).run(wait=True)
+
+def test_bucket_dataflow():
+    ''' results of pre-tasks are passed to fields and released '''
+    import weakref
+
+    class Blob:
+        ''' large intermediate '''
+        def __init__(self, size):
+            self.size = size
+
+    refs = []
+
+    @task_
+    def load(size):
+        blob = Blob(size)
+        refs.append(weakref.ref(blob))
+        return blob
+
+    @task_
+    def measure(blob, extra=0):
+        return blob.size + extra
+
+    @task_
+    def total(a, b):
+        return a + b
+
+    t0, t1 = load(3), load(4)
+    m0, m1 = measure(), measure()
+    tsum = total()
+
+    bkt = Bucket()
+    bkt.add(m0, inputs={'blob': t0})
+    bkt.add(m1, inputs={'blob': t1, 'extra': m0})
+    bkt.add(tsum, inputs={'a': m0, 'b': m1})
+    bkt.run(wait=True)
+
+    assert tsum.result == 3 + (4 + 3)
+    # intermediates are released, the sink keeps its result
+    assert t0.result is None and m1.result is None
+    assert [r() for r in refs] == [None, None]
+    assert m0.blob is beebird.decorators.empty
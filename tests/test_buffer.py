@@ -0,0 +1,86 @@
+''' test zero-copy buffers '''
+import os
+import pickle
+
+import pytest
+
+from beebird import compose
+from beebird.buffer import Buffer
+from beebird.decorators import task_
+from beebird.partition import PartitionedBucket
+
+
+def test_buffer():
+    data = bytearray(b'hello world')
+    buf = Buffer(data)
+    assert len(buf) == 11
+    assert not buf.shared
+
+    # no copy: the view is the wrapped memory
+    buf.view[0:5] = b'HELLO'
+    assert data == b'HELLO world'
+
+    # pickled by content if not shared
+    other = pickle.loads(pickle.dumps(buf))
+    assert other.tobytes() == b'HELLO world'
+
+    with buf:
+        pass
+    assert buf.released
+    with pytest.raises(ValueError):
+        buf.view
+
+
+def test_shared_buffer():
+    buf = Buffer.allocate(1 << 20, shared=True)
+    assert buf.shared and buf.owner
+    buf.view[-3:] = b'end'
+
+    # pickled by name, ownership moves to the unpickled buffer
+    other = pickle.loads(pickle.dumps(buf))
+    assert other.owner and not buf.owner
+    assert other.view[-3:] == b'end'
+
+    other.view[0] = 42
+    assert buf.view[0] == 42  # same memory
+    buf.release()
+    assert other.view[0] == 42  # still alive
+    other.release()
+
+    # copied once to shared memory
+    buf = Buffer(b'abc')
+    shared = buf.share()
+    assert shared.shared and shared.tobytes() == b'abc'
+    assert shared.share() is shared
+    shared.release()
+
+
+@task_
+def produce(size):
+    buf = Buffer.allocate(size)
+    buf.view[:] = bytes([7]) * size
+    return buf
+
+
+@task_
+def consume(buf):
+    with buf:
+        return sum(buf.view)
+
+
+def test_buffer_handoff():
+    ''' passed by reference between tasks and processes '''
+    tsk = compose.Pipeline([1000, 2000], produce, consume)
+    assert tsk.run() == [7000, 14000]
+
+    if not hasattr(os, 'fork'):
+        return
+
+    bkt = PartitionedBucket(processes=2)
+    tasks = [produce(100 * (i + 1)) for i in range(4)]
+    for i in tasks:
+        bkt.add(i)
+    bkt.run()
+    for i, tsk in enumerate(tasks):
+        assert tsk.result.shared and tsk.result.owner
+        assert consume(tsk.result).run() == 7 * 100 * (i + 1)
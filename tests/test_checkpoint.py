@@ -0,0 +1,177 @@
+''' test checkpoint journal '''
+import pytest
+
+from beebird.decorators import task_
+from beebird.compose import Serial, Bucket
+from beebird.checkpoint import Journal
+from beebird.task import Task
+
+calls = []
+fail_on = set()
+
+
+@task_
+def step(i):
+    calls.append(i)
+    if i in fail_on:
+        raise ValueError(f'step {i}')
+    return i * 10
+
+
+def test_serial_resume(tmp_path):
+    ''' completed tasks are skipped when running again '''
+    journal = Journal(str(tmp_path / 'serial.ckpt'), save_results=True)
+
+    calls.clear()
+    fail_on.clear()
+    fail_on.add(2)
+    with pytest.raises(ValueError):
+        Serial(step(0), step(1), step(2), step(3), journal=journal).run()
+    assert calls == [0, 1, 2]
+
+    calls.clear()
+    fail_on.clear()
+    tsk = Serial(step(0), step(1), step(2), step(3), journal=journal)
+    assert tsk.run() == [0, 10, 20, 30]
+    assert calls == [2, 3]
+
+
+def test_bucket_resume(tmp_path):
+    ''' only the remainder of a bucket is dispatched '''
+    fname = str(tmp_path / 'bucket.ckpt')
+
+    def build():
+        tasks = [step(i) for i in range(4)]
+        bkt = Bucket(journal=fname)
+        bkt.add(tasks[1], [tasks[0]])
+        bkt.add(tasks[2], [tasks[0]])
+        bkt.add(tasks[3], [tasks[1], tasks[2]])
+        return bkt, tasks
+
+    calls.clear()
+    fail_on.clear()
+    fail_on.add(3)
+    bkt, _ = build()
+    with pytest.raises(ValueError):
+        bkt.run()
+    assert sorted(calls) == [0, 1, 2, 3]
+
+    calls.clear()
+    fail_on.clear()
+    bkt, tasks = build()
+    bkt.run()
+    assert calls == [3]
+    assert bkt.error_code == Task.ErrorCode.SUCCESS
+    # results are not saved by default
+    assert tasks[0].result is None
+    assert tasks[3].result == 30
+
+
+def test_bucket_add_journal(tmp_path):
+    ''' a bucket with a journal cannot grow while running '''
+    fname = str(tmp_path / 'add.ckpt')
+
+    @task_
+    def expand(_job_):
+        _job_.parent.add(step(1), [_job_.task])
+
+    tsk = expand()
+    bkt = Bucket(journal=fname)
+    bkt.add(tsk)
+    with pytest.raises(ValueError, match='journal'):
+        bkt.run()
+    assert Journal(fname).load() == {}
+
+    # the job of the run is not kept by its tasks
+    tsk = step(0)
+    bkt = Bucket(journal=fname)
+    bkt.add(tsk)
+    bkt.run()
+    assert tsk._parent_job is None  # pylint: disable=protected-access
+
+
+def test_journal_batch(tmp_path):
+    ''' records are buffered until a batch is full '''
+    journal = Journal(str(tmp_path / 'batch.ckpt'), batch_size=3,
+                      flush_seconds=1000)
+    journal.record('a')
+    journal.record('b')
+    assert journal.load() == {}
+    journal.record('c')
+    assert set(journal.load()) == {'a', 'b', 'c'}
+    journal.record('d')
+    journal.flush()
+    assert len(journal.load()) == 4
+
+    journal.clear()
+    assert journal.load() == {}
+
+
+def test_torn_journal(tmp_path):
+    ''' records written after a torn record survive the next resumes '''
+    fname = str(tmp_path / 'torn.ckpt')
+
+    def build():
+        return Serial(*(step(i) for i in range(5)), journal=fname)
+
+    calls.clear()
+    fail_on.clear()
+    fail_on.add(2)
+    with pytest.raises(ValueError):
+        build().run()
+    with open(fname, 'a', encoding='utf-8') as file:
+        file.write('{"key": "2:st')  # crashed while writing
+
+    calls.clear()
+    fail_on.clear()
+    fail_on.add(3)
+    with pytest.raises(ValueError):
+        build().run()
+    assert calls == [2, 3]
+
+    calls.clear()
+    fail_on.clear()
+    build().run()
+    assert calls == [3, 4]
+    assert len(Journal(fname).load()) == 5
+
+
+def test_bucket_dataflow_resume(tmp_path):
+    ''' inputs of a resumed bucket: keys, saved results and release '''
+    fname = str(tmp_path / 'flow.ckpt')
+    ran = []
+
+    @task_
+    def make(n):
+        ran.append(('make', n))
+        return n
+
+    @task_
+    def use(k, x=None):
+        ran.append(('use', k))
+        if k in fail_on:
+            raise ValueError(f'use {k}')
+        return x * k
+
+    def build():
+        tasks = [make(2), use(3), make(5), use(4)]
+        bkt = Bucket(journal=fname)  # results are not saved
+        bkt.add(tasks[1], inputs={'x': tasks[0]})
+        bkt.add(tasks[3], [tasks[1]], inputs={'x': tasks[2]})
+        return bkt, tasks
+
+    fail_on.clear()
+    fail_on.add(4)
+    bkt, _ = build()
+    with pytest.raises(ValueError):
+        bkt.run()
+
+    fail_on.clear()
+    ran.clear()
+    bkt, tasks = build()
+    bkt.run()
+    # use(3) is completed, use(4) gets the result saved of make(5)
+    assert ran == [('use', 4)]
+    assert tasks[3].result == 20
+    # no consumer left, the restored results are released
+    assert tasks[0].result is None and tasks[2].result is None
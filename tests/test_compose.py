@@ -1,3 +1,5 @@
+import asyncio
+import threading
 import pytest
 import time
 
@@ -190,4 +192,359 @@ def test_fifo():
         time.sleep(1)
         print(f'fifo status: {fifo.status}')
 
-    
\ No newline at end of file
+    
+
+def test_fifo_workers():
+    ''' concurrent consumers, ordered per key '''
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+    order = {}
+
+    @ptask
+    def job(account, seq):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.01)
+        with lock:
+            state['running'] -= 1
+            order.setdefault(account, []).append(seq)
+
+    fifo = compose.FIFO(100, workers=4, key=lambda t: t.account)
+    fifo_job = fifo.run(wait=False)
+
+    tasks = [job(i % 3, i // 3) for i in range(30)]
+    assert fifo.add_many(tasks) == 30
+    assert fifo.depth > 0
+
+    while fifo.stats()['processed'] < 30:
+        time.sleep(0.01)
+
+    # at most one task per key at a time: 3 keys
+    assert 1 < state['peak'] <= 3
+    assert order == {k: list(range(10)) for k in range(3)}
+    assert fifo.depth == 0
+    assert 0 < fifo.utilisation <= 1
+
+    fifo_job.stop()
+    while fifo.status != Task.Status.DONE:
+        time.sleep(0.01)
+
+    # full queue
+    fifo = compose.FIFO(2, max_wait_seconds=0.01)
+    assert fifo.add_many([job(0, i) for i in range(5)]) == 2
+    assert not fifo.add(job(0, 9))
+
+
+def test_stop_wakeup():
+    ''' waiting jobs wake up on stop, not on timeout '''
+    @ptask
+    def slow():
+        time.sleep(2)
+
+    for tsk in (compose.FIFO(), compose.do(slow()),
+                compose.Parallel(slow(), slow())):
+        job = tsk.run(wait=False)
+        time.sleep(0.05)
+        start = time.perf_counter()
+        job.stop()
+        while tsk.status != Task.Status.DONE:
+            time.sleep(0.001)
+        assert time.perf_counter() - start < 0.5
+
+
+def test_parallel_bounded():
+    ''' lazy children with a concurrency limit '''
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0, 'created': 0, 'done': 0}
+
+    @ptask
+    def work(i):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.01)
+        with lock:
+            state['running'] -= 1
+            state['done'] += 1
+        return i * 2
+
+    def children():
+        for i in range(30):
+            state['created'] += 1
+            # children are pulled only as earlier ones finish
+            assert state['created'] - state['done'] <= 3
+            yield work(i)
+
+    tsk = compose.Parallel(children(), max_in_flight=3)
+    assert tsk.run() == [i * 2 for i in range(30)]
+    assert state['peak'] <= 3
+    assert tsk.progress == 1
+
+    # task list with limit, error stops the run
+    @ptask
+    def err():
+        raise ValueError('err')
+
+    tsk = compose.Parallel(work(1), err, work(2), max_in_flight=2)
+    with pytest.raises(ValueError):
+        tsk.run()
+    assert tsk.error_code == Task.ErrorCode.ERROR
+
+    # bounded parallel is not flattened
+    tsk = compose.Parallel(compose.Parallel(work(1), work(2),
+                                            max_in_flight=1), work(3))
+    assert tsk.run() == [[2, 4], 6]
+
+
+def test_parallel_map():
+    ''' chunked map of a task over inputs '''
+    @ptask
+    def square(x):
+        return x * x
+
+    @ptask
+    def add(a, b):
+        return a + b
+
+    tsk = compose.ParallelMap(square, range(100), chunksize=7)
+    assert tsk.run() == [x * x for x in range(100)]
+    assert tsk.progress == 1
+
+    # tuples are positional arguments, automatic chunk size
+    tsk = compose.ParallelMap(add, ((i, 1) for i in range(50)))
+    assert tsk.run() == [i + 1 for i in range(50)]
+
+    # completion order
+    tsk = compose.ParallelMap(square, range(20), chunksize=3, ordered=False)
+    assert sorted(tsk.run()) == [x * x for x in range(20)]
+
+    # streaming
+    tsk = compose.ParallelMap(square, range(30), chunksize=4)
+    assert list(tsk.stream()) == [x * x for x in range(30)]
+    assert tsk.result is None
+
+    @ptask
+    def fail(x):
+        if x == 13:
+            raise ValueError(x)
+        return x
+
+    with pytest.raises(ValueError):
+        compose.ParallelMap(fail, range(20), chunksize=2).run()
+
+    with pytest.raises(ValueError):
+        list(compose.ParallelMap(fail, range(20), chunksize=2).stream())
+
+
+def test_as_completed():
+    ''' children results as they complete '''
+    @ptask
+    def work(i):
+        time.sleep(0.01 * (5 - i))
+        return i
+
+    # started by the iterator, in completion order
+    tsk = compose.Parallel(*[work(i) for i in range(5)])
+    results = [r for _, r in compose.as_completed(tsk)]
+    assert sorted(results) == list(range(5))
+    assert results[0] == 4
+
+    # already running: children done so far are replayed
+    tsk = compose.Parallel(*[work(i) for i in range(5)])
+    job = tsk.run(wait=False)
+    time.sleep(0.03)
+    pairs = list(compose.as_completed(tsk))
+    assert sorted(r for _, r in pairs) == list(range(5))
+    assert all(child.result == r for child, r in pairs)
+    assert job.task.status == Task.Status.DONE
+
+    # already done
+    assert sorted(r for _, r in compose.as_completed(tsk)) == list(range(5))
+
+    # bucket, asynchronous
+    bkt = compose.Bucket()
+    a, b, c = work(1), work(2), work(3)
+    bkt.add(b, [a])
+    bkt.add(c, [b])
+
+    async def collect():
+        return [r async for _, r in compose.as_completed_async(bkt)]
+
+    assert asyncio.run(collect()) == [1, 2, 3]
+
+    @ptask
+    def err():
+        raise ValueError('err')
+
+    with pytest.raises(ValueError):
+        list(compose.as_completed(compose.Parallel(work(1), err)))
+
+
+def test_reduce():
+    ''' tree reduction running along with the tasks '''
+    @ptask
+    def value(x):
+        time.sleep(0.001 * (x % 3))
+        return x
+
+    def concat(*parts):
+        return ''.join(parts)
+
+    @ptask
+    def char(i):
+        time.sleep(0.001 * (i % 4))
+        return chr(ord('a') + i)
+
+    # adjacent combines keep the order of non-commutative combiners
+    tsk = compose.Reduce(concat, *[char(i) for i in range(26)])
+    assert tsk.run() == 'abcdefghijklmnopqrstuvwxyz'
+    assert tsk.progress == 1
+
+    tsk = compose.Reduce(concat, (char(i) for i in range(26)), arity=3,
+                         initial='>', max_in_flight=4)
+    assert tsk.run() == '>abcdefghijklmnopqrstuvwxyz'
+
+    # commutative, combine as a task
+    @ptask
+    def add(a, b):
+        return a + b
+
+    tsk = compose.Reduce(add, (value(i) for i in range(100)),
+                         commutative=True)
+    assert tsk.run() == sum(range(100))
+
+    assert compose.MapReduce(value, range(10), max, arity=4).run() == 9
+    assert compose.Reduce(add, value(7)).run() == 7
+    assert compose.Reduce(add, [], initial=0).run() == 0
+    with pytest.raises(ValueError):
+        compose.Reduce(add, []).run()
+
+    @ptask
+    def err():
+        raise ValueError('err')
+
+    with pytest.raises(ValueError):
+        compose.Reduce(add, value(1), err, value(2)).run()
+
+
+def test_pipeline():
+    ''' stages streaming through bounded queues '''
+    lock = threading.Lock()
+    state = {'read': 0, 'stored': 0, 'gap': 0}
+
+    def lines():
+        for i in range(200):
+            with lock:
+                state['read'] += 1
+                state['gap'] = max(state['gap'], state['read'] - state['stored'])
+            yield f'{i},{i * 2}'
+
+    @ptask
+    def parse(line):
+        for field in line.split(','):
+            yield int(field)
+
+    @ptask
+    def store(value):
+        time.sleep(0.0005)
+        with lock:
+            state['stored'] += 1
+        return value
+
+    tsk = compose.Pipeline(lines(), parse, store, queue_size=4)
+    result = tsk.run()
+    assert result == [v for i in range(200) for v in (i, i * 2)]
+    assert tsk.progress == 1
+    # memory is bounded by the queues, not by the data set
+    assert state['gap'] < 20
+
+    # parallel stages, unordered
+    @ptask
+    def square(x):
+        time.sleep(0.001)
+        return x * x
+
+    @ptask
+    def numbers(n):
+        yield from range(n)
+
+    tsk = compose.Pipeline(numbers(50), compose.Stage(square, workers=4))
+    assert sorted(tsk.run()) == [x * x for x in range(50)]
+
+    # streaming
+    tsk = compose.Pipeline(range(100), square, queue_size=2)
+    assert list(tsk.stream()) == [x * x for x in range(100)]
+
+    stream = compose.Pipeline(range(1000), square).stream()
+    assert next(stream) == 0
+    stream.close()  # stops the pipeline
+
+    @ptask
+    def fail(x):
+        if x == 13:
+            raise ValueError(x)
+        return x
+
+    tsk = compose.Pipeline(range(100), compose.Stage(fail, workers=3), square)
+    with pytest.raises(ValueError):
+        tsk.run()
+    assert tsk.error_code == Task.ErrorCode.ERROR
+
+    with pytest.raises(ValueError):
+        list(compose.Pipeline(range(100), fail).stream())
+
+    # blocked stages are woken up by the failure, not by polling
+    for _ in range(5):
+        start = time.perf_counter()
+        with pytest.raises(ValueError):
+            compose.Pipeline(range(10 ** 6), fail, square, queue_size=1).run()
+        assert time.perf_counter() - start < 0.05
+
+    # streaming source collecting its items, each item is fed once
+    @task(public=False, collect=True)
+    def src(n):
+        yield from range(n)
+
+    @ptask
+    def dbl(x):
+        return x * 2
+
+    assert compose.Pipeline(src(3), dbl).run() == [0, 2, 4]
+
+
+def test_progress_rollup():
+    ''' weighted progress of nested compositions '''
+    @ptask
+    def Work(gate, _job_):
+        _job_.task.progress = 0.5
+        gate.wait()
+
+    gates = [threading.Event() for _ in range(3)]
+    a, b, c = (Work(i) for i in gates)
+    a._cost_, b._cost_, c._cost_ = 3, 1, 4
+    tsk = compose.Serial(compose.Parallel(a, b), c)
+    assert tsk.estimated_cost() == 8
+
+    def wait_for(value):
+        deadline = time.monotonic() + 2
+        while abs(tsk.progress - value) > 1e-9:
+            assert time.monotonic() < deadline, tsk.progress
+            time.sleep(0.001)
+
+    tsk.run(wait=False)
+    wait_for(0.25)  # (0.5 * 3 + 0.5 * 1) / 4 * (4 / 8)
+    gates[0].set()
+    wait_for(0.4375)  # (1 * 3 + 0.5 * 1) / 4 * (4 / 8)
+    gates[1].set()
+    wait_for(0.75)  # 1 * (4 / 8) + 0.5 * (4 / 8)
+    assert tsk.eta is not None
+    gates[2].set()
+    wait_for(1)
+    while tsk.status != Task.Status.DONE:
+        time.sleep(0.001)
+    assert tsk.result == [[None, None], None]
+    assert a._rollup is None and c._rollup is None
+
+    # unknown costs: average duration of done tasks of the same class
+    assert Work(gates[0]).estimated_cost() > 0
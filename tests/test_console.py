@@ -0,0 +1,51 @@
+''' test console dashboard '''
+import io
+
+import pytest
+
+from beebird import compose
+from beebird.decorators import task_
+from beebird.ui.cli.console import Dashboard
+
+
+@task_
+def leaf(n):
+    return n
+
+
+@task_
+def broken():
+    raise ValueError('broken')
+
+
+def test_dashboard():
+    tsk = compose.Serial(compose.Parallel(*[leaf(i) for i in range(500)]),
+                         compose.Parallel(leaf(-1), leaf(-2)))
+    out = io.StringIO()
+    board = Dashboard(tsk, out, top=3)
+    board.start()
+    tsk.run()
+    board.stop()
+
+    lines = board.render()
+    assert lines[0].startswith('Serial ') and '100.0%' in lines[0]
+    assert lines[1].startswith('  Parallel ')
+    assert 'tasks: 502' in lines[3] and 'done: 502' in lines[3]
+    assert len(lines) == 6 + 3  # fixed height, the top-N rows are padded
+
+    # only the changed lines are redrawn
+    board._draw(lines)
+    written = out.getvalue()
+    board._draw(lines)
+    assert out.getvalue()[len(written):].count('\x1b[2K') == 0
+
+
+def test_dashboard_failed():
+    tsk = compose.Parallel(leaf(1), broken())
+    board = Dashboard(tsk, io.StringIO())
+    board.start()
+    with pytest.raises(ValueError):
+        tsk.run()
+    board.stop()
+    summary = [i for i in board.render() if i.startswith('tasks:')]
+    assert 'failed: 1' in summary[0]  # the other one is done or stopped
@@ -0,0 +1,67 @@
+''' test progress event bus '''
+import threading
+import time
+
+from beebird.decorators import task_
+from beebird.events import ProgressBus
+from beebird.task import Task
+
+
+@task_
+def counting(n):
+    pass
+
+
+def test_progress_bus():
+    bus = ProgressBus.instance()
+    updates = []
+    done = threading.Event()
+
+    def on_updates(batch):
+        updates.append(batch)
+        if any(i.status == Task.Status.DONE for i in batch):
+            done.set()
+
+    tsk, other = counting(1), counting(2)
+    sub = bus.subscribe(on_updates, max_rate=20, tasks=[tsk])
+    try:
+        start = time.perf_counter()
+        for i in range(200000):
+            tsk.progress = i / 200000
+            other.progress = i / 200000
+        # a change costs little more than an attribute write
+        assert time.perf_counter() - start < 2
+
+        tsk.run()
+        other.run()
+        assert done.wait(2)
+    finally:
+        bus.unsubscribe(sub)
+
+    # coalesced, only the subscribed task
+    assert len(updates) <= 5
+    assert all(i.task is tsk for batch in updates for i in batch)
+    assert updates[-1][-1].status == Task.Status.DONE
+
+    # nothing is reported without subscriber
+    tsk.progress = 0.5
+    assert not tsk._changed
+
+
+def test_progress_bus_rate():
+    bus = ProgressBus.instance()
+    times = []
+    sub = bus.subscribe(lambda batch: times.append(time.monotonic()),
+                        max_rate=10)
+    tsk = counting(1)
+    try:
+        end = time.monotonic() + 0.5
+        while time.monotonic() < end:
+            tsk.progress = time.monotonic()
+        bus.flush()
+    finally:
+        bus.unsubscribe(sub)
+
+    assert 2 <= len(times) <= 8
+    gaps = [b - a for a, b in zip(times, times[1:-1])]
+    assert all(i >= 0.09 for i in gaps)
@@ -0,0 +1,91 @@
+''' test compact graph file '''
+import struct
+
+import pytest
+
+from beebird.compose import Bucket
+from beebird.decorators import task, task_
+from beebird.graphfile import save_bucket, load_bucket, graph_info, \
+    write_graph
+from beebird.task import Task
+
+
+@task
+def gf_node(i: int, tag: str = 'x'):
+    return i
+
+
+def test_save_load(tmp_path):
+    ''' loaded bucket has the same graph and runs '''
+    fname = str(tmp_path / 'g.beeg')
+    tasks = [gf_node(i) for i in range(5)]
+    bkt = Bucket()
+    bkt.add(tasks[1], [tasks[0]])
+    bkt.add(tasks[2], [tasks[0]])
+    bkt.add(tasks[3], [tasks[1], tasks[2]])
+    bkt.add(tasks[4])
+    save_bucket(bkt, fname)
+
+    assert graph_info(fname) == {'version': 1, 'tasks': 5, 'edges': 4,
+                                 'strings': 6}
+
+    loaded = load_bucket(fname)
+    assert loaded.total == 5
+    tasks, pre_tasks = loaded.graph()
+    assert [t.i for t in tasks] == [0, 1, 2, 3, 4]
+    assert [list(p) for p in pre_tasks] == [[], [0], [0], [1, 2], []]
+
+    loaded.run()
+    assert loaded.error_code == Task.ErrorCode.SUCCESS
+    assert [t.result for t in tasks] == [0, 1, 2, 3, 4]
+
+    # editing the loaded bucket
+    extra = gf_node(5)
+    loaded.add(extra, [tasks[4]])
+    assert loaded.total == 6
+    assert not loaded.find_loop()
+
+
+def test_private_task(tmp_path):
+    ''' private tasks cannot be resolved when loading '''
+    @task_
+    def hidden():
+        pass
+
+    bkt = Bucket()
+    bkt.add(hidden())
+    with pytest.raises(ValueError):
+        save_bucket(bkt, str(tmp_path / 'g.beeg'))
+
+
+def test_corrupt_file(tmp_path):
+    ''' CSR data is range-checked when loading '''
+    fname = str(tmp_path / 'g.beeg')
+    nodes = [('gf_node', '{"i": 0}', []), ('gf_node', '{"i": 1}', [0]),
+             ('gf_node', '{"i": 2}', [0, 1])]
+    write_graph(fname, nodes)
+    with open(fname, 'rb') as file:
+        data = file.read()
+    assert load_bucket(fname).total == 3
+
+    def load(raw):
+        with open(fname, 'wb') as file:
+            file.write(raw)
+        return load_bucket(fname)
+
+    # header, 5 string offsets, classes and fields of 3 tasks (padded)
+    offsets = 32 + 5 * 8 + 16 + 16
+    with pytest.raises(ValueError, match='pre-task offsets'):  # not ascending
+        load(data[:offsets + 8] + struct.pack('<Q', 2) +
+             data[offsets + 16:])
+    with pytest.raises(ValueError, match='pre-task offsets'):  # last is not #edges
+        load(data[:offsets + 24] + struct.pack('<Q', 2) +
+             data[offsets + 32:])
+    with pytest.raises(ValueError, match='truncated'):
+        load(data[:offsets + 8])
+    with pytest.raises(ValueError, match='not a task graph'):
+        load(data[:8])
+
+    write_graph(fname, [*nodes, ('gf_node', '{"i": 3}', [4])])
+    with pytest.raises(ValueError, match='index out of range'):
+        load_bucket(fname)
@@ -0,0 +1,37 @@
+''' test bee console entry '''
+import io
+import json
+import sys
+
+import pytest
+
+from beebird import __main__ as bee
+
+from . import samples  # pylint: disable=unused-import
+
+
+def _bee(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['bee', *argv])
+    return bee.main()
+
+
+def test_run_task(monkeypatch, capsys):
+    assert _bee(monkeypatch, 'run', 'add', '1', '--b', '2') == 0  # exit status
+    assert 'Result >>  3' in capsys.readouterr().out
+
+    # registered tasks are listed without building their parsers
+    _bee(monkeypatch, 'run')
+    assert 'Adds number a and b' in capsys.readouterr().out
+
+    with pytest.raises(SystemExit):
+        _bee(monkeypatch, 'run', 'no_such_task')
+    assert "'no_such_task' not found" in capsys.readouterr().err
+
+
+def test_run_batch(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(
+        '{"_CLSID_": "add", "a": 1, "b": 2}\n{"_CLSID_": "add", "a": 5}\n'))
+    assert _bee(monkeypatch, 'run-batch', '-', '--ordered') == 0
+    out = capsys.readouterr().out.splitlines()
+    assert [json.loads(i) for i in out if i.startswith('{')] == [
+        {'line': 1, 'result': 3}, {'line': 2, 'result': 6}]
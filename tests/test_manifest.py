@@ -0,0 +1,103 @@
+''' test task manifest and lazy task registration '''
+import os
+import sys
+import textwrap
+
+from beebird import manifest, utils
+from beebird.task import Task, TaskMan
+
+LAZY = '''
+from beebird.decorators import task, task_
+
+
+@task
+def mf_add(a: int, b: int = 1, _job_=None):
+    """ adds a and b """
+    return a + b
+
+
+@task
+class MfHello:
+    """ says hello """
+    who = "World"
+
+
+@task_
+def mf_private():
+    pass
+'''
+
+DYNAMIC = '''
+from beebird.decorators import task, job
+
+
+@task
+class MfDynamic:
+    """ bound to a job """
+
+
+@job(MfDynamic)
+def run_dynamic(tsk):
+    return 42
+'''
+
+
+def _package(tmp_path, name, modules):
+    folder = tmp_path / name
+    folder.mkdir()
+    (folder / '__init__.py').write_text('')
+    for module, source in modules.items():
+        (folder / f'{module}.py').write_text(textwrap.dedent(source))
+    sys.path.insert(0, str(tmp_path))
+    return folder
+
+
+def test_scan(tmp_path):
+    folder = _package(tmp_path, 'mf_scan', {'lazy': LAZY, 'dyn': DYNAMIC,
+                                            'empty': 'X = 1\n'})
+    found = dict(manifest.scan(folder, 'mf_scan'))
+    assert found['mf_scan.dyn'] is None  # must be imported
+    assert found['mf_scan.empty'] == []
+    add, hello = found['mf_scan.lazy']
+    assert add == ('mf_add', 'mf_scan.lazy', ' adds a and b ',
+                   [('a', 'int', manifest.REQUIRED), ('b', 'int', 1)])
+    assert hello.fields == [('who', None, 'World')]
+
+    # cached, parsed again when the file changes
+    assert os.path.exists(folder / '__pycache__' / manifest.CACHE_FILE)
+    assert dict(manifest.scan(folder, 'mf_scan'))['mf_scan.lazy'] == \
+        [add, hello]
+    (folder / 'empty.py').write_text('@task\ndef mf_new(): pass\n')
+    assert [i.name for i in dict(manifest.scan(
+        folder, 'mf_scan'))['mf_scan.empty']] == ['mf_new']
+
+
+def test_lazy_import(tmp_path):
+    folder = _package(tmp_path, 'mf_lazy', {'lazy': LAZY, 'dyn': DYNAMIC})
+    utils.import_tasks(folder, 'mf_lazy', lazy=True)
+    assert 'mf_lazy.dyn' in sys.modules
+    assert 'mf_lazy.lazy' not in sys.modules
+
+    taskman = TaskMan.instance()
+    assert taskman.info('mf_add').doc.strip() == 'adds a and b'
+    assert 'MfHello' in [i.name for i in taskman.infos()]
+    assert 'mf_lazy.lazy' not in sys.modules
+
+    # imported when decoded or found
+    tsk = Task.from_json('{"_CLSID_": "mf_add", "a": 1, "b": 2}')
+    assert 'mf_lazy.lazy' in sys.modules
+    assert tsk.run() == 3
+    assert taskman.find('MfHello')().who == 'World'
+
+
+def test_eager_import(tmp_path):
+    ''' import_tasks() imports every module by default '''
+    source = LAZY.replace('mf_', 'mfe_').replace('MfHello', 'MfeHello')
+    folder = _package(tmp_path, 'mf_eager', {'tasks': source})
+    utils.import_tasks(folder, 'mf_eager')
+    assert 'mf_eager.tasks' in sys.modules
+
+    taskman = TaskMan.instance()
+    module = sys.modules['mf_eager.tasks']
+    assert {module.mfe_add, module.MfeHello} <= set(taskman.tasks)
+    assert taskman.find('mfe_add') is module.mfe_add
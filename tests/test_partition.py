@@ -0,0 +1,108 @@
+''' test partitioned bucket '''
+import os
+import threading
+import time
+
+import pytest
+
+from beebird.compose import as_completed
+from beebird.decorators import task_
+from beebird.events import ProgressBus
+from beebird.partition import PartitionedBucket, partition
+from beebird.task import Task
+
+
+@task_
+def square(i):
+    if i < 0:
+        raise ValueError(f'negative: {i}')
+    return i * i
+
+
+def test_partition():
+    ''' nodes of each depth are spread, chains stay together '''
+    # two independent chains: 0->2->4, 1->3->5
+    pre_tasks = [[], [], [0], [1], [2], [3]]
+    assign = partition(pre_tasks, 2)
+    assert assign[0] != assign[1]
+    assert assign[0] == assign[2] == assign[4]
+    assert assign[1] == assign[3] == assign[5]
+
+    with pytest.raises(ValueError):
+        partition([[1], [0]], 2)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_partitioned_run():
+    ''' results are copied back to tasks in parent process '''
+    tasks = [square(i) for i in range(20)]
+
+    bkt = PartitionedBucket(processes=3)
+    for i in range(2, 20):
+        bkt.add(tasks[i], [tasks[i - 2], tasks[i // 2]] if i > 3 else
+                [tasks[i - 2]])
+    bkt.run()
+
+    assert bkt.error_code == Task.ErrorCode.SUCCESS
+    assert [i.result for i in tasks] == [i * i for i in range(20)]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_partitioned_error():
+    ''' error of the first failed task is raised '''
+    tasks = [square(1), square(-1), square(2)]
+
+    bkt = PartitionedBucket(processes=2)
+    bkt.add(tasks[1], [tasks[0]])
+    bkt.add(tasks[2], [tasks[1]])
+
+    with pytest.raises(ValueError):
+        bkt.run()
+    assert bkt.error_code == Task.ErrorCode.ERROR
+    assert tasks[1].error_code == Task.ErrorCode.ERROR
+
+
+@task_
+def slow(seconds, _job_):
+    _job_.task.progress = 0.5
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_partitioned_stop():
+    ''' stopping does not wait for the running tasks '''
+    bkt = PartitionedBucket(processes=2)
+    bkt.add(slow(10))
+    bkt.add(slow(10))
+    done = threading.Event()
+    bkt.add_done_callback(lambda _: done.set())
+
+    job_ = bkt.run(wait=False)
+    time.sleep(0.3)
+    start = time.monotonic()
+    job_.stop()
+    assert done.wait(5)
+    assert time.monotonic() - start < 0.5
+    assert bkt.error_code != Task.ErrorCode.SUCCESS
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_partitioned_progress():
+    ''' progress of running tasks and children done reach the parent '''
+    tasks = [slow(0.5), square(3)]
+    bkt = PartitionedBucket(processes=2)
+    for i in tasks:
+        bkt.add(i)
+
+    updates = []
+    bus = ProgressBus.instance()  # pylint: disable=no-member
+    sub = bus.subscribe(updates.extend, max_rate=100, tasks=[tasks[0], bkt])
+    try:
+        completed = [child for child, _ in as_completed(bkt)]
+    finally:
+        bus.unsubscribe(sub)
+
+    assert completed == [tasks[1], tasks[0]]
+    assert (tasks[0], Task.Status.RUNNING, 0.5) in updates
+    assert any(i.task is bkt and 0 < i.progress < 1 for i in updates)
@@ -0,0 +1,100 @@
+''' test compiled execution plans '''
+import threading
+
+import pytest
+
+from beebird import compose
+from beebird.decorators import task_
+from beebird.plan import compile_plan
+from beebird.task import Task
+
+
+@task_
+def value(x):
+    return x
+
+
+def test_plan():
+    a, b, c = value(1), value(2), value(3)
+    tree = a + b * c + compose.do(value(4)).then(value(5))
+    expected = tree.run()
+
+    plan = compile_plan(tree)
+    assert plan.leaves == 5
+    assert plan.run() == expected == [1, [2, 3], [4, 5]]
+    assert plan.progress == 1
+    # re-runnable
+    assert plan.run() == expected
+
+    # bucket
+    order = []
+
+    @task_
+    def step(name):
+        order.append(name)
+        return name
+
+    bkt = compose.Bucket()
+    ta, tb, tc = step('a'), step('b'), step('c')
+    bkt.add(tc, [tb])
+    bkt.add(tb, [ta])
+    plan = compile_plan(compose.Serial(bkt, value(9)))
+    assert plan.run() == [None, 9]
+    assert order == ['a', 'b', 'c']
+
+    # the root itself is a leaf
+    assert compile_plan(value(7)).run() == 7
+
+    # single scheduler thread, no thread per composite
+    nested = value(0)
+    for i in range(50):
+        nested = compose.Serial(compose.Parallel(nested, value(i)))
+    before = threading.active_count()
+    compile_plan(nested).run()
+    assert threading.active_count() <= before + 10
+
+
+def test_plan_control():
+    @task_
+    def fail(msg):
+        raise ValueError(msg)
+
+    @task_
+    def handler():
+        return 'handled'
+
+    @task_
+    def on_error(err=None):
+        return str(err)
+
+    # catch
+    tree = compose.do(value(1)).then(fail('oops')).catch(handler)
+    assert compile_plan(tree).run() == 'handled'
+
+    tree = compose.Serial(compose.do(fail('bad')).catch(on_error()), value(2))
+    assert compile_plan(tree).run() == ['bad', 2]
+
+    # uncaught
+    plan = compile_plan(value(1) + fail('uncaught'))
+    with pytest.raises(ValueError):
+        plan.run()
+    assert plan.error_code == Task.ErrorCode.ERROR
+
+    # retry
+    tries = []
+
+    @task_
+    def flaky():
+        tries.append(1)
+        if len(tries) < 3:
+            raise ValueError('flaky')
+        return len(tries)
+
+    tree = compose.TryRun(value(0) * flaky, max_tries=5, sleep_seconds=0)
+    assert compile_plan(tree).run() == [0, 3]
+
+    tries.clear()
+    tree = compose.TryRun(flaky, max_tries=2, sleep_seconds=0.01)
+    with pytest.raises(ValueError):
+        compile_plan(tree).run()
+    assert len(tries) == 2
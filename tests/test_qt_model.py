@@ -0,0 +1,142 @@
+''' test Qt tree model of a composition, headless '''
+import os
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# pylint: disable=wrong-import-position
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QTreeView
+
+from beebird import compose
+from beebird.decorators import task_
+from beebird.events import Update
+from beebird.ui.qt import TaskTreeModel
+
+
+@task_
+def item(n):
+    return n
+
+
+def _app():
+    return QApplication.instance() or QApplication([])
+
+
+def test_lazy_rows():
+    app = _app()
+    tasks = [item(i) for i in range(100000)]
+    bkt = compose.Bucket.from_graph(tasks, [[]] * len(tasks))
+
+    model = TaskTreeModel(bkt)
+    view = QTreeView()
+    view.setUniformRowHeights(True)
+    view.setModel(model)
+    view.resize(400, 300)
+    view.expand(model.index(0, 0))
+    view.show()
+    app.processEvents()
+
+    top = model.index(0, 0)
+    assert model.rowCount(top) == 100000
+    assert model.data(model.index(99999, 0, top), Qt.UserRole) is tasks[-1]
+    # rows of leaf tasks are not loaded
+    assert model.node_count() == 1
+    view.close()
+
+
+def test_watch():
+    app = _app()
+    tsk = compose.Serial(item(1), compose.Parallel(item(2), item(3)))
+    model = TaskTreeModel(tsk)
+    top = model.index(0, 0)
+    par = model.index(1, 0, top)
+    model.rowCount(par)  # loads the rows of the parallel
+
+    changed = []
+    model.dataChanged.connect(
+        lambda i, j: changed.append((i.parent(), i.row(), j.row())))
+    model.watch()
+    try:
+        tsk.run()
+        deadline = time.monotonic() + 2
+        while (par, 0, 1) not in changed:
+            assert time.monotonic() < deadline
+            app.processEvents()
+            time.sleep(0.01)
+    finally:
+        model.unwatch()
+
+    assert (top, 0, 1) in changed  # rows of the serial
+    assert model.data(top.siblingAtColumn(1)) == 'success'
+    assert model.data(top.siblingAtColumn(2)) == '100.0%'
+
+
+def test_watch_leaf():
+    ''' a leaf task as the root: its own row is refreshed '''
+    app = _app()
+    tsk = item(1)
+    model = TaskTreeModel(tsk)
+    top = model.index(0, 0)
+    assert model.rowCount(top) == 0  # a node without rows
+
+    changed = []
+    model.dataChanged.connect(
+        lambda i, j: changed.append((i.parent().isValid(), i.row(), j.row())))
+    model.watch()
+    try:
+        tsk.run()
+        deadline = time.monotonic() + 2
+        while (False, 0, 0) not in changed:
+            assert time.monotonic() < deadline
+            app.processEvents()
+            time.sleep(0.01)
+    finally:
+        model.unwatch()
+
+    # no range of the rows of the leaf
+    assert all(j >= 0 for _, _, j in changed)
+    assert model.data(top.siblingAtColumn(1)) == 'success'
+
+
+def test_changed_rows():
+    ''' only the rows of the changed tasks are refreshed '''
+    _app()
+    tasks = [item(i) for i in range(100)]
+    model = TaskTreeModel(compose.Parallel(*tasks))
+    top = model.index(0, 0)
+    model.rowCount(top)
+
+    changed = []
+    model.dataChanged.connect(
+        lambda i, j: changed.append((i.parent(), i.row(), j.row())))
+    model._apply([Update(tasks[7], None, 0), Update(tasks[5], None, 0),  # pylint: disable=protected-access
+                  Update(item(-1), None, 0)])  # not in the model
+    assert changed == [(top, 5, 7)]
+
+
+def test_rows_inserted():
+    ''' rows of the children a lazy parallel starts are inserted '''
+    app = _app()
+    tsk = compose.Parallel(iter([item(i) for i in range(5)]), max_in_flight=2,
+                           keep_tasks=True)
+    model = TaskTreeModel(tsk)
+    top = model.index(0, 0)
+    assert model.rowCount(top) == 0
+
+    inserted = []
+    model.rowsInserted.connect(lambda _, first, last: inserted.append(
+        (first, last)))
+    model.watch()
+    try:
+        tsk.run()
+        deadline = time.monotonic() + 2
+        while model.rowCount(top) < 5:
+            assert time.monotonic() < deadline
+            app.processEvents()
+            time.sleep(0.01)
+    finally:
+        model.unwatch()
+
+    assert inserted[0][0] == 0 and inserted[-1][1] == 4
+    assert model.data(model.index(4, 1, top)) == 'success'
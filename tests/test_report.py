@@ -0,0 +1,69 @@
+''' test post-run report '''
+from time import sleep
+
+import pytest
+
+from beebird.decorators import task_
+from beebird.compose import Parallel, Serial, Bucket
+from beebird.report import Report
+
+
+@task_
+def nap(seconds):
+    sleep(seconds)
+    return seconds
+
+
+def test_report_serial_parallel():
+    ''' critical path goes through the slowest branch '''
+    ta, tb, tc = nap(0.1), nap(0.3), nap(0.1)
+    tsk = Serial(ta, Parallel(tb, tc))
+    tsk.run()
+
+    rpt = Report(tsk)
+    assert [i.task for i in rpt.critical_path] == [ta, tb]
+    assert rpt.span == pytest.approx(0.4, abs=0.1)
+    assert rpt.work == pytest.approx(0.5, abs=0.1)
+    assert rpt.parallelism > 1
+    assert 'critical path' in str(rpt)
+
+
+def test_report_parallel_bounded():
+    ''' children of a lazy parallel are in the report if kept '''
+    tasks = [nap(0.05), nap(0.2), nap(0.05)]
+    tsk = Parallel(iter(tasks), max_in_flight=2, keep_tasks=True)
+    tsk.run()
+
+    rpt = Report(tsk)
+    assert [i.task for i in rpt.critical_path] == [tasks[1]]
+    assert len(rpt.leaves) == 3
+
+    tsk = Parallel(iter([nap(0.05), nap(0.05)]), max_in_flight=2)
+    tsk.run()
+    assert tsk._tasks == []  # pylint: disable=protected-access
+
+    rpt = Report(tsk)  # a single leaf
+    assert [i.task for i in rpt.critical_path] == [tsk]
+    assert rpt.span == pytest.approx(rpt.elapsed, abs=0.05)
+
+
+def test_report_bucket():
+    ''' bucket graph is kept after running '''
+    t0, t1, t2, t3 = nap(0.1), nap(0.2), nap(0.05), nap(0.05)
+
+    bkt = Bucket()
+    bkt.add(t1, [t0])
+    bkt.add(t2, [t0])
+    bkt.add(t3, [t1, t2])
+    bkt.run()
+
+    assert bkt.total == 4
+    rpt = Report(bkt)
+    assert [i.task for i in rpt.critical_path] == [t0, t1, t3]
+    assert len(rpt.leaves) == 4
+
+
+def test_report_not_done():
+    ''' report requires a finished task '''
+    with pytest.raises(ValueError):
+        Report(nap(0))
@@ -0,0 +1,57 @@
+''' test task server over unix domain socket '''
+import os
+import socket
+import stat
+import threading
+
+import pytest
+
+from beebird.server import Client, Server, submit
+
+from . import samples  # pylint: disable=unused-import
+
+
+@pytest.fixture(name='server')
+def fixture_server(tmp_path):
+    with Server(str(tmp_path / 'bee.sock'), jobs=2) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+    assert not (tmp_path / 'bee.sock').exists()
+
+
+def test_submit(server):
+    ''' a connection runs a batch of tasks '''
+    lines = ['{"_CLSID_": "add", "a": %d}' % i for i in range(20)]
+    records = list(submit([*lines, '{"_CLSID_": "no_such_task"}'],
+                          server.path))
+    assert sorted(i['line'] for i in records) == list(range(1, 22))
+    assert {'line': 5, 'result': 5} in records
+    assert 'error' in [i for i in records if i['line'] == 21][0]
+
+
+def test_client(server):
+    ''' tasks run one at a time on a connection '''
+    with Client(server.path) as client:
+        assert client.run('{"_CLSID_": "add", "a": 1, "b": 2}') == \
+            {'line': 1, 'result': 3}
+        assert client.run('{"_CLSID_": "add", "a": 2}\n') == \
+            {'line': 2, 'result': 3}
+
+    # a second server on the same socket
+    with pytest.raises(OSError, match='listening'):
+        Server(server.path)
+
+
+def test_stale_socket(tmp_path):
+    ''' socket file of a dead server is replaced '''
+    path = str(tmp_path / 'bee.sock')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.close()
+
+    with Server(path) as server:
+        assert server.path == path
+        # private to the user from its creation
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
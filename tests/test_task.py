@@ -1,9 +1,14 @@
+import asyncio
+import threading
+import time
+
 import pytest
 
 import beebird
 from beebird.task import Task, TaskMan 
 from beebird.job import Job
 from beebird.decorators import task, task_, job
+from beebird import compose
 from beebird.compose import unity
 
 def test_task_create():
@@ -187,4 +192,105 @@ def test_task_call():
             return self.i
 
     assert CallMe(1).call() == 1
-    assert CallMe(1).run(wait=True) == 1
\ No newline at end of file
+    assert CallMe(1).run(wait=True) == 1
+
+def test_batch_task():
+    calls = []
+
+    @task(public=False, batch=True, max_batch_size=8, max_linger_seconds=0.05)
+    def double(x):
+        calls.append(len(x))
+        return [ValueError(i) if i < 0 else i * 2 for i in x]
+
+    tasks = [double(i) for i in range(20)]
+    jobs = [t.run(wait=False) for t in tasks]
+    while any(t.status != Task.Status.DONE for t in tasks):
+        threading.Event().wait(0.01)
+
+    # coalesced into few calls, each task has its own result
+    assert [t.result for t in tasks] == [i * 2 for i in range(20)]
+    assert sum(calls) == 20 and max(calls) <= 8 and len(calls) <= 4
+
+    # per-task error
+    ok, bad = double(1), double(-1)
+    tsk = compose.Parallel(ok, bad)
+    with pytest.raises(ValueError):
+        tsk.run()
+    assert ok.result == 2
+    assert bad.error_code == Task.ErrorCode.ERROR
+
+    # sync run, a batch of one
+    assert double(5).run() == 10
+    assert double(6).call() == 12
+    with pytest.raises(ValueError):
+        double(-2).run()
+
+    # sync runs from all workers of the runner, called in the workers
+    @task(public=False)
+    def lookup(x):
+        return double(x).run()
+
+    tsk = compose.Parallel(*[lookup(i) for i in range(30)])
+    tsk.run(wait=False)
+    deadline = time.monotonic() + 5
+    while tsk.status != Task.Status.DONE:
+        assert time.monotonic() < deadline, 'workers starved'
+        threading.Event().wait(0.01)
+    assert tsk.result == [i * 2 for i in range(30)]
+
+    with pytest.raises(ValueError):
+        @task(public=False, batch=True)
+        def bad_batch(x, _job_):
+            pass
+
+
+def test_generator_task():
+    @task(public=False, total=10)
+    def rows(n):
+        for i in range(n):
+            yield i
+
+    tsk = rows(10)
+    items, progress = [], []
+    tsk.subscribe(items.append)
+    tsk.subscribe(lambda _: progress.append(tsk.progress))
+    assert tsk.run() is None
+    assert items == list(range(10))
+    assert progress[4] == 0.4 and tsk.progress == 1
+
+    # streaming, collected result
+    @task(public=False, total=lambda t: t.n, collect=True)
+    def squares(n):
+        for i in range(n):
+            yield i * i
+
+    tsk = squares(100)
+    assert list(tsk.stream(max_buffered=2)) == [i * i for i in range(100)]
+    assert tsk.result == [i * i for i in range(100)]
+
+    # stops when the consumer leaves early
+    stream = squares(10 ** 9).stream()
+    assert next(stream) == 0
+    stream.close()
+
+    # async generator
+    @task_
+    async def ticks(n):
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield i
+
+    assert list(ticks(5).stream()) == list(range(5))
+
+    @task_
+    def broken():
+        yield 1
+        raise ValueError('broken')
+
+    with pytest.raises(ValueError):
+        list(broken().stream())
+
+    with pytest.raises(ValueError):
+        @task(public=False, collect=True)
+        def not_generator():
+            return 1